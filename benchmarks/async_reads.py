@@ -0,0 +1,171 @@
+"""Concurrency-limited throughput of the read endpoints, sync vs async serving.
+
+Seeds a database with `generate_data`, then serves it from a single worker
+process twice: gunicorn's sync worker (the current path) and uvicorn with
+`splitwise.asgi` (reads on the async engine). At every concurrency level,
+that many clients loop over the group expense, personal expense, summary
+and group listing endpoints for --duration seconds.
+
+    python benchmarks/async_reads.py --concurrency 1,8,32,64 --duration 10
+    python benchmarks/async_reads.py --database-url postgresql://... --skip-seed
+
+Needs gunicorn, uvicorn, httpx and the asyncio driver of the database.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+MODES = {
+    'sync': lambda port: [
+        sys.executable, '-m', 'gunicorn', '--workers', '1', '--bind', '127.0.0.1:%d' % port,
+        '--log-level', 'warning', 'splitwise:create_app()'
+    ],
+    'async': lambda port: [
+        sys.executable, '-m', 'uvicorn', '--factory', 'splitwise.asgi:create_asgi_app',
+        '--workers', '1', '--port', str(port), '--log-level', 'warning', '--no-access-log'
+    ]
+}
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+def configure(database_url):
+    os.environ['DATABASE_URL'] = database_url
+    # Both modes must do the work behind every response
+    os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+
+def seed(args):
+    """Write the dataset; returns the database URL"""
+    from splitwise import create_app, db
+    from splitwise.utils.datagen import generate_data
+
+    database_url = args.database_url or 'sqlite:///%s' % os.path.join(tempfile.mkdtemp(), 'reads.db')
+    configure(database_url)
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        generate_data(
+            app, users=args.users, groups=args.groups, expenses=args.expenses,
+            categories_per_user=(3, 3), log=lambda step: print('  ' + step)
+        )
+        db.session.remove()
+        db.engine.dispose()
+    return database_url
+
+def request_paths(clients):
+    """(token, paths) of the first `clients` users with at least one group"""
+    from splitwise import create_app
+    from splitwise.models.group import GroupMembership
+    from splitwise.models.user import User
+    from splitwise.utils.jwt_utils import generate_token
+
+    app = create_app()
+    with app.app_context():
+        plans = []
+        for user in User.query.order_by(User.id).limit(clients * 4):
+            membership = GroupMembership.query.filter_by(user_id=user.id).first()
+            if membership is None:
+                continue
+            plans.append((generate_token(user), [
+                '/expenses/group/%d?limit=50' % membership.group_id,
+                '/expenses/personal',
+                '/expenses/personal/summary',
+                '/groups/'
+            ]))
+            if len(plans) == clients:
+                break
+    return plans
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('Server exited with %d' % process.returncode)
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('Server did not start on port %d' % port)
+
+async def drive(port, plans, concurrency, duration):
+    """Run `concurrency` looping clients; returns (latencies, errors)"""
+    import httpx
+
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url='http://127.0.0.1:%d' % port, limits=limits, timeout=60) as client:
+        stop_at = time.perf_counter() + duration
+
+        async def loop(index):
+            nonlocal errors
+            token, paths = plans[index % len(plans)]
+            headers = {'Authorization': 'Bearer ' + token}
+            n = index
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                response = await client.get(paths[n % len(paths)], headers=headers)
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+                n += 1
+
+        await asyncio.gather(*(loop(index) for index in range(concurrency)))
+
+    return latencies, errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=200)
+    parser.add_argument('--expenses', type=int, default=100000)
+    parser.add_argument('--concurrency', default='1,8,32,64', help='comma separated client counts')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per mode and level')
+    parser.add_argument('--database-url', help='benchmark this database instead of a temporary SQLite file')
+    parser.add_argument('--skip-seed', action='store_true', help='the database already holds a dataset')
+    parser.add_argument('--port', type=int, default=8731)
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    if args.skip_seed:
+        if not args.database_url:
+            parser.error('--skip-seed needs --database-url')
+        database_url = args.database_url
+        configure(database_url)
+    else:
+        database_url = seed(args)
+    plans = request_paths(max(levels))
+
+    print('%6s %11s %10s %9s %9s %7s' % ('mode', 'concurrency', 'req/s', 'p50 ms', 'p99 ms', 'errors'))
+    for mode, command in MODES.items():
+        process = subprocess.Popen(command(args.port), cwd=ROOT, env=dict(os.environ))
+        try:
+            wait_for_port(args.port, process)
+            for concurrency in levels:
+                latencies, errors = asyncio.run(drive(args.port, plans, concurrency, args.duration))
+                print('%6s %11d %10.1f %9.1f %9.1f %7d' % (
+                    mode, concurrency, len(latencies) / args.duration,
+                    percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000, errors
+                ))
+        finally:
+            process.terminate()
+            process.wait()
+
+if __name__ == '__main__':
+    main()
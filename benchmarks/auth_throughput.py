@@ -0,0 +1,113 @@
+"""Auth throughput against password hash cost.
+
+For every cost, seeds users hashed at that cost and replays concurrent logins
+through the Flask test client while another thread polls a cheap endpoint,
+once with hashing inline (0 workers) and once on the process pool.
+
+    python benchmarks/auth_throughput.py --costs 50000,260000,600000 --threads 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from statistics import median
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from splitwise import create_app, db
+from splitwise.models.user import User
+from splitwise.utils.jwt_utils import generate_token
+
+PASSWORD = 'benchmark-password'
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+def run(cost, workers, users, threads, duration):
+    """Logins per second and latencies of one configuration"""
+    directory = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///%s' % os.path.join(directory, 'bench.db')
+    os.environ['PASSWORD_HASH_COST'] = str(cost)
+    os.environ['PASSWORD_HASH_WORKERS'] = str(workers)
+    os.environ['AUTH_MAX_CONCURRENCY'] = str(threads)
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed = User(username='seed', email='seed@example.com')
+        seed.set_password(PASSWORD)
+        db.session.add_all([
+            User(username='user%d' % i, email='user%d@example.com' % i, password_hash=seed.password_hash)
+            for i in range(users)
+        ])
+        db.session.commit()
+        token = generate_token(User.query.first())
+
+    stop = time.monotonic() + duration
+    login_latencies = []
+    profile_latencies = []
+    lock = threading.Lock()
+
+    def login_loop(index):
+        client = app.test_client()
+        n = index
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            response = client.post('/auth/login', json={
+                'email': 'user%d@example.com' % (n % users),
+                'password': PASSWORD
+            })
+            elapsed = time.perf_counter() - start
+            if response.status_code == 200:
+                with lock:
+                    login_latencies.append(elapsed)
+            n += threads
+
+    def profile_loop():
+        client = app.test_client()
+        headers = {'Authorization': 'Bearer ' + token}
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            client.get('/auth/profile', headers=headers)
+            profile_latencies.append(time.perf_counter() - start)
+
+    pool = [threading.Thread(target=login_loop, args=(i,)) for i in range(threads)]
+    pool.append(threading.Thread(target=profile_loop))
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    from splitwise.utils.passwords import password_hasher
+    password_hasher.shutdown()
+
+    return {
+        "logins_per_second": len(login_latencies) / duration,
+        "login_p50_ms": median(login_latencies) * 1000 if login_latencies else 0.0,
+        "profile_p50_ms": median(profile_latencies) * 1000 if profile_latencies else 0.0,
+        "profile_p99_ms": percentile(profile_latencies, 0.99) * 1000
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--costs', default='50000,260000,600000', help='comma separated PBKDF2 iteration counts')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='process pool size of the pooled runs')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent login threads')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per configuration')
+    args = parser.parse_args()
+
+    print('%8s %8s %10s %10s %12s %12s' % ('cost', 'workers', 'logins/s', 'login p50', 'profile p50', 'profile p99'))
+    for cost in [int(cost) for cost in args.costs.split(',')]:
+        for workers in (0, args.workers):
+            result = run(cost, workers, args.users, args.threads, args.duration)
+            print('%8d %8d %10.1f %8.1fms %10.1fms %10.1fms' % (
+                cost, workers, result['logins_per_second'], result['login_p50_ms'],
+                result['profile_p50_ms'], result['profile_p99_ms']
+            ))
+
+if __name__ == '__main__':
+    main()
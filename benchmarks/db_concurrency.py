@@ -0,0 +1,130 @@
+"""Write/read concurrency of SQLite with and without the engine tuning.
+
+Starts writer and reader processes (standing in for gunicorn workers) that
+create group expenses and page through them through the Flask test client,
+first with the pre-tuning settings (rollback journal, synchronous=FULL) and
+then with the defaults (WAL, synchronous=NORMAL, mmap and a larger cache).
+
+    python benchmarks/db_concurrency.py --writers 4 --readers 4 --duration 10
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+MODES = {
+    'baseline': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_MMAP_SIZE': '0',
+        'SQLITE_CACHE_SIZE': '-2000'
+    },
+    'tuned': {}
+}
+
+def make_app(database, mode):
+    os.environ['DATABASE_URL'] = 'sqlite:///%s' % database
+    os.environ['PASSWORD_HASH_WORKERS'] = '0'
+    os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+    for key in MODES['baseline']:
+        os.environ.pop(key, None)
+    os.environ.update(MODES[mode])
+
+    from splitwise import create_app
+    return create_app()
+
+def seed(database, mode, members):
+    """Create the users and the shared group; returns (group_id, tokens)"""
+    from splitwise import db
+    from splitwise.models.group import Group, GroupMembership
+    from splitwise.models.user import User
+    from splitwise.utils.jwt_utils import generate_token
+
+    app = make_app(database, mode)
+    with app.app_context():
+        db.create_all()
+        group = Group(name='load test')
+        users = [
+            User(username='user%d' % i, email='user%d@example.com' % i, password_hash='-')
+            for i in range(members)
+        ]
+        db.session.add(group)
+        db.session.add_all(users)
+        db.session.add_all([GroupMembership(user=user, group=group) for user in users])
+        db.session.commit()
+        return group.id, [(user.id, generate_token(user)) for user in users]
+
+def worker(role, database, mode, group_id, user, member_ids, stop_at, results):
+    app = make_app(database, mode)
+    client = app.test_client()
+    user_id, token = user
+    headers = {'Authorization': 'Bearer ' + token}
+    ok = failed = 0
+
+    while time.time() < stop_at:
+        if role == 'writer':
+            response = client.post('/expenses/create', headers=headers, json={
+                'description': 'load',
+                'amount': 12.34,
+                'group_id': group_id,
+                'splits': [{'user_id': member_id} for member_id in member_ids]
+            })
+        else:
+            response = client.get('/expenses/group/%d?limit=50' % group_id, headers=headers)
+
+        if response.status_code < 300:
+            ok += 1
+        else:
+            failed += 1
+
+    results.put((role, ok, failed))
+
+def run(mode, writers, readers, duration):
+    database = os.path.join(tempfile.mkdtemp(), 'load.db')
+    group_id, users = seed(database, mode, max(writers + readers, 2))
+    member_ids = [user_id for user_id, _ in users]
+
+    results = multiprocessing.Queue()
+    stop_at = time.time() + duration
+    roles = ['writer'] * writers + ['reader'] * readers
+    processes = [
+        multiprocessing.Process(target=worker, args=(
+            role, database, mode, group_id, users[i], member_ids, stop_at, results
+        ))
+        for i, role in enumerate(roles)
+    ]
+    for process in processes:
+        process.start()
+
+    totals = {'writer': [0, 0], 'reader': [0, 0]}
+    for _ in processes:
+        role, ok, failed = results.get()
+        totals[role][0] += ok
+        totals[role][1] += failed
+    for process in processes:
+        process.join()
+
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per mode')
+    args = parser.parse_args()
+
+    print('%10s %10s %12s %10s %12s' % ('mode', 'writes/s', 'write errors', 'reads/s', 'read errors'))
+    for mode in MODES:
+        totals = run(mode, args.writers, args.readers, args.duration)
+        print('%10s %10.1f %12d %10.1f %12d' % (
+            mode,
+            totals['writer'][0] / args.duration, totals['writer'][1],
+            totals['reader'][0] / args.duration, totals['reader'][1]
+        ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+"""Endpoint benchmark suite.
+
+`run` generates (or reuses) a synthetic database with `generate_data`,
+drives every route of the app through the Flask test client and writes
+p50/p95/p99 latency, queries per request and peak memory of every endpoint
+to a JSON file. `compare` diffs
+two result files and exits non-zero on regressions.
+
+    python benchmarks/endpoints.py run --output results.json
+    python benchmarks/endpoints.py run --scale 0.01 --iterations 50 --output quick.json
+    python benchmarks/endpoints.py compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Full-scale dataset; --scale multiplies every count
+DATASET = {'users': 10000, 'groups': 2000, 'expenses': 1000000}
+
+# Password of every seeded user
+PASSWORD = 'password'
+
+# Requests per endpoint measured with tracemalloc on
+MEMORY_ITERATIONS = 5
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+def make_app(database):
+    os.environ['DATABASE_URL'] = 'sqlite:///%s' % database
+    # Measure the work behind every response, not the response cache
+    os.environ.setdefault('RESPONSE_CACHE_BACKEND', 'none')
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+
+    from splitwise import create_app
+    return create_app()
+
+def prepare_database(args):
+    """Path of a seeded database, reusing the cached copy of the same dataset"""
+    from splitwise import db
+    from splitwise.utils.datagen import generate_data
+
+    counts = {key: max(1, int(value * args.scale)) for key, value in DATASET.items()}
+    cached = os.path.join(args.cache_dir, 'bench-%(users)d-%(groups)d-%(expenses)d' % counts + '-%d.db' % args.seed)
+    os.makedirs(args.cache_dir, exist_ok=True)
+
+    if not os.path.exists(cached):
+        print('Seeding %s' % cached)
+        app = make_app(cached + '.tmp')
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            generate_data(
+                app, seed=args.seed, categories_per_user=(3, 3), password=PASSWORD,
+                workers=args.workers, log=lambda step: print('  ' + step), **counts
+            )
+            print('Seeded in %.1fs' % (time.perf_counter() - start))
+            db.session.remove()
+            db.engine.dispose()
+        # Fold the WAL back in so the single file can be copied
+        with sqlite3.connect(cached + '.tmp') as connection:
+            connection.execute('PRAGMA journal_mode=DELETE')
+        os.replace(cached + '.tmp', cached)
+
+    # Every run starts from an identical copy since the write routes add rows
+    working = os.path.join(args.cache_dir, 'run.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(working + suffix):
+            os.remove(working + suffix)
+    shutil.copyfile(cached, working)
+    return working, counts
+
+class Context:
+    """Users, tokens and ids the scenarios build requests from"""
+
+    def __init__(self, app):
+        from splitwise import db
+        from splitwise.models.expense import Expense
+        from splitwise.models.group import GroupMembership
+        from splitwise.models.user import User
+        from splitwise.utils.jwt_utils import generate_token
+
+        with app.app_context():
+            # Benchmark as a member of the busiest group
+            self.group_id = db.session.query(Expense.group_id).filter(
+                Expense.group_id.isnot(None)
+            ).group_by(Expense.group_id).order_by(db.func.count(Expense.id).desc()).limit(1).scalar()
+            membership = GroupMembership.query.filter_by(group_id=self.group_id, role='admin').first()
+            self.user = membership.user
+            self.user_id = self.user.id
+            self.email = self.user.email
+            self.token = generate_token(self.user)
+            self.member_ids = [
+                member_id for member_id, in db.session.query(GroupMembership.user_id).filter_by(group_id=self.group_id)
+            ]
+            self.category_id = self.user.categories.first().id
+            self.probe_hash = self.user.password_hash
+            self.next_user = db.session.query(db.func.max(User.id)).scalar() + 1
+
+        self.app = app
+        self.headers = {'Authorization': 'Bearer ' + self.token}
+
+    def new_users(self, count):
+        """Insert throwaway users; returns (id, email, token) triples"""
+        from splitwise import db
+        from splitwise.models.user import User
+        from splitwise.utils.jwt_utils import generate_token
+
+        with self.app.app_context():
+            users = [
+                User(username='bench%d' % n, email='bench%d@example.com' % n, password_hash=self.probe_hash)
+                for n in range(self.next_user, self.next_user + count)
+            ]
+            db.session.add_all(users)
+            db.session.commit()
+            self.next_user += count
+            return [(user.id, user.email, generate_token(user)) for user in users]
+
+def scenarios(ctx, iterations):
+    """Request factory per endpoint: i -> (method, url, request kwargs)"""
+    headers = ctx.headers
+    group = ctx.group_id
+    throwaway = ctx.new_users(iterations + MEMORY_ITERATIONS)
+    bulk_csv = 'description,amount,date,category_id,group_id,split_type,splits\n' + ''.join(
+        'bulk %d,12.50,2025-06-01T12:00:00,%d,,,\n' % (n, ctx.category_id) for n in range(100)
+    )
+    group_expense = {
+        'description': 'bench', 'amount': 42.5, 'group_id': group,
+        'split_type': 'equal', 'splits': [{'user_id': user_id} for user_id in ctx.member_ids]
+    }
+
+    return {
+        'auth.register': lambda i: ('POST', '/auth/register', {'json': {
+            'username': 'register%d' % i, 'email': 'register%d@example.com' % i, 'password': PASSWORD
+        }}),
+        'auth.login': lambda i: ('POST', '/auth/login', {'json': {'email': ctx.email, 'password': PASSWORD}}),
+        'auth.logout': lambda i: ('POST', '/auth/logout', {
+            'headers': {'Authorization': 'Bearer ' + throwaway[i][2]}
+        }),
+        'auth.get_profile': lambda i: ('GET', '/auth/profile', {'headers': headers}),
+        'expenses.create_expense': lambda i: ('POST', '/expenses/create', {'headers': headers, 'json': group_expense}),
+        'expenses.bulk_import_expenses': lambda i: ('POST', '/expenses/bulk', {
+            'headers': headers, 'data': bulk_csv, 'content_type': 'text/csv'
+        }),
+        'expenses.get_group_expenses': lambda i: ('GET', '/expenses/group/%d' % group, {'headers': headers}),
+        'expenses.export_group_expenses': lambda i: ('GET', '/expenses/group/%d/export' % group, {'headers': headers}),
+        'expenses.get_group_trends': lambda i: ('GET', '/expenses/group/%d/trends?granularity=week' % group, {
+            'headers': headers
+        }),
+        'expenses.create_category': lambda i: ('POST', '/expenses/categories', {
+            'headers': headers, 'json': {'name': 'bench %d' % i}
+        }),
+        'expenses.get_categories': lambda i: ('GET', '/expenses/categories', {'headers': headers}),
+        'expenses.create_personal_expense': lambda i: ('POST', '/expenses/personal', {'headers': headers, 'json': {
+            'description': 'bench', 'amount': 9.99, 'category_id': ctx.category_id
+        }}),
+        'expenses.get_personal_expenses': lambda i: ('GET', '/expenses/personal', {'headers': headers}),
+        'expenses.export_personal_expenses': lambda i: ('GET', '/expenses/personal/export', {'headers': headers}),
+        'expenses.get_expense_summary': lambda i: ('GET', '/expenses/personal/summary', {'headers': headers}),
+        'expenses.get_expense_trends': lambda i: ('GET', '/expenses/personal/trends', {'headers': headers}),
+        'expenses.search_expenses_view': lambda i: ('GET', '/expenses/search?q=dinner', {'headers': headers}),
+        'groups.create_group': lambda i: ('POST', '/groups/create', {'headers': headers, 'json': {
+            'name': 'bench %d' % i, 'members': [throwaway[i][1]]
+        }}),
+        'groups.get_user_groups': lambda i: ('GET', '/groups/?include=members', {'headers': headers}),
+        'groups.add_group_member': lambda i: ('POST', '/groups/%d/add_member' % group, {
+            'headers': headers, 'json': {'email': throwaway[i][1]}
+        }),
+        'groups.get_group_balances': lambda i: ('GET', '/groups/%d/balances' % group, {'headers': headers}),
+        'groups.get_settle_up_plan': lambda i: ('GET', '/groups/%d/settle_up' % group, {'headers': headers}),
+        'monitoring.get_cache_stats': lambda i: ('GET', '/cache/stats', {}),
+        'monitoring.get_metrics': lambda i: ('GET', '/metrics', {}),
+        'batch.run_batch': lambda i: ('POST', '/batch', {'headers': headers, 'json': {'operations': [
+            {'path': '/expenses/create', 'body': group_expense},
+            {'path': '/expenses/personal', 'body': {'description': 'bench', 'amount': 9.99}}
+        ]}})
+    }
+
+def measure(app, factory, iterations, warmup, offset):
+    """Latencies, statement counts and status codes of one endpoint"""
+    from sqlalchemy import event
+    from splitwise import db
+
+    client = app.test_client()
+    with app.app_context():
+        engine = db.engine
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    latencies = []
+    queries = []
+    status_codes = {}
+
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        for i in range(offset, offset + warmup + iterations):
+            method, url, kwargs = factory(i)
+            statements[0] = 0
+            start = time.perf_counter()
+            response = client.open(url, method=method, **kwargs)
+            response.get_data()  # drain streamed bodies
+            elapsed = time.perf_counter() - start
+            if i < offset + warmup:
+                continue
+            latencies.append(elapsed * 1000)
+            queries.append(statements[0])
+            status_codes[str(response.status_code)] = status_codes.get(str(response.status_code), 0) + 1
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+    # Peak Python allocations of a request, measured separately as tracing slows everything down
+    peak = 0
+    tracemalloc.start()
+    try:
+        for i in range(offset + warmup + iterations, offset + warmup + iterations + MEMORY_ITERATIONS):
+            method, url, kwargs = factory(i)
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            client.open(url, method=method, **kwargs).get_data()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'method': method,
+        'url': url,
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'queries_per_request': round(sum(queries) / len(queries), 2),
+        'peak_memory_kb': round(peak / 1024, 1),
+        'status_codes': status_codes
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    database, counts = prepare_database(args)
+    app = make_app(database)
+    ctx = Context(app)
+    # Logout, register and add_member consume one throwaway user or email per request
+    total = args.warmup + args.iterations
+    factories = scenarios(ctx, total)
+
+    # Reads first so the rows added by the write scenarios don't skew them
+    rules = [rule for rule in app.url_map.iter_rules() if rule.endpoint != 'static']
+    endpoints = [rule.endpoint for rule in sorted(rules, key=lambda rule: ('GET' not in rule.methods, rule.endpoint))]
+    selected = [endpoint for endpoint in endpoints if not args.only or endpoint in args.only]
+
+    results = {}
+    skipped = []
+    for endpoint in selected:
+        factory = factories.get(endpoint)
+        if factory is None:
+            skipped.append(endpoint)
+            continue
+        results[endpoint] = measure(app, factory, args.iterations, args.warmup, offset=0)
+        print('%-40s p50 %8.2fms  p95 %8.2fms  p99 %8.2fms  %5.1f queries  %8.1f KiB' % (
+            endpoint, results[endpoint]['p50_ms'], results[endpoint]['p95_ms'], results[endpoint]['p99_ms'],
+            results[endpoint]['queries_per_request'], results[endpoint]['peak_memory_kb']
+        ))
+    for endpoint in skipped:
+        print('%-40s no scenario, skipped' % endpoint)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'seed': args.seed,
+            'scale': args.scale,
+            'dataset': counts,
+            'iterations': args.iterations,
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        },
+        'endpoints': results,
+        'skipped': skipped
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print('Wrote %s' % args.output)
+
+def compare(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    if before['meta'].get('dataset') != after['meta'].get('dataset'):
+        print('Warning: the runs used different datasets')
+
+    regressions = 0
+    print('%-40s %21s %21s %15s' % ('endpoint', 'p50 ms', 'p95 ms', 'queries'))
+    for endpoint in sorted(before['endpoints'].keys() | after['endpoints'].keys()):
+        old = before['endpoints'].get(endpoint)
+        new = after['endpoints'].get(endpoint)
+        if old is None or new is None:
+            print('%-40s %s' % (endpoint, 'added' if old is None else 'removed'))
+            continue
+
+        slower = (
+            new['p95_ms'] > old['p95_ms'] * (1 + args.threshold / 100.0)
+            and new['p95_ms'] - old['p95_ms'] > args.min_ms
+        )
+        more_queries = new['queries_per_request'] > old['queries_per_request']
+        flag = '  REGRESSION' if slower or more_queries else ''
+        regressions += bool(flag)
+
+        print('%-40s %9.2f -> %8.2f %9.2f -> %8.2f %6.1f -> %5.1f%s' % (
+            endpoint, old['p50_ms'], new['p50_ms'], old['p95_ms'], new['p95_ms'],
+            old['queries_per_request'], new['queries_per_request'], flag
+        ))
+
+    if regressions:
+        print('%d endpoints regressed' % regressions)
+        raise SystemExit(1)
+    print('No regressions')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='benchmark every endpoint')
+    run_parser.add_argument('--output', default='benchmark-results.json')
+    run_parser.add_argument('--scale', type=float, default=1.0, help='fraction of the full dataset to seed')
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--iterations', type=int, default=200)
+    run_parser.add_argument('--warmup', type=int, default=10)
+    run_parser.add_argument('--workers', type=int, default=1, help='processes seeding the dataset')
+    run_parser.add_argument('--cache-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '.data'))
+    run_parser.add_argument('--only', nargs='*', help='endpoints to benchmark, e.g. groups.get_user_groups')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser('compare', help='diff two result files')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    compare_parser.add_argument('--threshold', type=float, default=20.0, help='allowed p95 slowdown in percent')
+    compare_parser.add_argument('--min-ms', type=float, default=1.0, help='ignore p95 changes smaller than this')
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Serialization cost of large expense payloads.
+
+Builds a group expense page of --expenses expenses (three splits each)
+through the real payload builder and encodes it with Flask's default
+provider, with the app's provider on the stdlib encoder and on orjson, and
+streamed through `stream_array`. Reports the time per encoding, the body
+size and the peak memory allocated while encoding (the payload itself is
+built beforehand and not counted).
+
+    python benchmarks/serialization.py --expenses 10000 --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+def build_payload(expenses):
+    """Group expense response body of `expenses` synthetic expenses"""
+    from splitwise.models.expense import SplitType
+    from splitwise.utils.reads import group_expenses_payload
+
+    users = [SimpleNamespace(username='user%d' % i) for i in range(8)]
+    start = datetime(2025, 1, 1)
+    rows, splits = [], []
+    for i in range(expenses):
+        rows.append(SimpleNamespace(
+            id=i, description='expense %d' % i, amount=12.34 + i % 100,
+            date=start + timedelta(minutes=i), paid_by=users[i % len(users)]
+        ))
+        for j in range(3):
+            splits.append(SimpleNamespace(
+                expense_id=i, user=users[(i + j) % len(users)], split_type=SplitType.EQUAL,
+                amount_or_percentage=4.11, amount_cents=411
+            ))
+    return group_expenses_payload(rows, splits, None)
+
+def drain(response):
+    """Body size of a streamed response, consumed chunk by chunk like a server would"""
+    return sum(len(chunk) for chunk in response.response)
+
+def measure(encode, repeat):
+    """(median seconds, body bytes, peak allocated bytes) of an encoding function"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = encode()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    encode()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return sorted(timings)[len(timings) // 2], size, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--expenses', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite://')
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+    from flask.json.provider import DefaultJSONProvider
+    from splitwise import create_app
+    from splitwise.utils.json_provider import orjson
+
+    app = create_app()
+    payload = build_payload(args.expenses)
+    items = payload['expenses']
+    flask_default = DefaultJSONProvider(app)
+    # Flask's provider cannot encode enums, so it gets the values as the views used to send them
+    legacy_payload = dict(payload, expenses=[
+        dict(item, splits=[dict(split, split_type=split['split_type'].value) for split in item['splits']])
+        for item in items
+    ])
+
+    cases = [
+        ('flask default', lambda: len(flask_default.response(legacy_payload).get_data())),
+        ('provider stdlib', lambda: len(app.json.response(payload).get_data())),
+        ('provider stdlib streamed', lambda: drain(app.json.stream_array(iter(items))))
+    ]
+    if orjson is not None:
+        cases += [
+            ('provider orjson', lambda: len(app.json.response(payload).get_data())),
+            ('provider orjson streamed', lambda: drain(app.json.stream_array(iter(items))))
+        ]
+    else:
+        print('orjson is not installed; only the stdlib encoder is measured')
+
+    print('%-26s %10s %10s %12s' % ('encoder', 'ms', 'MiB', 'peak MiB'))
+    with app.test_request_context():
+        for name, encode in cases:
+            app.json.configure('orjson' if 'orjson' in name else 'stdlib')
+            seconds, size, peak = measure(encode, args.repeat)
+            print('%-26s %10.1f %10.2f %12.2f' % (name, seconds * 1000, size / 2 ** 20, peak / 2 ** 20))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Expense writes per second with and without the group-commit write queue.
+
+For every SQLite synchronous level, seeds a group of --threads members and
+has every member post personal and group expenses in a loop through the
+Flask test client, once committing per request and once through the write
+queue. Reports writes per second, latency percentiles and, for the queue,
+the average number of expenses per commit.
+
+    python benchmarks/write_queue.py --threads 16 --duration 5 --synchronous NORMAL,FULL
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from statistics import median
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from splitwise import create_app, db
+from splitwise.models.expense import ExpenseCategory
+from splitwise.models.group import Group, GroupMembership
+from splitwise.models.user import User
+from splitwise.utils.jwt_utils import generate_token
+from splitwise.utils.write_queue import write_queue
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+def run(queued, synchronous, threads, duration, max_delay_ms):
+    """Writes per second and latencies of one configuration"""
+    directory = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///%s' % os.path.join(directory, 'bench.db')
+    os.environ['SQLITE_SYNCHRONOUS'] = synchronous
+    os.environ['WRITE_QUEUE_ENABLED'] = 'true' if queued else 'false'
+    os.environ['WRITE_QUEUE_MAX_DELAY_MS'] = str(max_delay_ms)
+    os.environ['PASSWORD_HASH_WORKERS'] = '0'
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        users = [User(username='user%d' % i, email='user%d@example.com' % i, password_hash='-') for i in range(threads)]
+        group = Group(name='benchmark')
+        db.session.add_all(users + [group])
+        db.session.flush()
+        db.session.add_all([GroupMembership(user=user, group=group) for user in users])
+        categories = [ExpenseCategory(name='food', user=user) for user in users]
+        db.session.add_all(categories)
+        db.session.commit()
+        plans = [(generate_token(user), category.id) for user, category in zip(users, categories)]
+        group_id = group.id
+        member_ids = [user.id for user in users]
+
+    batches_before, entries_before = write_queue.batches, write_queue.entries
+    stop = time.monotonic() + duration
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def write_loop(index):
+        client = app.test_client()
+        token, category_id = plans[index]
+        headers = {'Authorization': 'Bearer ' + token}
+        n = 0
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            if n % 2:
+                response = client.post('/expenses/create', headers=headers, json={
+                    'description': 'dinner', 'amount': 30, 'group_id': group_id,
+                    'splits': [{'user_id': user_id} for user_id in member_ids[:3]]
+                })
+            else:
+                response = client.post('/expenses/personal', headers=headers, json={
+                    'description': 'coffee', 'amount': 3, 'category_id': category_id
+                })
+            elapsed = time.perf_counter() - start
+            with lock:
+                if response.status_code == 201:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(response.status_code)
+            n += 1
+
+    pool = [threading.Thread(target=write_loop, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    batches = write_queue.batches - batches_before
+    return {
+        "writes_per_second": len(latencies) / duration,
+        "p50_ms": median(latencies) * 1000 if latencies else 0.0,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "per_commit": (write_queue.entries - entries_before) / batches if batches else 1.0,
+        "errors": len(errors)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16, help='concurrent writing clients')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per configuration')
+    parser.add_argument('--synchronous', default='NORMAL,FULL', help='comma separated SQLite synchronous levels')
+    parser.add_argument('--max-delay-ms', type=float, default=2, help='WRITE_QUEUE_MAX_DELAY_MS of the queued runs')
+    args = parser.parse_args()
+
+    print('%11s %7s %10s %9s %9s %11s %7s' % ('synchronous', 'queue', 'writes/s', 'p50 ms', 'p99 ms', 'per commit', 'errors'))
+    for synchronous in args.synchronous.split(','):
+        for queued in (False, True):
+            result = run(queued, synchronous, args.threads, args.duration, args.max_delay_ms)
+            print('%11s %7s %10.1f %9.1f %9.1f %11.1f %7d' % (
+                synchronous, 'on' if queued else 'off', result['writes_per_second'], result['p50_ms'],
+                result['p99_ms'], result['per_commit'], result['errors']
+            ))
+
+if __name__ == '__main__':
+    main()
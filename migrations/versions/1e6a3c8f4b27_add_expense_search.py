@@ -0,0 +1,38 @@
+"""add expense search
+
+Revision ID: 1e6a3c8f4b27
+Revises: 7c3b9d2e5f81
+Create Date: 2026-10-18 18:04:12.530219
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '1e6a3c8f4b27'
+down_revision = '7c3b9d2e5f81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite only; other databases go without expense search
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS expense_search USING fts5("
+        "description, category, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    op.execute(
+        "INSERT INTO expense_search (rowid, description, category) "
+        "SELECT expense.id, expense.description, coalesce(expense_category.name, '') "
+        "FROM expense LEFT OUTER JOIN expense_category ON expense_category.id = expense.category_id"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TABLE IF EXISTS expense_search")
@@ -0,0 +1,53 @@
+"""add query indexes
+
+Revision ID: 3f1c9a7d2b64
+Revises: 8a8834e02ad3
+Create Date: 2026-10-18 09:12:31.482105
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7d2b64'
+down_revision = '8a8834e02ad3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop duplicate memberships (keeping the oldest) so the unique constraint can be created
+    op.execute(
+        'DELETE FROM group_membership WHERE id NOT IN ('
+        'SELECT MIN(id) FROM group_membership GROUP BY user_id, group_id)'
+    )
+
+    with op.batch_alter_table('group_membership', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_group_membership_user_id_group_id', ['user_id', 'group_id'])
+        batch_op.create_index('ix_group_membership_group_id', ['group_id'], unique=False)
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.create_index('ix_expense_group_id_date', ['group_id', 'date', 'id'], unique=False)
+        batch_op.create_index('ix_expense_paid_by_id_group_id_date', ['paid_by_id', 'group_id', 'date'], unique=False)
+
+    with op.batch_alter_table('expense_split', schema=None) as batch_op:
+        batch_op.create_index('ix_expense_split_expense_id', ['expense_id'], unique=False)
+
+    with op.batch_alter_table('expense_category', schema=None) as batch_op:
+        batch_op.create_index('ix_expense_category_user_id', ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('expense_category', schema=None) as batch_op:
+        batch_op.drop_index('ix_expense_category_user_id')
+
+    with op.batch_alter_table('expense_split', schema=None) as batch_op:
+        batch_op.drop_index('ix_expense_split_expense_id')
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.drop_index('ix_expense_paid_by_id_group_id_date')
+        batch_op.drop_index('ix_expense_group_id_date')
+
+    with op.batch_alter_table('group_membership', schema=None) as batch_op:
+        batch_op.drop_index('ix_group_membership_group_id')
+        batch_op.drop_constraint('uq_group_membership_user_id_group_id', type_='unique')
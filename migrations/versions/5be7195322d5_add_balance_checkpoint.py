@@ -0,0 +1,38 @@
+"""add balance checkpoint
+
+Revision ID: 5be7195322d5
+Revises: 1e6a3c8f4b27
+Create Date: 2026-10-18 08:38:25.972074
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5be7195322d5'
+down_revision = '1e6a3c8f4b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('balance_checkpoint',
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.Column('watermark', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('balance_cents', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['group_id'], ['group.id'], name='fk_checkpoint_group_id'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], name='fk_checkpoint_user_id'),
+    sa.PrimaryKeyConstraint('group_id', 'watermark', 'user_id')
+    )
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.create_index('ix_expense_group_id_id', ['group_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.drop_index('ix_expense_group_id_id')
+
+    op.drop_table('balance_checkpoint')
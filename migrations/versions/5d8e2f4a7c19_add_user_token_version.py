@@ -0,0 +1,26 @@
+"""add user token version
+
+Revision ID: 5d8e2f4a7c19
+Revises: c72e5b1a9f03
+Create Date: 2026-10-18 11:20:05.274118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d8e2f4a7c19'
+down_revision = 'c72e5b1a9f03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('token_version')
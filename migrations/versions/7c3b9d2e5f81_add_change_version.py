@@ -0,0 +1,29 @@
+"""add change version
+
+Revision ID: 7c3b9d2e5f81
+Revises: e4a1f7b9c2d6
+Create Date: 2026-10-18 15:22:40.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3b9d2e5f81'
+down_revision = 'e4a1f7b9c2d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('change_version',
+    sa.Column('scope', sa.String(length=20), nullable=False),
+    sa.Column('key', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('scope', 'key')
+    )
+
+
+def downgrade():
+    op.drop_table('change_version')
@@ -0,0 +1,47 @@
+"""add expense daily rollup
+
+Revision ID: 9b4d6e0c3a58
+Revises: 5d8e2f4a7c19
+Create Date: 2026-10-18 12:41:19.806532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4d6e0c3a58'
+down_revision = '5d8e2f4a7c19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('expense_daily_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=True),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('expense_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['expense_category.id'], name='fk_rollup_category_id'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], name='fk_rollup_user_id'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('expense_daily_rollup', schema=None) as batch_op:
+        batch_op.create_index('ix_expense_daily_rollup_user_id_day', ['user_id', 'day', 'category_id'], unique=False)
+
+    # Backfill from the existing personal expenses
+    op.execute(
+        'INSERT INTO expense_daily_rollup (user_id, category_id, day, total, expense_count) '
+        'SELECT paid_by_id, category_id, date(date), SUM(amount), COUNT(id) '
+        'FROM expense WHERE group_id IS NULL '
+        'GROUP BY paid_by_id, category_id, date(date)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('expense_daily_rollup', schema=None) as batch_op:
+        batch_op.drop_index('ix_expense_daily_rollup_user_id_day')
+
+    op.drop_table('expense_daily_rollup')
@@ -0,0 +1,40 @@
+"""add rollup unique key
+
+Revision ID: a3e8c5d1f947
+Revises: 5be7195322d5
+Create Date: 2026-10-18 14:12:47.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e8c5d1f947'
+down_revision = '5be7195322d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Concurrent first writes of a day could insert duplicate rows; rebuild
+    # them from the raw expenses before the key rules them out
+    op.execute('DELETE FROM expense_daily_rollup')
+    op.execute(
+        'INSERT INTO expense_daily_rollup (user_id, category_id, day, total_cents, expense_count) '
+        'SELECT paid_by_id, category_id, date(date), SUM(amount_cents), COUNT(id) '
+        'FROM expense WHERE group_id IS NULL '
+        'GROUP BY paid_by_id, category_id, date(date)'
+    )
+
+    with op.batch_alter_table('expense_daily_rollup', schema=None) as batch_op:
+        batch_op.create_index(
+            'uq_expense_daily_rollup_key',
+            ['user_id', sa.text('coalesce(category_id, 0)'), 'day'],
+            unique=True
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('expense_daily_rollup', schema=None) as batch_op:
+        batch_op.drop_index('uq_expense_daily_rollup_key')
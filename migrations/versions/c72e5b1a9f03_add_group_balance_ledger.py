@@ -0,0 +1,45 @@
+"""add group balance ledger
+
+Revision ID: c72e5b1a9f03
+Revises: 3f1c9a7d2b64
+Create Date: 2026-10-18 10:02:47.913360
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c72e5b1a9f03'
+down_revision = '3f1c9a7d2b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('group_balance',
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('balance', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['group_id'], ['group.id'], name='fk_balance_group_id'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], name='fk_balance_user_id'),
+    sa.PrimaryKeyConstraint('group_id', 'user_id')
+    )
+
+    # Populate the ledger from the existing group expenses
+    op.execute(
+        'INSERT INTO group_balance (group_id, user_id, balance) '
+        'SELECT group_id, user_id, SUM(delta) FROM ('
+        '  SELECT e.group_id AS group_id, e.paid_by_id AS user_id, e.amount AS delta '
+        '  FROM expense e WHERE e.group_id IS NOT NULL '
+        '  UNION ALL '
+        '  SELECT e.group_id, s.user_id, '
+        "    -(CASE WHEN s.split_type = 'PERCENTAGE' THEN e.amount * s.amount_or_percentage / 100 "
+        '      ELSE s.amount_or_percentage END) '
+        '  FROM expense_split s JOIN expense e ON e.id = s.expense_id WHERE e.group_id IS NOT NULL'
+        ') AS deltas GROUP BY group_id, user_id'
+    )
+
+
+def downgrade():
+    op.drop_table('group_balance')
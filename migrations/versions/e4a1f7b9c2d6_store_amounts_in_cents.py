@@ -0,0 +1,146 @@
+"""store amounts in cents
+
+Revision ID: e4a1f7b9c2d6
+Revises: 9b4d6e0c3a58
+Create Date: 2026-10-18 14:03:52.551907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a1f7b9c2d6'
+down_revision = '9b4d6e0c3a58'
+branch_labels = None
+depends_on = None
+
+# Splits updated per executemany batch
+BATCH_SIZE = 5000
+
+
+def _allocate(total_cents, weights):
+    """Largest remainder allocation (frozen copy of utils.money.allocate)"""
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        return [0] * len(weights)
+
+    parts = []
+    remainders = []
+    for weight in weights:
+        quota, remainder = divmod(total_cents * weight, weight_sum)
+        parts.append(quota)
+        remainders.append(remainder)
+
+    leftover = total_cents - sum(parts)
+    for i in sorted(range(len(weights)), key=lambda i: -remainders[i])[:leftover]:
+        parts[i] += 1
+    return parts
+
+
+def _split_shares(connection):
+    """Yield (share_cents, split_id) for every split, expense by expense"""
+    rows = connection.execute(sa.text(
+        'SELECT s.id, s.expense_id, s.split_type, s.amount_or_percentage, e.amount_cents '
+        'FROM expense_split s JOIN expense e ON e.id = s.expense_id '
+        'ORDER BY s.expense_id, s.id'
+    ))
+
+    def shares_of(splits):
+        total_cents = splits[0][4]
+        split_type = splits[0][2]
+        if split_type == 'EXACT':
+            # Rounding each float amount alone can miss the total by a cent;
+            # weighting by the amounts (in hundredths of a cent) cannot
+            shares = _allocate(total_cents, [int(round(split[3] * 10000)) for split in splits])
+        elif split_type == 'PERCENTAGE':
+            shares = _allocate(total_cents, [int(round(split[3] * 100)) for split in splits])
+        else:
+            shares = _allocate(total_cents, [1] * len(splits))
+        return zip(shares, (split[0] for split in splits))
+
+    current = []
+    for row in rows:
+        if current and row[1] != current[0][1]:
+            yield from shares_of(current)
+            current = []
+        current.append(row)
+    if current:
+        yield from shares_of(current)
+
+
+def upgrade():
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('amount_cents', sa.Integer(), nullable=True))
+    with op.batch_alter_table('expense_split', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('amount_cents', sa.Integer(), nullable=True))
+
+    op.execute('UPDATE expense SET amount_cents = CAST(ROUND(amount * 100) AS INTEGER)')
+
+    # Re-allocate every split in whole cents so each expense's shares add up exactly
+    connection = op.get_bind()
+    update = sa.text('UPDATE expense_split SET amount_cents = :share WHERE id = :id')
+    batch = []
+    for share, split_id in _split_shares(connection):
+        batch.append({'share': share, 'id': split_id})
+        if len(batch) == BATCH_SIZE:
+            connection.execute(update, batch)
+            batch = []
+    if batch:
+        connection.execute(update, batch)
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.alter_column('amount_cents', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('amount')
+    with op.batch_alter_table('expense_split', schema=None) as batch_op:
+        batch_op.alter_column('amount_cents', existing_type=sa.Integer(), nullable=False)
+
+    # Rebuild the ledger and rollups from the exact amounts
+    with op.batch_alter_table('group_balance', schema=None) as batch_op:
+        batch_op.drop_column('balance')
+        batch_op.add_column(sa.Column('balance_cents', sa.Integer(), nullable=False, server_default='0'))
+    op.execute('DELETE FROM group_balance')
+    op.execute(
+        'INSERT INTO group_balance (group_id, user_id, balance_cents) '
+        'SELECT group_id, user_id, SUM(delta) FROM ('
+        '  SELECT group_id, paid_by_id AS user_id, amount_cents AS delta '
+        '  FROM expense WHERE group_id IS NOT NULL '
+        '  UNION ALL '
+        '  SELECT e.group_id, s.user_id, -s.amount_cents '
+        '  FROM expense_split s JOIN expense e ON e.id = s.expense_id WHERE e.group_id IS NOT NULL'
+        ') AS deltas GROUP BY group_id, user_id'
+    )
+
+    with op.batch_alter_table('expense_daily_rollup', schema=None) as batch_op:
+        batch_op.drop_column('total')
+        batch_op.add_column(sa.Column('total_cents', sa.Integer(), nullable=False, server_default='0'))
+    op.execute('DELETE FROM expense_daily_rollup')
+    op.execute(
+        'INSERT INTO expense_daily_rollup (user_id, category_id, day, total_cents, expense_count) '
+        'SELECT paid_by_id, category_id, date(date), SUM(amount_cents), COUNT(id) '
+        'FROM expense WHERE group_id IS NULL '
+        'GROUP BY paid_by_id, category_id, date(date)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('expense_daily_rollup', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total', sa.Float(), nullable=False, server_default='0'))
+    op.execute('UPDATE expense_daily_rollup SET total = total_cents / 100.0')
+    with op.batch_alter_table('expense_daily_rollup', schema=None) as batch_op:
+        batch_op.drop_column('total_cents')
+
+    with op.batch_alter_table('group_balance', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('balance', sa.Float(), nullable=False, server_default='0'))
+    op.execute('UPDATE group_balance SET balance = balance_cents / 100.0')
+    with op.batch_alter_table('group_balance', schema=None) as batch_op:
+        batch_op.drop_column('balance_cents')
+
+    with op.batch_alter_table('expense_split', schema=None) as batch_op:
+        batch_op.drop_column('amount_cents')
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('amount', sa.Float(), nullable=False, server_default='0'))
+    op.execute('UPDATE expense SET amount = amount_cents / 100.0')
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.drop_column('amount_cents')
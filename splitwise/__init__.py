@@ -2,9 +2,12 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 import os
+from .utils.engine import RoutingSession, configure_engines, install_sqlite_pragmas, route_reads_to_replica
+from .utils.json_provider import JSONProvider
+from .utils.metrics import metrics
 
 # Initialize core application components
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
 def create_app():
@@ -18,18 +21,76 @@ def create_app():
         'sqlite:///splitwise.db'
     )
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    app.config['SQLITE_CACHE_SIZE'] = int(os.environ.get('SQLITE_CACHE_SIZE', -64000))
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    app.config['DB_POOL_PRE_PING'] = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+    app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    app.config['REPLICA_DATABASE_URL'] = os.environ.get('REPLICA_DATABASE_URL')
+    app.config['ASYNC_DATABASE_URL'] = os.environ.get('ASYNC_DATABASE_URL')
+    app.config['SLOW_REQUEST_MS'] = int(os.environ.get('SLOW_REQUEST_MS', 0))
+    app.config['READ_REPLICA_BLUEPRINTS'] = os.environ.get('READ_REPLICA_BLUEPRINTS', 'expenses,groups').split(',')
+    app.config['IDENTITY_CACHE_SIZE'] = int(os.environ.get('IDENTITY_CACHE_SIZE', 10000))
+    app.config['IDENTITY_CACHE_TTL'] = int(os.environ.get('IDENTITY_CACHE_TTL', 60))
+    app.config['JWT_TRUST_CLAIMS'] = os.environ.get('JWT_TRUST_CLAIMS', '').lower() in ('1', 'true', 'yes')
+    app.config['RESPONSE_CACHE_BACKEND'] = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    app.config['RESPONSE_CACHE_SIZE'] = int(os.environ.get('RESPONSE_CACHE_SIZE', 1000))
+    app.config['RESPONSE_CACHE_TTL'] = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+    app.config['RESPONSE_CACHE_URL'] = os.environ.get('RESPONSE_CACHE_URL')
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+    app.config['PASSWORD_HASH_COST'] = int(os.environ.get('PASSWORD_HASH_COST', 260000))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+    app.config['AUTH_MAX_CONCURRENCY'] = int(os.environ.get('AUTH_MAX_CONCURRENCY', 2 * (os.cpu_count() or 1)))
+    app.config['AUTH_QUEUE_TIMEOUT'] = float(os.environ.get('AUTH_QUEUE_TIMEOUT', 5))
+    app.config['BATCH_MAX_OPERATIONS'] = int(os.environ.get('BATCH_MAX_OPERATIONS', 100))
+    app.config['JSON_ENCODER'] = os.environ.get('JSON_ENCODER', 'auto')
+    app.config['WRITE_QUEUE_ENABLED'] = os.environ.get('WRITE_QUEUE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    app.config['WRITE_QUEUE_MAX_DELAY_MS'] = float(os.environ.get('WRITE_QUEUE_MAX_DELAY_MS', 2))
+    app.config['WRITE_QUEUE_MAX_BATCH'] = int(os.environ.get('WRITE_QUEUE_MAX_BATCH', 256))
+    app.config['WRITE_QUEUE_TIMEOUT'] = float(os.environ.get('WRITE_QUEUE_TIMEOUT', 10))
+    app.json = JSONProvider(app)
 
     # Initialize extensions
+    configure_engines(app)
     db.init_app(app)
     migrate.init_app(app, db)
 
+    with app.app_context():
+        install_sqlite_pragmas(app, db.engines.values())
+        metrics.init_app(app, db.engines.values())
+    route_reads_to_replica(app)
+
+    from .utils.identity_cache import identity_cache
+    identity_cache.init_app(app)
+
+    from .utils.cache import response_cache
+    response_cache.init_app(app)
+
+    from .utils.passwords import password_hasher
+    password_hasher.init_app(app)
+
+    from .utils.write_queue import write_queue
+    write_queue.init_app(app)
+
     # Import and register blueprints
     from .routes.auth import auth as auth_blueprint
     from .routes.expenses import expenses as expenses_blueprint
     from .routes.groups import groups as groups_blueprint
+    from .routes.monitoring import monitoring as monitoring_blueprint
+    from .routes.batch import batch as batch_blueprint
 
     app.register_blueprint(auth_blueprint, url_prefix='/auth')
     app.register_blueprint(expenses_blueprint, url_prefix='/expenses')
     app.register_blueprint(groups_blueprint, url_prefix='/groups')
+    app.register_blueprint(monitoring_blueprint)
+    app.register_blueprint(batch_blueprint)
+
+    # Register CLI commands
+    from .commands import register_commands
+    register_commands(app)
 
     return app
@@ -0,0 +1,269 @@
+"""ASGI serving mode with the read-heavy endpoints on an async engine.
+
+    uvicorn --factory splitwise.asgi:create_asgi_app --workers 4
+
+GET requests for group expenses, personal expenses, the personal summary
+and the group listing are answered by coroutines on an async SQLAlchemy
+engine, so one worker process keeps many queries in flight. Every other
+request is handed to the Flask app through asgiref's WSGI adapter, which
+runs them one at a time on a worker thread.
+
+Requires `asgiref` and the asyncio driver of the database (`aiosqlite`,
+`asyncpg` or `aiomysql`).
+"""
+import re
+from urllib.parse import parse_qsl
+import jwt
+from werkzeug.datastructures import Headers, MultiDict
+from werkzeug.http import parse_etags
+from . import create_app, db
+from .models.expense import Expense
+from .models.user import User
+from .utils.engine import create_async_read_engine
+from .utils.identity_cache import identity_cache
+from .utils.jwt_utils import token_version_stmt, trusted_claims, user_identity
+from .utils.metrics import metrics
+from .utils.pagination import InvalidCursor, get_page_args, keyset_filter, page_requested, page_rows
+from .utils.reads import (
+    InvalidFields, group_expenses_payload, group_expenses_stmt, group_members_stmt, group_splits_stmt,
+    personal_expenses_payload, personal_expenses_stmt, personal_fields, summary_days, summary_payload,
+    user_groups_payload, user_memberships_stmt
+)
+from .utils.rollups import summary_stmt
+from .utils.versions import group_version_stmt, make_etag, user_groups_version_stmt, user_version_stmt
+
+class ReadRequest:
+    """The parts of a GET request the async views look at"""
+
+    def __init__(self, scope):
+        self.query_string = scope['query_string']
+        self.args = MultiDict(parse_qsl(self.query_string.decode('latin-1'), keep_blank_values=True))
+        self.headers = Headers([
+            (name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']
+        ])
+        self.if_none_match = parse_etags(self.headers.get('If-None-Match'))
+
+class AsyncReadApp:
+    """ASGI app serving the read endpoints itself and the rest through Flask"""
+
+    def __init__(self, flask_app, engine):
+        from asgiref.wsgi import WsgiToAsgi
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        self.flask_app = flask_app
+        self.engine = engine
+        self.sessions = async_sessionmaker(engine, expire_on_commit=False)
+        self.wsgi = WsgiToAsgi(flask_app)
+
+        # (path pattern, endpoint, view) of the routes served on the async engine
+        self.routes = [
+            (re.compile(r'/expenses/group/(?P<group_id>\d+)'), 'expenses.get_group_expenses', self.group_expenses),
+            (re.compile(r'/expenses/personal'), 'expenses.get_personal_expenses', self.personal_expenses),
+            (re.compile(r'/expenses/personal/summary'), 'expenses.get_expense_summary', self.expense_summary),
+            (re.compile(r'/groups/'), 'groups.get_user_groups', self.user_groups)
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for pattern, endpoint, view in self.routes:
+                match = pattern.fullmatch(scope['path'])
+                if match:
+                    kwargs = {name: int(value) for name, value in match.groupdict().items()}
+                    if await self.dispatch(scope, send, endpoint, view, kwargs):
+                        return
+                    break
+
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def dispatch(self, scope, send, endpoint, view, kwargs):
+        """Answer a request with an async view; False when Flask should answer it instead"""
+        started = metrics.begin()
+        request = ReadRequest(scope)
+
+        with self.flask_app.app_context():
+            async with self.sessions() as session:
+                identity, error = await self.authenticate(session, request)
+                if error:
+                    response = self.flask_app.json.response({'error': error})
+                    response.status_code = 401
+                else:
+                    response = await view(session, request, identity, **kwargs)
+
+            if response is None:
+                metrics.end(started)
+                return False
+
+            metrics.end(started, endpoint, 'GET', response.status_code)
+            await send({
+                'type': 'http.response.start',
+                'status': response.status_code,
+                'headers': [
+                    (name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in response.headers.items()
+                ]
+            })
+            await send({'type': 'http.response.body', 'body': response.get_data()})
+            return True
+
+    async def authenticate(self, session, request):
+        """Identity behind the bearer token as (identity, error); mirrors `token_required`"""
+        token = None
+        auth_header = request.headers.get('Authorization')
+        if auth_header:
+            try:
+                token = auth_header.split(" ")[1]  # Bearer <token>
+            except IndexError:
+                return None, 'Invalid token format'
+
+        if not token:
+            return None, 'Token is missing'
+
+        try:
+            payload = jwt.decode(token, self.flask_app.config['SECRET_KEY'], algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return None, 'Token has expired'
+        except jwt.InvalidTokenError:
+            return None, 'Invalid token'
+
+        identity = identity_cache.get(payload['user_id'])
+        claims = trusted_claims(payload, 'GET') if identity is None else None
+        if claims is not None:
+            row = (await session.execute(token_version_stmt(payload['user_id']))).first()
+            if not row:
+                return None, 'User not found'
+            identity = dict(claims, token_version=row.token_version or 0)
+            identity_cache.set(identity['id'], identity)
+        elif identity is None:
+            user = await session.get(User, payload['user_id'])
+            if not user:
+                return None, 'User not found'
+            identity = user_identity(user)
+            identity_cache.set(user.id, identity)
+
+        # Tokens issued before the last logout carry an older version
+        if payload.get('ver', 0) != identity['token_version']:
+            return None, 'Token has been revoked'
+
+        return identity, None
+
+    def respond(self, etag, payload=None):
+        """200 with the payload tagged with `etag`, or a 304 without a payload"""
+        if payload is None:
+            response = self.flask_app.response_class('', 304)
+        else:
+            response = self.flask_app.json.response(payload)
+        response.set_etag(etag)
+        return response
+
+    def error(self, message, status):
+        """JSON error response, shaped like the Flask views' errors"""
+        response = self.flask_app.json.response({"error": message})
+        response.status_code = status
+        return response
+
+    async def group_expenses(self, session, request, identity, group_id):
+        row = (await session.execute(group_version_stmt(identity['id'], group_id))).first()
+
+        # Unknown groups and non-members get the Flask view's 404/403
+        if row is None:
+            return None
+        etag = make_etag(('g', group_id, row.version or 0), request.query_string)
+        if request.if_none_match.contains(etag):
+            return self.respond(etag)
+
+        try:
+            limit, position = get_page_args(request.args)
+        except InvalidCursor:
+            return self.error("Invalid cursor", 400)
+
+        stmt = keyset_filter(group_expenses_stmt(group_id), Expense.date, Expense.id, limit, position)
+        expenses, next_cursor = page_rows((await session.scalars(stmt)).all(), limit)
+
+        splits = []
+        if expenses:
+            splits = (await session.scalars(
+                group_splits_stmt([expense.id for expense in expenses])
+            )).all()
+
+        return self.respond(etag, group_expenses_payload(expenses, splits, next_cursor))
+
+    async def personal_expenses(self, session, request, identity):
+        version = await session.scalar(user_version_stmt(identity['id']))
+        etag = make_etag(('u', identity['id'], version or 0), request.query_string)
+        if request.if_none_match.contains(etag):
+            return self.respond(etag)
+
+        try:
+            fields = personal_fields(request.args)
+        except InvalidFields:
+            return self.error("Fields must be among id, description, amount, date and category", 400)
+        try:
+            limit, position = get_page_args(request.args)
+        except InvalidCursor:
+            return self.error("Invalid cursor", 400)
+
+        stmt = personal_expenses_stmt(identity['id'], request.args, fields)
+        if not page_requested(request.args):
+            rows = (await session.execute(stmt.order_by(Expense.date.desc(), Expense.id.desc()))).all()
+            return self.respond(etag, personal_expenses_payload(rows, fields))
+
+        stmt = keyset_filter(stmt, Expense.date, Expense.id, limit, position)
+        rows, next_cursor = page_rows((await session.execute(stmt)).all(), limit)
+
+        return self.respond(etag, personal_expenses_payload(rows, fields, next_cursor, paginated=True))
+
+    async def expense_summary(self, session, request, identity):
+        version = await session.scalar(user_version_stmt(identity['id']))
+        etag = make_etag(('u', identity['id'], version or 0), request.query_string)
+        if request.if_none_match.contains(etag):
+            return self.respond(etag)
+
+        start_day, end_day = summary_days(request.args)
+        rows = (await session.execute(summary_stmt(identity['id'], start_day, end_day))).all()
+
+        return self.respond(etag, summary_payload(rows))
+
+    async def user_groups(self, session, request, identity):
+        membership_count, version_sum = (await session.execute(user_groups_version_stmt(identity['id']))).one()
+        etag = make_etag(('gl', identity['id'], membership_count, version_sum), request.query_string)
+        if request.if_none_match.contains(etag):
+            return self.respond(etag)
+
+        memberships = (await session.scalars(user_memberships_stmt(identity['id']))).all()
+
+        member_rows = None
+        if 'members' in request.args.get('include', '').split(','):
+            member_rows = []
+            if memberships:
+                member_rows = (await session.execute(
+                    group_members_stmt([membership.group_id for membership in memberships])
+                )).all()
+
+        return self.respond(etag, user_groups_payload(memberships, member_rows))
+
+def create_asgi_app():
+    """Build the Flask app and wrap it in the async read app"""
+    try:
+        import asgiref  # noqa: F401
+    except ImportError:
+        raise RuntimeError('The ASGI serving mode requires asgiref (pip install -r requirements-asgi.txt)')
+
+    app = create_app()
+    with app.app_context():
+        engine = create_async_read_engine(app, db.engines)
+    metrics.instrument_engine(engine.sync_engine)
+
+    return AsyncReadApp(app, engine)
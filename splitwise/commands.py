@@ -0,0 +1,233 @@
+import time
+from decimal import Decimal
+import click
+from flask import current_app, url_for
+from . import db
+from .models.group import GroupMembership
+from .utils.balances import compact_balances, rebuild_balances, verify_checkpoints
+from .utils.datagen import generate_data
+from .utils.jwt_utils import generate_token
+from .utils.money import from_cents
+from .utils.query_plan import capture_queries, explain, full_table_scans
+from .utils.rollups import backfill_rollups, check_rollups
+from .utils.search import rebuild_search_index, search_enabled
+
+# Query arguments the audited routes need to run their real queries
+SAMPLE_QUERY_ARGS = {
+    'expenses.search_expenses_view': {'q': 'dinner'}
+}
+
+@click.command('explain-routes')
+def explain_routes():
+    """Run EXPLAIN QUERY PLAN over the queries issued by every GET route."""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('explain-routes only supports SQLite databases')
+
+    # Drive the routes as a member of an existing group
+    membership = GroupMembership.query.order_by(GroupMembership.id).first()
+    if not membership:
+        raise click.ClickException('The database has no group memberships; seed some data first')
+
+    headers = {'Authorization': f'Bearer {generate_token(membership.user)}'}
+    sample_args = {'group_id': membership.group_id}
+
+    urls = []
+    with current_app.test_request_context():
+        for rule in current_app.url_map.iter_rules():
+            if 'GET' not in rule.methods or rule.endpoint == 'static':
+                continue
+            if not rule.arguments <= sample_args.keys():
+                continue
+            urls.append(url_for(
+                rule.endpoint,
+                **{arg: sample_args[arg] for arg in rule.arguments},
+                **SAMPLE_QUERY_ARGS.get(rule.endpoint, {})
+            ))
+
+    client = current_app.test_client()
+    offending = 0
+
+    for url in sorted(urls):
+        with capture_queries(db.engine) as captured:
+            response = client.get(url, headers=headers)
+            # Streamed bodies run their queries as they are read
+            response.get_data()
+            response.close()
+        click.echo(f'{url} [{response.status_code}]')
+
+        with db.engine.connect() as connection:
+            for statement, parameters in captured:
+                if not statement.lstrip().upper().startswith('SELECT'):
+                    continue
+                plan = explain(connection, statement, parameters)
+                scans = full_table_scans(plan)
+                marker = 'SCAN' if scans else 'ok'
+                click.echo(f'  [{marker}] {" ".join(statement.split())}')
+                for detail in plan:
+                    click.echo(f'      {detail}')
+                offending += bool(scans)
+
+    if offending:
+        click.echo(f'{offending} queries read a guarded table with a full table scan')
+        raise SystemExit(1)
+    click.echo('No full table scans on guarded tables')
+
+@click.command('rebuild-balances')
+@click.option('--group-id', type=int, help='Only rebuild the ledger of this group.')
+@click.option('--check', is_flag=True, help='Only report mismatches, do not rewrite the ledger.')
+def rebuild_balances_command(group_id, check):
+    """Recompute the group balance ledger from the raw expense splits."""
+    mismatches = rebuild_balances(group_id, apply=not check)
+
+    for gid, user_id, stored, expected in mismatches:
+        click.echo(f'group {gid} user {user_id}: ledger {from_cents(stored):.2f}, expected {from_cents(expected):.2f}')
+
+    if check:
+        if mismatches:
+            click.echo(f'{len(mismatches)} ledger entries are out of date')
+            raise SystemExit(1)
+        click.echo('Ledger matches the expense splits')
+    else:
+        click.echo(f'Ledger rebuilt, {len(mismatches)} entries corrected')
+
+@click.command('compact-balances')
+@click.option('--group-id', type=int, help='Only checkpoint this group.')
+@click.option('--min-expenses', type=int, default=1000, show_default=True,
+              help='Expenses a group needs past its latest checkpoint to get a new one.')
+@click.option('--keep', type=int, default=2, show_default=True, help='Checkpoints kept per group.')
+@click.option('--interval', type=float, help='Keep running, compacting every this many seconds.')
+def compact_balances_command(group_id, min_expenses, keep, interval):
+    """Write balance checkpoints so balance recomputations only read newer expenses."""
+    while True:
+        start = time.perf_counter()
+        written = compact_balances(group_id, min_expenses, keep)
+        click.echo(f'Wrote {written} checkpoints in {time.perf_counter() - start:.1f}s')
+        if not interval:
+            break
+        time.sleep(interval)
+
+@click.command('verify-checkpoints')
+@click.option('--group-id', type=int, help='Only verify the checkpoints of this group.')
+def verify_checkpoints_command(group_id):
+    """Check every balance checkpoint against a full recomputation from the raw splits."""
+    mismatches = verify_checkpoints(group_id)
+
+    for gid, watermark, user_id, stored, expected in mismatches:
+        click.echo(f'group {gid} up to expense {watermark} user {user_id}: '
+                   f'checkpoint {from_cents(stored):.2f}, expected {from_cents(expected):.2f}')
+
+    if mismatches:
+        click.echo(f'{len(mismatches)} checkpoint entries are wrong')
+        raise SystemExit(1)
+    click.echo('Checkpoints match the expense splits')
+
+@click.command('backfill-rollups')
+@click.option('--user-id', type=int, help='Only rebuild the rollups of this user.')
+def backfill_rollups_command(user_id):
+    """Rebuild the daily expense rollups from the raw personal expenses."""
+    count = backfill_rollups(user_id)
+    click.echo(f'Wrote {count} rollup rows')
+
+@click.command('check-rollups')
+@click.option('--user-id', type=int, help='Only check the rollups of this user.')
+def check_rollups_command(user_id):
+    """Check the daily expense rollups against the raw personal expenses."""
+    mismatches = check_rollups(user_id)
+
+    for uid, category_id, day, (stored_total, stored_count), (expected_total, expected_count) in mismatches:
+        click.echo(
+            f'user {uid} category {category_id} {day}: '
+            f'rollup {from_cents(stored_total):.2f} ({stored_count}), '
+            f'expected {from_cents(expected_total):.2f} ({expected_count})'
+        )
+
+    if mismatches:
+        click.echo(f'{len(mismatches)} rollup rows are out of date')
+        raise SystemExit(1)
+    click.echo('Rollups match the expenses')
+
+@click.command('rebuild-search')
+def rebuild_search_command():
+    """Recreate the full-text search index of expense descriptions and categories."""
+    if not search_enabled():
+        raise click.ClickException('Expense search requires SQLite with FTS5')
+    start = time.perf_counter()
+    count = rebuild_search_index()
+    click.echo(f'Indexed {count} expenses in {time.perf_counter() - start:.1f}s')
+
+def _pair(value, convert=int):
+    """Parse a 'low:high' option"""
+    try:
+        low, high = (convert(part) for part in value.split(':'))
+        reversed_bounds = low > high
+    except (ValueError, ArithmeticError):
+        # Decimal signals bad numbers (and NaN comparisons) with ArithmeticError
+        raise click.BadParameter(f'expected low:high, got {value!r}')
+    if reversed_bounds:
+        raise click.BadParameter(f'{low} is larger than {high}')
+    return low, high
+
+@click.command('generate-data')
+@click.option('--users', type=int, default=1000, show_default=True)
+@click.option('--groups', type=int, default=200, show_default=True)
+@click.option('--expenses', type=int, default=100000, show_default=True)
+@click.option('--seed', type=int, default=0, show_default=True, help='Same seed, same data.')
+@click.option('--personal-ratio', type=float, default=0.3, show_default=True,
+              help='Share of expenses that are personal.')
+@click.option('--categories-per-user', default='0:5', show_default=True, help='low:high categories per user.')
+@click.option('--uncategorized-ratio', type=float, default=0.2, show_default=True,
+              help='Share of personal expenses without a category.')
+@click.option('--group-size', default='2:8', show_default=True, help='low:high members per group.')
+@click.option('--group-skew', type=float, default=1.0, show_default=True,
+              help='Zipf exponent of group activity, 0 for uniform.')
+@click.option('--split-mix', default='50:25:25', show_default=True, help='equal:exact:percentage weights.')
+@click.option('--amount-range', default='1:500', show_default=True,
+              help='low:high expense amount, drawn log-uniformly.')
+@click.option('--days', type=int, default=365, show_default=True, help='Days the expense dates span.')
+@click.option('--password', default='password123', show_default=True, help='Password of every generated user.')
+@click.option('--workers', type=int, default=1, show_default=True,
+              help='Processes writing expense shards in parallel.')
+def generate_data_command(users, groups, expenses, seed, personal_ratio, categories_per_user,
+                          uncategorized_ratio, group_size, group_skew, split_mix, amount_range,
+                          days, password, workers):
+    """Bulk insert a synthetic dataset straight into the database."""
+    try:
+        split_weights = [float(weight) for weight in split_mix.split(':')]
+    except ValueError:
+        split_weights = []
+    if len(split_weights) != 3 or sum(split_weights) <= 0:
+        raise click.BadParameter(f'expected equal:exact:percentage weights, got {split_mix!r}')
+
+    start = time.perf_counter()
+    counts = generate_data(
+        current_app._get_current_object(),
+        users=users,
+        groups=groups,
+        expenses=expenses,
+        seed=seed,
+        personal_ratio=personal_ratio,
+        categories_per_user=_pair(categories_per_user),
+        uncategorized_ratio=uncategorized_ratio,
+        group_size=_pair(group_size),
+        group_skew=group_skew,
+        split_mix=split_weights,
+        amount_range=_pair(amount_range, Decimal),
+        days=days,
+        password=password,
+        workers=workers,
+        log=click.echo
+    )
+
+    click.echo(', '.join(f'{count} {name}' for name, count in counts.items()))
+    click.echo(f'Generated in {time.perf_counter() - start:.1f}s')
+
+def register_commands(app):
+    """Register the maintenance CLI commands on the app"""
+    app.cli.add_command(explain_routes)
+    app.cli.add_command(rebuild_balances_command)
+    app.cli.add_command(compact_balances_command)
+    app.cli.add_command(verify_checkpoints_command)
+    app.cli.add_command(backfill_rollups_command)
+    app.cli.add_command(check_rollups_command)
+    app.cli.add_command(rebuild_search_command)
+    app.cli.add_command(generate_data_command)
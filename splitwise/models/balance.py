@@ -0,0 +1,32 @@
+from datetime import datetime
+from .. import db
+
+class GroupBalance(db.Model):
+    """Materialized net balance of a user within a group.
+
+    Positive balances are owed to the user, negative balances are owed by
+    the user. Maintained incrementally on every group expense write.
+    """
+    __tablename__ = 'group_balance'
+    
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id', name='fk_balance_group_id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_balance_user_id'), primary_key=True)
+    balance_cents = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Relationships
+    user = db.relationship('User')
+
+class BalanceCheckpoint(db.Model):
+    """Immutable net balance of a user within a group up to an expense id.
+
+    A checkpoint covers every expense of its group with an id up to
+    `watermark`; expense ids only grow, so the expenses added later are the
+    ones above it. Written by compaction and never updated, only pruned.
+    """
+    __tablename__ = 'balance_checkpoint'
+    
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id', name='fk_checkpoint_group_id'), primary_key=True)
+    watermark = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_checkpoint_user_id'), primary_key=True)
+    balance_cents = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -1,6 +1,7 @@
 from enum import Enum
 from datetime import datetime
 from .. import db
+from ..utils.money import from_cents, to_cents
 
 class SplitType(Enum):
     EQUAL = 'equal'
@@ -10,6 +11,9 @@ class SplitType(Enum):
 class ExpenseCategory(db.Model):
     """Expense category model"""
     __tablename__ = 'expense_category'
+    __table_args__ = (
+        db.Index('ix_expense_category_user_id', 'user_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
@@ -23,10 +27,18 @@ class ExpenseCategory(db.Model):
 class Expense(db.Model):
     """Expense model"""
     __tablename__ = 'expense'
+    __table_args__ = (
+        # Group listing: WHERE group_id = ? ORDER BY date, id
+        db.Index('ix_expense_group_id_date', 'group_id', 'date', 'id'),
+        # Expenses past a balance checkpoint: WHERE group_id = ? AND id > ?
+        db.Index('ix_expense_group_id_id', 'group_id', 'id'),
+        # Personal listing/summary: WHERE paid_by_id = ? AND group_id IS NULL AND date ...
+        db.Index('ix_expense_paid_by_id_group_id_date', 'paid_by_id', 'group_id', 'date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(200), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount_cents = db.Column(db.Integer, nullable=False)
     date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     # Foreign Keys
@@ -39,16 +51,29 @@ class Expense(db.Model):
     group = db.relationship('Group', back_populates='expenses')
     splits = db.relationship('ExpenseSplit', back_populates='expense', lazy='dynamic')
     category = db.relationship('ExpenseCategory', back_populates='expenses')
+    
+    @property
+    def amount(self):
+        """Amount in currency units"""
+        return from_cents(self.amount_cents)
+    
+    @amount.setter
+    def amount(self, value):
+        self.amount_cents = to_cents(value)
 
 class ExpenseSplit(db.Model):
     """Expense split model"""
     __tablename__ = 'expense_split'
+    __table_args__ = (
+        db.Index('ix_expense_split_expense_id', 'expense_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     expense_id = db.Column(db.Integer, db.ForeignKey('expense.id', name='fk_split_expense_id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_split_user_id'), nullable=False)
     split_type = db.Column(db.Enum(SplitType), nullable=False)
     amount_or_percentage = db.Column(db.Float, nullable=False)
+    amount_cents = db.Column(db.Integer, nullable=False)  # share of the expense owed by the user
     
     # Relationships
     expense = db.relationship('Expense', back_populates='splits')
@@ -14,6 +14,11 @@ class Group(db.Model):
 
 class GroupMembership(db.Model):
     """Association between users and groups"""
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'group_id', name='uq_group_membership_user_id_group_id'),
+        db.Index('ix_group_membership_group_id', 'group_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
@@ -0,0 +1,24 @@
+from .. import db
+
+class DailyExpenseRollup(db.Model):
+    """Per-(user, category, day) totals of personal expenses.
+
+    Maintained on write so summaries never scan the raw expense table. A
+    NULL category holds the uncategorized expenses; the unique key treats it
+    as category 0 so there is a single uncategorized row per day too.
+    """
+    __tablename__ = 'expense_daily_rollup'
+    __table_args__ = (
+        db.Index('ix_expense_daily_rollup_user_id_day', 'user_id', 'day', 'category_id'),
+        db.Index('uq_expense_daily_rollup_key', 'user_id', db.text('coalesce(category_id, 0)'), 'day', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_rollup_user_id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('expense_category.id', name='fk_rollup_category_id'))
+    day = db.Column(db.Date, nullable=False)
+    total_cents = db.Column(db.Integer, nullable=False, default=0)
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Relationships
+    category = db.relationship('ExpenseCategory')
@@ -1,5 +1,5 @@
-from werkzeug.security import generate_password_hash, check_password_hash
 from .. import db
+from ..utils.passwords import password_hasher
 
 class User(db.Model):
     """User account model"""
@@ -7,6 +7,7 @@ class User(db.Model):
     username = db.Column(db.String(50), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # bumped to revoke tokens
     
     # Relationships
     expenses = db.relationship('Expense', back_populates='paid_by', lazy='dynamic')
@@ -15,8 +16,8 @@ class User(db.Model):
 
     def set_password(self, password):
         """Create hashed password."""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """Check hashed password."""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
@@ -0,0 +1,13 @@
+from .. import db
+
+class ChangeVersion(db.Model):
+    """Change counter of a user's or a group's data, bumped by every write.
+
+    Read endpoints derive their ETags from it so unchanged responses can be
+    answered with a 304 before running any expensive query.
+    """
+    __tablename__ = 'change_version'
+    
+    scope = db.Column(db.String(20), primary_key=True)  # user, group
+    key = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
@@ -1,11 +1,13 @@
 from flask import Blueprint, request, jsonify
 from ..models.user import User
 from .. import db
-from ..utils.jwt_utils import generate_token, token_required
+from ..utils.jwt_utils import generate_token, revoke_tokens, token_required
+from ..utils.passwords import password_hasher
 
 auth = Blueprint('auth', __name__)
 
 @auth.route('/register', methods=['POST'])
+@password_hasher.limited
 def register():
     """User registration endpoint"""
     data = request.get_json()
@@ -31,7 +33,7 @@ def register():
     db.session.commit()
     
     # Generate token
-    token = generate_token(new_user.id)
+    token = generate_token(new_user)
     
     return jsonify({
         "message": "User registered successfully",
@@ -40,13 +42,19 @@ def register():
     }), 201
 
 @auth.route('/login', methods=['POST'])
+@password_hasher.limited
 def login():
     """User login endpoint"""
     data = request.get_json()
     user = User.query.filter_by(email=data.get('email')).first()
     
     if user and user.check_password(data.get('password')):
-        token = generate_token(user.id)
+        # Upgrade hashes made with an older method or cost while we have the password
+        if password_hasher.needs_rehash(user.password_hash):
+            user.set_password(data.get('password'))
+            db.session.commit()
+        
+        token = generate_token(user)
         return jsonify({
             "message": "Login successful",
             "user_id": user.id,
@@ -59,6 +67,7 @@ def login():
 @token_required
 def logout(current_user):
     """User logout endpoint"""
+    revoke_tokens(current_user)
     return jsonify({"message": "Logged out successfully"}), 200
 
 @auth.route('/profile', methods=['GET'])
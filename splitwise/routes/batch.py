@@ -0,0 +1,23 @@
+from flask import Blueprint, current_app, request, jsonify
+from ..utils.batch import BatchError, BatchRunner, parse_operations
+from ..utils.jwt_utils import token_required
+
+batch = Blueprint('batch', __name__)
+
+@batch.route('/batch', methods=['POST'])
+@token_required
+def run_batch(current_user):
+    """Run an ordered list of expense and group operations in one request and one transaction"""
+    data = request.get_json(silent=True)
+    
+    try:
+        operations = parse_operations(data, current_app.config['BATCH_MAX_OPERATIONS'])
+    except BatchError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    results, committed = BatchRunner(current_user, atomic=bool(data.get('atomic'))).run(operations)
+    
+    return jsonify({
+        "results": results,
+        "committed": committed
+    }), 200
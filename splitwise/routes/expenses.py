@@ -1,9 +1,31 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from datetime import datetime
-from ..models.expense import Expense, ExpenseSplit, SplitType, ExpenseCategory
+from ..models.expense import Expense, SplitType, ExpenseCategory
 from ..models.group import Group, GroupMembership
+from ..models.user import User
 from .. import db
+from ..utils.cache import cached, invalidate, user_tag
+from ..utils.bulk_import import ExpenseImporter, iter_csv_rows, iter_ndjson_rows
+from ..utils.export import EXPORT_FORMATS, stream_export
+from ..utils.json_provider import STREAM_BATCH_SIZE
 from ..utils.jwt_utils import token_required
+from ..utils.money import MINOR_UNITS, from_cents, to_cents
+from ..utils.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, get_page_args, keyset_filter, page_requested, page_rows
+)
+from ..utils.reads import (
+    InvalidFields, filter_personal_expenses, group_expenses_payload, group_expenses_stmt, group_splits_stmt,
+    personal_expense_item, personal_expenses_payload, personal_expenses_stmt, personal_fields,
+    summary_days, summary_payload
+)
+from ..utils.rollups import summarize
+from ..utils.search import (
+    SCOPES, decode_offset, match_query, search_enabled, search_expenses
+)
+from ..utils.splits import SplitError, parse_splits
+from ..utils.trends import TrendError, category_trends, member_trends, trend_args, trends_enabled
+from ..utils.versions import USER, bump_version, conditional, group_etag, user_etag
+from ..utils.write_queue import WriteQueueError, save_expense
 
 expenses = Blueprint('expenses', __name__)
 
@@ -32,64 +54,64 @@ def create_expense(current_user):
         if not is_member:
             return jsonify({"error": "You are not a member of this group"}), 403
     
-    # Create expense
-    new_expense = Expense(
-        description=data.get('description'),
-        amount=data.get('amount'),
-        paid_by=current_user,
-        group=group
-    )
-    db.session.add(new_expense)
-    
-    # Handle expense splits
-    split_type = data.get('split_type', 'equal')
-    split_details = data.get('splits', [])
-    
-    if split_type == 'equal':
-        # Equal split among all specified users
-        total_users = len(split_details)
-        split_amount = new_expense.amount / total_users
-        
-        for user_data in split_details:
-            split = ExpenseSplit(
-                expense=new_expense,
-                user_id=user_data['user_id'],
-                split_type=SplitType.EQUAL,
-                amount_or_percentage=split_amount
-            )
-            db.session.add(split)
-    
-    elif split_type == 'exact':
-        # Exact amount split
-        for user_data in split_details:
-            split = ExpenseSplit(
-                expense=new_expense,
-                user_id=user_data['user_id'],
-                split_type=SplitType.EXACT,
-                amount_or_percentage=user_data['amount']
-            )
-            db.session.add(split)
-    
-    elif split_type == 'percentage':
-        # Percentage-based split
-        for user_data in split_details:
-            split = ExpenseSplit(
-                expense=new_expense,
-                user_id=user_data['user_id'],
-                split_type=SplitType.PERCENTAGE,
-                amount_or_percentage=user_data['percentage']
-            )
-            db.session.add(split)
-    
-    db.session.commit()
+    try:
+        amount_cents = to_cents(data.get('amount'))
+    except ValueError:
+        return jsonify({"error": "Invalid amount"}), 400
+    
+    # Validate expense splits
+    try:
+        splits = parse_splits(data.get('split_type', 'equal'), data.get('splits', []), amount_cents)
+    except SplitError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    if group:
+        # Splits may only be assigned to members of the group
+        split_user_ids = {split[0] for split in splits}
+        member_count = GroupMembership.query.filter(
+            GroupMembership.group_id == group.id,
+            GroupMembership.user_id.in_(split_user_ids)
+        ).count()
+        if member_count != len(split_user_ids):
+            return jsonify({"error": "Splits must only include group members"}), 400
+    
+    # Write the expense, its splits, the ledger or rollups and the search index
+    try:
+        expense_id = save_expense({
+            'description': data.get('description'),
+            'amount_cents': amount_cents,
+            'date': datetime.utcnow(),
+            'paid_by_id': current_user.id,
+            'group_id': group.id if group else None,
+            'category_id': None
+        }, splits)
+    except WriteQueueError:
+        return jsonify({"error": "Could not save the expense"}), 503
     
     return jsonify({
         "message": "Expense created successfully",
-        "expense_id": new_expense.id
+        "expense_id": expense_id
     }), 201
 
+@expenses.route('/bulk', methods=['POST'])
+@token_required
+def bulk_import_expenses(current_user):
+    """Import many expenses from an NDJSON or CSV request body"""
+    # The body is parsed line by line as it streams in, never buffered whole
+    if request.mimetype == 'text/csv':
+        rows = iter_csv_rows(request.stream)
+    elif request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        rows = iter_ndjson_rows(request.stream)
+    else:
+        return jsonify({"error": "Body must be NDJSON (application/x-ndjson) or CSV (text/csv)"}), 415
+    
+    report = ExpenseImporter(current_user).run(rows)
+    
+    return jsonify(report), 200
+
 @expenses.route('/group/<int:group_id>', methods=['GET'])
 @token_required
+@conditional(group_etag)
 def get_group_expenses(current_user, group_id):
     """Retrieve expenses for a specific group"""
     group = Group.query.get_or_404(group_id)
@@ -102,29 +124,83 @@ def get_group_expenses(current_user, group_id):
     if not is_member:
         return jsonify({"error": "Not authorized to view group expenses"}), 403
     
-    expenses = group.expenses.order_by(Expense.date.desc()).all()
+    try:
+        limit, position = get_page_args()
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor"}), 400
     
-    expense_list = []
-    for expense in expenses:
-        expense_data = {
-            "id": expense.id,
-            "description": expense.description,
-            "amount": expense.amount,
-            "date": expense.date,
-            "paid_by": expense.paid_by.username,
-            "splits": []
-        }
-        
-        for split in expense.splits:
-            expense_data['splits'].append({
-                "user": split.user.username,
-                "split_type": split.split_type.value,
-                "amount": split.amount_or_percentage
-            })
-        
-        expense_list.append(expense_data)
+    # Page of expenses with their payers loaded in the same query
+    stmt = keyset_filter(group_expenses_stmt(group.id), Expense.date, Expense.id, limit, position)
+    expenses, next_cursor = page_rows(db.session.execute(stmt).scalars().all(), limit)
+    
+    # Load the splits of the whole page (and their users) in one query
+    splits = []
+    if expenses:
+        splits = db.session.execute(
+            group_splits_stmt([expense.id for expense in expenses])
+        ).scalars().all()
+    
+    return jsonify(group_expenses_payload(expenses, splits, next_cursor)), 200
+
+@expenses.route('/group/<int:group_id>/trends', methods=['GET'])
+@token_required
+@conditional(group_etag)
+@cached('group:{group_id}')
+def get_group_trends(current_user, group_id):
+    """Weekly or monthly spend of every member of a group, with moving averages and deltas"""
+    if not trends_enabled():
+        return jsonify({"error": "Trends require the 'numpy' package"}), 501
+    
+    group = Group.query.get_or_404(group_id)
+    
+    # Check if user is a member of the group
+    is_member = GroupMembership.query.filter_by(
+        user=current_user,
+        group=group
+    ).first()
+    if not is_member:
+        return jsonify({"error": "Not authorized to view group expenses"}), 403
+    
+    try:
+        granularity, window, start_day, end_day = trend_args(request.args)
+        trends = member_trends(group.id, granularity, window, start_day, end_day)
+    except TrendError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify(trends), 200
+
+@expenses.route('/group/<int:group_id>/export', methods=['GET'])
+@token_required
+def export_group_expenses(current_user, group_id):
+    """Stream the expenses of a group as CSV or NDJSON"""
+    group = Group.query.get_or_404(group_id)
+    
+    # Check if user is a member of the group
+    is_member = GroupMembership.query.filter_by(
+        user=current_user,
+        group=group
+    ).first()
+    if not is_member:
+        return jsonify({"error": "Not authorized to view group expenses"}), 403
+    
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": "Format must be csv or ndjson"}), 400
+    
+    query = db.session.query(
+        Expense.id,
+        Expense.date,
+        Expense.description,
+        (Expense.amount_cents / float(MINOR_UNITS)).label('amount'),
+        User.username.label('paid_by')
+    ).join(
+        User,
+        User.id == Expense.paid_by_id
+    ).filter(
+        Expense.group_id == group.id
+    ).order_by(Expense.date.desc(), Expense.id.desc())
     
-    return jsonify(expense_list), 200
+    return stream_export(query, export_format, f'group_{group.id}_expenses')
 
 @expenses.route('/categories', methods=['POST'])
 @token_required
@@ -142,6 +218,8 @@ def create_category(current_user):
     )
     
     db.session.add(category)
+    bump_version(USER, current_user.id)
+    invalidate(user_tag(current_user.id))
     db.session.commit()
     
     return jsonify({
@@ -155,6 +233,8 @@ def create_category(current_user):
 
 @expenses.route('/categories', methods=['GET'])
 @token_required
+@conditional(user_etag)
+@cached('user:{user_id}')
 def get_categories(current_user):
     """Get all expense categories for the current user"""
     categories = current_user.categories.all()
@@ -182,127 +262,170 @@ def create_personal_expense(current_user):
         if not category or category.user_id != current_user.id:
             return jsonify({"error": "Invalid category"}), 400
     
-    # Create expense
-    expense = Expense(
-        description=data.get('description'),
-        amount=data.get('amount'),
-        date=datetime.fromisoformat(data.get('date', datetime.utcnow().isoformat())),
-        paid_by=current_user,
-        category=category
-    )
-    
-    db.session.add(expense)
-    
-    # Create a single split for the personal expense
-    split = ExpenseSplit(
-        expense=expense,
-        user=current_user,
-        split_type=SplitType.EXACT,
-        amount_or_percentage=expense.amount
-    )
-    db.session.add(split)
-    
-    db.session.commit()
+    try:
+        amount_cents = to_cents(data.get('amount'))
+    except ValueError:
+        return jsonify({"error": "Invalid amount"}), 400
+    
+    date = datetime.fromisoformat(data.get('date', datetime.utcnow().isoformat()))
+    
+    # Personal expenses get a single split for the payer
+    try:
+        expense_id = save_expense({
+            'description': data.get('description'),
+            'amount_cents': amount_cents,
+            'date': date,
+            'paid_by_id': current_user.id,
+            'group_id': None,
+            'category_id': category.id if category else None
+        }, [(current_user.id, SplitType.EXACT, from_cents(amount_cents), amount_cents)])
+    except WriteQueueError:
+        return jsonify({"error": "Could not save the expense"}), 503
     
     return jsonify({
         "message": "Personal expense created successfully",
         "expense": {
-            "id": expense.id,
-            "description": expense.description,
-            "amount": expense.amount,
-            "date": expense.date.isoformat(),
+            "id": expense_id,
+            "description": data.get('description'),
+            "amount": from_cents(amount_cents),
+            "date": date.isoformat(),
             "category": category.name if category else None
         }
     }), 201
 
 @expenses.route('/personal', methods=['GET'])
 @token_required
+@conditional(user_etag)
 def get_personal_expenses(current_user):
     """Get personal expenses with optional filters"""
-    # Get query parameters
-    category_id = request.args.get('category_id', type=int)
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    
-    # Base query
-    query = Expense.query.filter(
-        Expense.paid_by == current_user,
-        Expense.group_id.is_(None)  # Personal expenses have no group
-    )
-    
-    # Apply filters
-    if category_id:
-        query = query.filter(Expense.category_id == category_id)
-    
-    if start_date:
-        query = query.filter(Expense.date >= datetime.fromisoformat(start_date))
-    
-    if end_date:
-        query = query.filter(Expense.date <= datetime.fromisoformat(end_date))
+    try:
+        fields = personal_fields(request.args)
+    except InvalidFields:
+        return jsonify({"error": "Fields must be among id, description, amount, date and category"}), 400
+    
+    # Only the requested columns are read; categories come from a join in the same query
+    stmt = personal_expenses_stmt(current_user.id, request.args, fields)
+    
+    if page_requested(request.args):
+        try:
+            limit, position = get_page_args()
+        except InvalidCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
+        
+        stmt = keyset_filter(stmt, Expense.date, Expense.id, limit, position)
+        rows, next_cursor = page_rows(db.session.execute(stmt).all(), limit)
+        return jsonify(personal_expenses_payload(rows, fields, next_cursor, paginated=True)), 200
     
-    # Get results ordered by date
-    expenses = query.order_by(Expense.date.desc()).all()
+    # Without `limit` or `cursor` every row is sent, fetched and encoded in batches
+    rows = db.session.execute(
+        stmt.order_by(Expense.date.desc(), Expense.id.desc()).execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
     
-    return jsonify([{
-        "id": exp.id,
-        "description": exp.description,
-        "amount": exp.amount,
-        "date": exp.date.isoformat(),
-        "category": exp.category.name if exp.category else None
-    } for exp in expenses]), 200
+    return current_app.json.stream_array(personal_expense_item(row, fields) for row in rows), 200
 
-@expenses.route('/personal/summary', methods=['GET'])
+@expenses.route('/personal/export', methods=['GET'])
 @token_required
-def get_expense_summary(current_user):
-    """Get summary of personal expenses by category"""
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
+def export_personal_expenses(current_user):
+    """Stream personal expenses as CSV or NDJSON"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": "Format must be csv or ndjson"}), 400
     
-    # Base query for personal expenses
     query = db.session.query(
-        ExpenseCategory.name,
-        db.func.sum(Expense.amount).label('total')
-    ).join(
-        Expense,
+        Expense.id,
+        Expense.date,
+        Expense.description,
+        (Expense.amount_cents / float(MINOR_UNITS)).label('amount'),
+        ExpenseCategory.name.label('category')
+    ).outerjoin(
+        ExpenseCategory,
         ExpenseCategory.id == Expense.category_id
-    ).filter(
-        Expense.paid_by == current_user,
-        Expense.group_id.is_(None)
     )
+    query = filter_personal_expenses(query, current_user.id, request.args)
     
-    # Apply date filters
-    if start_date:
-        query = query.filter(Expense.date >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.filter(Expense.date <= datetime.fromisoformat(end_date))
+    return stream_export(
+        query.order_by(Expense.date.desc(), Expense.id.desc()),
+        export_format,
+        'personal_expenses'
+    )
+
+@expenses.route('/personal/summary', methods=['GET'])
+@token_required
+@conditional(user_etag)
+@cached('user:{user_id}')
+def get_expense_summary(current_user):
+    """Get summary of personal expenses by category"""
+    # Rollups are kept per day, so the date filters cover whole days
+    start_day, end_day = summary_days(request.args)
     
-    # Group by category and get results
-    summary = query.group_by(ExpenseCategory.name).all()
+    # Categorized and uncategorized totals come back from a single query
+    rows = summarize(current_user.id, start_day, end_day)
     
-    # Also get total uncategorized expenses
-    uncategorized = db.session.query(
-        db.func.sum(Expense.amount)
-    ).filter(
-        Expense.paid_by == current_user,
-        Expense.group_id.is_(None),
-        Expense.category_id.is_(None)
-    )
+    return jsonify(summary_payload(rows)), 200
+
+@expenses.route('/personal/trends', methods=['GET'])
+@token_required
+@conditional(user_etag)
+@cached('user:{user_id}')
+def get_expense_trends(current_user):
+    """Weekly or monthly spend per category, with moving averages and deltas"""
+    if not trends_enabled():
+        return jsonify({"error": "Trends require the 'numpy' package"}), 501
+    
+    try:
+        granularity, window, start_day, end_day = trend_args(request.args)
+        trends = category_trends(current_user.id, granularity, window, start_day, end_day)
+    except TrendError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify(trends), 200
+
+@expenses.route('/search', methods=['GET'])
+@token_required
+def search_expenses_view(current_user):
+    """Full-text search over the descriptions and categories of the user's expenses"""
+    if not search_enabled():
+        return jsonify({"error": "Expense search is not available on this database"}), 501
+    
+    query = match_query(request.args.get('q'))
+    if query is None:
+        return jsonify({"error": "Search text is required"}), 400
+    
+    scope = request.args.get('scope', 'all')
+    if scope not in SCOPES:
+        return jsonify({"error": "Scope must be all, personal or groups"}), 400
+    
+    # Narrow the search to one group the user belongs to
+    group_id = request.args.get('group_id', type=int)
+    if group_id is not None:
+        group = Group.query.get_or_404(group_id)
+        is_member = GroupMembership.query.filter_by(
+            user=current_user,
+            group=group
+        ).first()
+        if not is_member:
+            return jsonify({"error": "Not authorized to view group expenses"}), 403
     
-    if start_date:
-        uncategorized = uncategorized.filter(Expense.date >= datetime.fromisoformat(start_date))
-    if end_date:
-        uncategorized = uncategorized.filter(Expense.date <= datetime.fromisoformat(end_date))
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
     
-    uncategorized_total = uncategorized.scalar() or 0
+    try:
+        cursor = request.args.get('cursor')
+        offset = decode_offset(cursor) if cursor else 0
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor"}), 400
     
-    # Combine results
-    result = {
-        "by_category": [{
-            "category": name,
-            "total": float(total)
-        } for name, total in summary],
-        "uncategorized": float(uncategorized_total),
-        "total": float(sum(total for _, total in summary) + uncategorized_total)
-    }
+    results, next_cursor = search_expenses(current_user.id, query, scope, group_id, limit, offset)
     
-    return jsonify(result), 200
+    return jsonify({
+        "expenses": [{
+            "id": expense.id,
+            "description": expense.description,
+            "amount": expense.amount,
+            "date": expense.date,
+            "category": expense.category.name if expense.category else None,
+            "group_id": expense.group_id,
+            "paid_by": expense.paid_by.username
+        } for expense in results],
+        "next_cursor": next_cursor
+    }), 200
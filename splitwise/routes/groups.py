@@ -1,8 +1,14 @@
 from flask import Blueprint, request, jsonify
+from ..models.balance import GroupBalance
 from ..models.group import Group, GroupMembership
 from ..models.user import User
 from .. import db
+from ..utils.cache import cached, group_tag, invalidate, user_tag
 from ..utils.jwt_utils import token_required
+from ..utils.money import from_cents
+from ..utils.reads import group_members_stmt, user_groups_payload, user_memberships_stmt
+from ..utils.settlement import get_settlement_plan
+from ..utils.versions import GROUP, bump_version, conditional, user_groups_etag
 
 groups = Blueprint('groups', __name__)
 
@@ -42,7 +48,9 @@ def create_group(current_user):
                 role='member'
             )
             db.session.add(member_membership)
+            invalidate(user_tag(user.id))
     
+    invalidate(user_tag(current_user.id))
     db.session.commit()
     
     return jsonify({
@@ -52,32 +60,25 @@ def create_group(current_user):
 
 @groups.route('/', methods=['GET'])
 @token_required
+@conditional(user_groups_etag)
+@cached('user:{user_id}')
 def get_user_groups(current_user):
     """Retrieve groups for the current user"""
-    user_groups = []
-    
-    for membership in current_user.group_memberships:
-        group = membership.group
-        group_data = {
-            "id": group.id,
-            "name": group.name,
-            "description": group.description,
-            "created_at": group.created_at,
-            "role": membership.role,
-            "members": []
-        }
-        
-        # Get group members
-        for member_ship in group.memberships:
-            group_data['members'].append({
-                "id": member_ship.user.id,
-                "username": member_ship.user.username,
-                "role": member_ship.role
-            })
-        
-        user_groups.append(group_data)
-    
-    return jsonify(user_groups), 200
+    include = request.args.get('include', '').split(',')
+    
+    # The user's memberships and their groups in a single joined query
+    memberships = db.session.execute(user_memberships_stmt(current_user.id)).scalars().all()
+    
+    # Members of every listed group in one more query, only when asked for
+    member_rows = None
+    if 'members' in include:
+        member_rows = []
+        if memberships:
+            member_rows = db.session.execute(
+                group_members_stmt([membership.group_id for membership in memberships])
+            ).all()
+    
+    return jsonify(user_groups_payload(memberships, member_rows)), 200
 
 @groups.route('/<int:group_id>/add_member', methods=['POST'])
 @token_required
@@ -121,9 +122,86 @@ def add_group_member(current_user, group_id):
         role='member'
     )
     db.session.add(new_membership)
+    bump_version(GROUP, group.id)
+    
+    # Every member's group listing shows the new member
+    member_ids = [member_id for member_id, in group.memberships.with_entities(GroupMembership.user_id)]
+    invalidate(group_tag(group.id), *(user_tag(member_id) for member_id in member_ids))
     db.session.commit()
     
     return jsonify({
         "message": "Member added successfully",
         "user_id": user.id
     }), 201
+
+@groups.route('/<int:group_id>/balances', methods=['GET'])
+@token_required
+@cached('group:{group_id}')
+def get_group_balances(current_user, group_id):
+    """Net balance of every member of a group"""
+    group = Group.query.get_or_404(group_id)
+    
+    # Check if user is a member of the group
+    is_member = GroupMembership.query.filter_by(
+        user=current_user,
+        group=group
+    ).first()
+    if not is_member:
+        return jsonify({"error": "Not authorized to view group balances"}), 403
+    
+    # One row per member, read straight from the ledger
+    rows = db.session.query(
+        User.id,
+        User.username,
+        GroupBalance.balance_cents
+    ).join(
+        GroupMembership,
+        GroupMembership.user_id == User.id
+    ).outerjoin(
+        GroupBalance,
+        (GroupBalance.group_id == GroupMembership.group_id) & (GroupBalance.user_id == User.id)
+    ).filter(
+        GroupMembership.group_id == group.id
+    ).order_by(User.id).all()
+    
+    return jsonify({
+        "group_id": group.id,
+        "balances": [{
+            "user_id": user_id,
+            "username": username,
+            "balance": from_cents(balance or 0)
+        } for user_id, username, balance in rows]
+    }), 200
+
+@groups.route('/<int:group_id>/settle_up', methods=['GET'])
+@token_required
+def get_settle_up_plan(current_user, group_id):
+    """Fewest transfers that settle all debts within a group"""
+    group = Group.query.get_or_404(group_id)
+    
+    # Check if user is a member of the group
+    is_member = GroupMembership.query.filter_by(
+        user=current_user,
+        group=group
+    ).first()
+    if not is_member:
+        return jsonify({"error": "Not authorized to view group balances"}), 403
+    
+    plan = get_settlement_plan(group.id)
+    
+    # Resolve usernames of everyone involved in a single query
+    user_ids = {user_id for transfer in plan for user_id in transfer[:2]}
+    usernames = dict(
+        db.session.query(User.id, User.username).filter(User.id.in_(user_ids))
+    ) if user_ids else {}
+    
+    return jsonify({
+        "group_id": group.id,
+        "transfers": [{
+            "from_user_id": debtor,
+            "from": usernames.get(debtor),
+            "to_user_id": creditor,
+            "to": usernames.get(creditor),
+            "amount": from_cents(cents)
+        } for debtor, creditor, cents in plan]
+    }), 200
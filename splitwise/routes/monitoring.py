@@ -0,0 +1,19 @@
+from flask import Blueprint, Response, jsonify
+from ..utils.cache import response_cache
+from ..utils.identity_cache import identity_cache
+from ..utils.metrics import metrics
+
+monitoring = Blueprint('monitoring', __name__)
+
+@monitoring.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Hit ratios of the response and identity caches of this worker"""
+    return jsonify({
+        "responses": response_cache.stats(),
+        "identities": identity_cache.stats()
+    }), 200
+
+@monitoring.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request, SQL and cache metrics of this worker in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,238 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, text
+from .. import db
+from ..models.balance import BalanceCheckpoint, GroupBalance
+from ..models.expense import Expense, ExpenseSplit
+
+def expense_balance_deltas(group_id, payer_id, amount_cents, shares, deltas=None):
+    """Accumulate the balance changes (in cents) caused by one group expense.
+
+    `shares` is an iterable of (user_id, owed_cents) pairs. Deltas are keyed
+    by (group_id, user_id) so several expenses can be folded together and
+    applied at once.
+    """
+    if deltas is None:
+        deltas = defaultdict(int)
+
+    deltas[(group_id, payer_id)] += amount_cents
+    for user_id, owed_cents in shares:
+        deltas[(group_id, user_id)] -= owed_cents
+
+    return deltas
+
+def apply_balance_deltas(deltas):
+    """Add balance deltas to the ledger within the current transaction"""
+    table = GroupBalance.__table__
+    for (group_id, user_id), delta in deltas.items():
+        result = db.session.execute(
+            table.update().where(
+                table.c.group_id == group_id,
+                table.c.user_id == user_id
+            ).values(balance_cents=table.c.balance_cents + delta)
+        )
+        if result.rowcount == 0:
+            db.session.execute(
+                table.insert().values(group_id=group_id, user_id=user_id, balance_cents=delta)
+            )
+
+def latest_watermarks(group_id=None, upto=None):
+    """Subquery of the newest checkpoint watermark of every group (at most `upto`)"""
+    stmt = select(
+        BalanceCheckpoint.group_id,
+        db.func.max(BalanceCheckpoint.watermark).label('watermark')
+    ).group_by(BalanceCheckpoint.group_id)
+
+    if group_id is not None:
+        stmt = stmt.where(BalanceCheckpoint.group_id == group_id)
+    if upto is not None:
+        stmt = stmt.where(BalanceCheckpoint.watermark <= upto)
+
+    return stmt.subquery()
+
+def compute_group_balances(group_id=None, upto=None, checkpoints=True):
+    """Recompute net balances (in cents) from the raw expenses and splits.
+
+    Returns a {(group_id, user_id): balance_cents} dict covering one group,
+    or all groups when no group_id is given, counting the expenses with an
+    id up to `upto` when one is given. Groups with a checkpoint start from
+    their latest one and only read the expenses after it; pass
+    `checkpoints=False` to scan every expense.
+    """
+    balances = defaultdict(int)
+
+    paid = db.session.query(
+        Expense.group_id,
+        Expense.paid_by_id,
+        db.func.sum(Expense.amount_cents)
+    ).filter(Expense.group_id.isnot(None))
+
+    owed = db.session.query(
+        Expense.group_id,
+        ExpenseSplit.user_id,
+        db.func.sum(ExpenseSplit.amount_cents)
+    ).join(
+        Expense,
+        Expense.id == ExpenseSplit.expense_id
+    ).filter(Expense.group_id.isnot(None))
+
+    if group_id is not None:
+        paid = paid.filter(Expense.group_id == group_id)
+        owed = owed.filter(Expense.group_id == group_id)
+    if upto is not None:
+        paid = paid.filter(Expense.id <= upto)
+        owed = owed.filter(Expense.id <= upto)
+
+    if checkpoints:
+        watermarks = latest_watermarks(group_id, upto)
+        for gid, user_id, balance in db.session.query(
+            BalanceCheckpoint.group_id,
+            BalanceCheckpoint.user_id,
+            BalanceCheckpoint.balance_cents
+        ).join(
+            watermarks,
+            (watermarks.c.group_id == BalanceCheckpoint.group_id) &
+            (watermarks.c.watermark == BalanceCheckpoint.watermark)
+        ):
+            balances[(gid, user_id)] += balance
+
+        if group_id is not None:
+            # A literal bound lets one group's read be an index range
+            watermark = db.session.query(watermarks.c.watermark).scalar() or 0
+            paid = paid.filter(Expense.id > watermark)
+            owed = owed.filter(Expense.id > watermark)
+        else:
+            paid = paid.outerjoin(
+                watermarks,
+                watermarks.c.group_id == Expense.group_id
+            ).filter(Expense.id > db.func.coalesce(watermarks.c.watermark, 0))
+            owed = owed.outerjoin(
+                watermarks,
+                watermarks.c.group_id == Expense.group_id
+            ).filter(Expense.id > db.func.coalesce(watermarks.c.watermark, 0))
+
+    for gid, user_id, total in paid.group_by(Expense.group_id, Expense.paid_by_id):
+        balances[(gid, user_id)] += total or 0
+    for gid, user_id, total in owed.group_by(Expense.group_id, ExpenseSplit.user_id):
+        balances[(gid, user_id)] -= total or 0
+
+    return balances
+
+def compact_balances(group_id=None, min_expenses=1, keep=2):
+    """Checkpoint the groups with at least `min_expenses` expenses past their latest checkpoint.
+
+    Each checkpoint is built from the previous one plus the newer expenses
+    and committed on its own, so compaction never holds the write lock for
+    long. Only the newest `keep` checkpoints of a group are kept. Returns
+    the number of checkpoints written.
+
+    The watermark is the group's highest committed expense id, which assumes
+    ids commit in increasing order: an expense committing later with a lower
+    id would never be counted. SQLite allocates ids under its single writer
+    lock; on PostgreSQL the expense table is locked in share mode while the
+    watermarks are chosen so in-flight inserts commit first. Writers that
+    preassign ids, like the `generate-data` shards, must not run meanwhile.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        # Released by the first checkpoint's commit, once the watermarks are chosen
+        db.session.execute(text('LOCK TABLE expense IN SHARE MODE'))
+
+    watermarks = latest_watermarks(group_id)
+    pending = db.session.query(
+        Expense.group_id,
+        db.func.max(Expense.id)
+    ).outerjoin(
+        watermarks,
+        watermarks.c.group_id == Expense.group_id
+    ).filter(
+        Expense.group_id.isnot(None),
+        Expense.id > db.func.coalesce(watermarks.c.watermark, 0)
+    )
+    if group_id is not None:
+        pending = pending.filter(Expense.group_id == group_id)
+    pending = pending.group_by(Expense.group_id).having(db.func.count() >= min_expenses).all()
+
+    for gid, watermark in pending:
+        # Zero balances are written too, so every checkpoint keeps its watermark
+        balances = compute_group_balances(gid, upto=watermark)
+        db.session.execute(BalanceCheckpoint.__table__.insert(), [{
+            'group_id': gid,
+            'watermark': watermark,
+            'user_id': user_id,
+            'balance_cents': balance,
+            'created_at': datetime.utcnow()
+        } for (_, user_id), balance in balances.items()])
+
+        oldest_kept = db.session.query(BalanceCheckpoint.watermark).filter(
+            BalanceCheckpoint.group_id == gid
+        ).distinct().order_by(BalanceCheckpoint.watermark.desc()).offset(max(keep, 1) - 1).limit(1).scalar()
+        if oldest_kept is not None:
+            BalanceCheckpoint.query.filter(
+                BalanceCheckpoint.group_id == gid,
+                BalanceCheckpoint.watermark < oldest_kept
+            ).delete(synchronize_session=False)
+
+        db.session.commit()
+
+    # Ends the transaction (and the PostgreSQL lock) when nothing was due
+    db.session.commit()
+    return len(pending)
+
+def verify_checkpoints(group_id=None):
+    """Compare every checkpoint against a full recomputation up to its watermark.
+
+    Returns a list of (group_id, watermark, user_id, stored_cents, expected_cents) mismatches.
+    """
+    query = db.session.query(BalanceCheckpoint.group_id, BalanceCheckpoint.watermark).distinct()
+    if group_id is not None:
+        query = query.filter(BalanceCheckpoint.group_id == group_id)
+
+    mismatches = []
+    for gid, watermark in query.order_by(BalanceCheckpoint.group_id, BalanceCheckpoint.watermark).all():
+        expected = compute_group_balances(gid, upto=watermark, checkpoints=False)
+        stored = {
+            (gid, user_id): balance
+            for user_id, balance in db.session.query(
+                BalanceCheckpoint.user_id,
+                BalanceCheckpoint.balance_cents
+            ).filter_by(group_id=gid, watermark=watermark)
+        }
+
+        for key in sorted(expected.keys() | stored.keys()):
+            stored_balance = stored.get(key, 0)
+            expected_balance = expected.get(key, 0)
+            if stored_balance != expected_balance:
+                mismatches.append((gid, watermark, key[1], stored_balance, expected_balance))
+
+    return mismatches
+
+def rebuild_balances(group_id=None, apply=True):
+    """Compare the ledger against a recomputation from every raw split and optionally rewrite it.
+
+    Checkpoints are not used, so a wrong one is never copied into the
+    ledger. Returns a list of (group_id, user_id, stored_cents,
+    expected_cents) mismatches.
+    """
+    expected = compute_group_balances(group_id, checkpoints=False)
+
+    stored_query = GroupBalance.query
+    if group_id is not None:
+        stored_query = stored_query.filter(GroupBalance.group_id == group_id)
+    stored = {(row.group_id, row.user_id): row.balance_cents for row in stored_query}
+
+    mismatches = []
+    for key in sorted(expected.keys() | stored.keys()):
+        stored_balance = stored.get(key, 0)
+        expected_balance = expected.get(key, 0)
+        if stored_balance != expected_balance:
+            mismatches.append((*key, stored_balance, expected_balance))
+
+    if apply:
+        stored_query.delete(synchronize_session=False)
+        db.session.add_all([
+            GroupBalance(group_id=gid, user_id=user_id, balance_cents=balance)
+            for (gid, user_id), balance in expected.items()
+        ])
+        db.session.commit()
+
+    return mismatches
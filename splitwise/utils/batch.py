@@ -0,0 +1,127 @@
+from flask import current_app
+from werkzeug.exceptions import HTTPException, InternalServerError
+from werkzeug.test import EnvironBuilder
+from .. import db
+from .cache import DEFERRED_TAGS, response_cache
+from .jwt_utils import BATCH_USER_KEY
+
+# Blueprints whose routes may be called from a batch
+BATCH_BLUEPRINTS = ('expenses', 'groups')
+
+# Batches write; reads inside one could hit the response cache before the batch commits
+BATCH_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+class BatchError(ValueError):
+    """Raised when a batch request is malformed"""
+
+def parse_operations(data, max_operations):
+    """Validate a batch body; returns the (method, path, body) operations"""
+    if not isinstance(data, dict) or not isinstance(data.get('operations'), list):
+        raise BatchError('Body must be an object with an "operations" list')
+
+    operations = data['operations']
+    if not operations:
+        raise BatchError('At least one operation is required')
+    if len(operations) > max_operations:
+        raise BatchError('At most %d operations are allowed per batch' % max_operations)
+
+    parsed = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or not isinstance(operation.get('path'), str):
+            raise BatchError('Operation %d must be an object with a "path"' % index)
+        method = str(operation.get('method', 'POST')).upper()
+        parsed.append((method, operation['path'], operation.get('body')))
+
+    return parsed
+
+def _operation_result(response):
+    """Status and decoded body of a sub-request response"""
+    body = response.get_json(silent=True)
+    if body is None:
+        body = response.get_data(as_text=True)
+    return {"status": response.status_code, "body": body}
+
+class BatchRunner:
+    """Run write operations of one user against the app's routes in a single transaction.
+
+    Every operation runs in its own app and request context with a session
+    joined to the batch connection through a savepoint, so the views'
+    commits only release their savepoint and a failed operation rolls back
+    alone. The batch transaction commits at the end, unless `atomic` is set
+    and an operation failed, in which case everything is rolled back and
+    the remaining operations are skipped. Cache invalidations are published
+    only once the batch commits.
+    """
+
+    def __init__(self, current_user, atomic=False):
+        self.user = current_user
+        self.atomic = atomic
+        self.tags = set()
+
+    def run(self, operations):
+        """Run the operations; returns (results, committed)"""
+        app = current_app._get_current_object()
+        results = []
+        failed = False
+
+        # End the request's read transaction and free its connection first:
+        # without WAL its shared lock would keep BEGIN IMMEDIATE waiting
+        db.session.commit()
+
+        with db.engine.connect() as connection:
+            if connection.dialect.name == 'sqlite':
+                # pysqlite opens no transaction for SAVEPOINT on its own; take the
+                # write lock up front so the batch cannot deadlock on an upgrade
+                connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+            for method, path, body in operations:
+                if failed and self.atomic:
+                    results.append({
+                        "status": 424,
+                        "body": {"error": "Skipped after a failed operation"}
+                    })
+                    continue
+
+                result = self._run_operation(app, connection, method, path, body)
+                results.append(result)
+                failed = failed or result['status'] >= 400
+
+            committed = not (failed and self.atomic)
+            if committed:
+                connection.commit()
+            else:
+                connection.rollback()
+
+        if committed:
+            response_cache.invalidate_tags(self.tags)
+
+        return results, committed
+
+    def _run_operation(self, app, connection, method, path, body):
+        if method not in BATCH_METHODS:
+            return {"status": 400, "body": {"error": "Only write operations can be batched"}}
+
+        environ = EnvironBuilder(path=path, method=method, json=body).get_environ()
+
+        with app.app_context(), app.request_context(environ) as context:
+            # Unknown routes fail below with the routing error
+            if context.request.routing_exception is None and context.request.blueprint not in BATCH_BLUEPRINTS:
+                return {"status": 404, "body": {"error": "Route cannot be batched"}}
+
+            session = db.session.session_factory(bind=connection, join_transaction_mode='create_savepoint')
+            session.info[DEFERRED_TAGS] = self.tags
+            db.session.registry.set(session)
+            environ[BATCH_USER_KEY] = session.merge(self.user, load=False)
+
+            try:
+                response = app.make_response(app.dispatch_request())
+            except HTTPException as e:
+                response = app.make_response(({"error": e.description}, e.code))
+            except Exception:
+                app.logger.exception('Batch operation %s %s failed', method, path)
+                response = app.make_response(({"error": InternalServerError.description}, 500))
+
+            if response.status_code >= 400:
+                session.rollback()
+
+            return _operation_result(response)
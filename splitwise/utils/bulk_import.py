@@ -0,0 +1,260 @@
+import csv
+import json
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+from .. import db
+from ..models.expense import Expense, ExpenseCategory, ExpenseSplit, SplitType
+from ..models.group import GroupMembership
+from .balances import apply_balance_deltas, expense_balance_deltas
+from .money import from_cents, to_cents
+from .rollups import apply_rollup_deltas, rollup_deltas
+from .search import index_expenses
+from .cache import group_tag, invalidate, user_tag
+from .splits import SplitError, parse_splits
+from .versions import GROUP, USER, bump_versions
+
+# Rows validated and written per transaction
+CHUNK_SIZE = 1000
+
+# Key holding each split's value, by split type (CSV rows only carry the value)
+SPLIT_VALUE_KEYS = {'equal': None, 'exact': 'amount', 'percentage': 'percentage'}
+
+class RowError(ValueError):
+    """Raised when an imported row is invalid"""
+
+def iter_ndjson_rows(stream):
+    """Yield (line_number, row) pairs from a stream of NDJSON lines"""
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = RowError("Invalid JSON")
+        else:
+            if not isinstance(row, dict):
+                row = RowError("Row must be a JSON object")
+        yield line_number, row
+
+def iter_csv_rows(stream):
+    """Yield (line_number, row) pairs from a stream of CSV lines with a header.
+
+    Columns: description, amount, date, category_id, group_id, split_type,
+    splits. Splits are written as `user_id[:value]` separated by `;`.
+    """
+    # Undecodable bytes are kept as surrogates so their row alone is reported
+    reader = csv.DictReader(line.decode('utf-8', 'surrogateescape') for line in stream)
+    for record in reader:
+        try:
+            row = _parse_csv_record(record)
+        except UnicodeError:
+            row = RowError("Row is not valid UTF-8")
+        except (ValueError, TypeError):
+            row = RowError("Invalid CSV row")
+        yield reader.line_num, row
+
+def _parse_csv_record(record):
+    """Convert a CSV record into the JSON row format"""
+    for value in record.values():
+        if isinstance(value, str):
+            value.encode('utf-8')
+
+    row = {
+        'description': record.get('description'),
+        'amount': record.get('amount') or None,
+        'date': record.get('date') or None,
+        'category_id': int(record['category_id']) if record.get('category_id') else None,
+        'group_id': int(record['group_id']) if record.get('group_id') else None,
+        'split_type': record.get('split_type') or 'equal'
+    }
+
+    if record.get('splits'):
+        value_key = SPLIT_VALUE_KEYS.get(row['split_type'])
+        row['splits'] = []
+        for item in record['splits'].split(';'):
+            user_id, _, value = item.partition(':')
+            split = {'user_id': int(user_id)}
+            if value_key:
+                split[value_key] = value
+            row['splits'].append(split)
+
+    return row
+
+def insert_expenses(entries):
+    """Insert validated expenses with their splits and derived data in the current transaction.
+
+    `entries` are (expense values, splits) pairs as returned by
+    `ExpenseImporter.validate_row`, possibly of several payers. Returns the
+    new expense ids, in order; the caller commits.
+    """
+    # Core inserts keep every row in one executemany batch
+    expense_table = Expense.__table__
+    expense_ids = db.session.execute(
+        expense_table.insert().returning(expense_table.c.id, sort_by_parameter_order=True),
+        [expense for expense, _ in entries]
+    ).scalars().all()
+
+    split_rows = []
+    deltas = None
+    personal_deltas = None
+    group_ids = set()
+    user_ids = set()
+    for expense_id, (expense, splits) in zip(expense_ids, entries):
+        for user_id, split_type, value, share in splits:
+            split_rows.append({
+                'expense_id': expense_id,
+                'user_id': user_id,
+                'split_type': split_type,
+                'amount_or_percentage': value,
+                'amount_cents': share
+            })
+
+        if expense['group_id'] is not None:
+            shares = [(user_id, share) for user_id, _, _, share in splits]
+            deltas = expense_balance_deltas(
+                expense['group_id'], expense['paid_by_id'], expense['amount_cents'], shares, deltas
+            )
+            group_ids.add(expense['group_id'])
+        else:
+            personal_deltas = rollup_deltas(
+                expense['paid_by_id'], expense['category_id'], expense['date'], expense['amount_cents'], personal_deltas
+            )
+            user_ids.add(expense['paid_by_id'])
+
+    db.session.execute(ExpenseSplit.__table__.insert(), split_rows)
+    index_expenses([
+        (expense_id, expense['description'], expense['category_id'])
+        for expense_id, (expense, _) in zip(expense_ids, entries)
+    ])
+    if deltas:
+        apply_balance_deltas(deltas)
+    if personal_deltas:
+        apply_rollup_deltas(personal_deltas)
+    bump_versions(USER, user_ids)
+    bump_versions(GROUP, group_ids)
+    invalidate(*(user_tag(user_id) for user_id in user_ids), *(group_tag(group_id) for group_id in group_ids))
+
+    return expense_ids
+
+def _is_id(value):
+    """Whether a decoded value can be a row id (JSON booleans are not)"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+class ExpenseImporter:
+    """Validates imported expense rows and writes them in chunked transactions"""
+
+    def __init__(self, user, chunk_size=CHUNK_SIZE):
+        self.user_id = user.id
+        self.chunk_size = chunk_size
+        self.inserted = 0
+        self.errors = []
+
+        # Lookups shared by every row of the import
+        self.category_ids = {
+            category_id for category_id, in
+            db.session.query(ExpenseCategory.id).filter(ExpenseCategory.user_id == user.id)
+        }
+        self.user_group_ids = {
+            group_id for group_id, in
+            db.session.query(GroupMembership.group_id).filter(GroupMembership.user_id == user.id)
+        }
+        self.group_members = {}
+
+    def run(self, rows):
+        """Import (line_number, row) pairs and return the per-row report"""
+        chunk = []
+        for line_number, row in rows:
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                chunk.append((line_number, self.validate_row(row)))
+            except RowError as e:
+                self.errors.append({"line": line_number, "error": str(e)})
+
+            if len(chunk) >= self.chunk_size:
+                self.write_chunk(chunk)
+                chunk = []
+
+        if chunk:
+            self.write_chunk(chunk)
+
+        return {
+            "inserted": self.inserted,
+            "failed": len(self.errors),
+            "errors": sorted(self.errors, key=lambda error: error["line"])
+        }
+
+    def members_of(self, group_id):
+        """Member ids of a group, loaded once per import"""
+        if group_id not in self.group_members:
+            self.group_members[group_id] = {
+                user_id for user_id, in
+                db.session.query(GroupMembership.user_id).filter(GroupMembership.group_id == group_id)
+            }
+        return self.group_members[group_id]
+
+    def validate_row(self, row):
+        """Check one row and return its (expense values, splits)"""
+        description = row.get('description')
+        if not description or not isinstance(description, str):
+            raise RowError("Description is required")
+        if len(description) > 200:
+            raise RowError("Description is too long")
+
+        # Same rule as the create endpoints: present and numeric
+        if not row.get('amount'):
+            raise RowError("Amount is required")
+        try:
+            amount_cents = to_cents(row.get('amount'))
+        except ValueError:
+            raise RowError("Invalid amount")
+
+        date = datetime.utcnow()
+        if row.get('date'):
+            try:
+                date = datetime.fromisoformat(row['date'])
+            except (TypeError, ValueError):
+                raise RowError("Invalid date")
+
+        category_id = row.get('category_id')
+        if category_id is not None and (not _is_id(category_id) or category_id not in self.category_ids):
+            raise RowError("Invalid category")
+
+        group_id = row.get('group_id')
+        if group_id is not None and not _is_id(group_id):
+            raise RowError("Invalid group")
+        if group_id is None:
+            # Personal expenses get a single split for the payer
+            splits = [(self.user_id, SplitType.EXACT, from_cents(amount_cents), amount_cents)]
+        else:
+            if group_id not in self.user_group_ids:
+                raise RowError("You are not a member of this group")
+            try:
+                splits = parse_splits(row.get('split_type', 'equal'), row.get('splits', []), amount_cents)
+            except SplitError as e:
+                raise RowError(str(e))
+            if not {split[0] for split in splits} <= self.members_of(group_id):
+                raise RowError("Splits must only include group members")
+
+        expense = {
+            'description': description,
+            'amount_cents': amount_cents,
+            'date': date,
+            'paid_by_id': self.user_id,
+            'group_id': group_id,
+            'category_id': category_id
+        }
+        return expense, splits
+
+    def write_chunk(self, chunk):
+        """Insert a chunk of validated rows in a single transaction"""
+        try:
+            insert_expenses([entry for _, entry in chunk])
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            self.errors.extend({"line": line_number, "error": "Could not save row"} for line_number, _ in chunk)
+            return
+
+        self.inserted += len(chunk)
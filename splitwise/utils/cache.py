@@ -0,0 +1,292 @@
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+from threading import Lock
+from flask import Response, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .. import db
+
+# Session.info key of the tags to invalidate once the transaction commits
+PENDING_TAGS = 'response_cache_tags'
+
+# Session.info key of a set collecting committed tags instead of publishing them,
+# for sessions whose commits only release a savepoint of an outer transaction
+DEFERRED_TAGS = 'response_cache_deferred_tags'
+
+def user_tag(user_id):
+    """Invalidation tag of everything derived from one user's own data"""
+    return 'user:%d' % user_id
+
+def group_tag(group_id):
+    """Invalidation tag of everything derived from one group's data"""
+    return 'group:%d' % group_id
+
+class MemoryBackend:
+    """In-process LRU store with a per-entry TTL.
+
+    Tag generations are kept apart from the entries so evicting an entry
+    can never roll a tag back to an older generation.
+    """
+
+    def __init__(self, max_size=1000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tags = defaultdict(int)
+        self._lock = Lock()
+
+    def get(self, key):
+        """Value of a live entry, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def tag_versions(self, tags):
+        """Current generation of every tag"""
+        with self._lock:
+            return [self._tags.get(tag, 0) for tag in tags]
+
+    def bump_tags(self, tags):
+        """Move every tag to a new generation"""
+        with self._lock:
+            for tag in tags:
+                self._tags[tag] += 1
+
+    def clear(self):
+        """Drop every entry and tag generation"""
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def size(self):
+        """Number of stored entries, live or expired"""
+        return len(self._entries)
+
+class RedisBackend:
+    """Store shared by every worker, backed by a redis-py compatible client.
+
+    Any client exposing get/set/mget/incr/pipeline/scan_iter/delete works,
+    with or without `decode_responses`, so tests can hand in a stand-in
+    instead of a server.
+    """
+
+    def __init__(self, client, ttl=300, prefix='splitwise:cache:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """Connect to a redis server; needs the optional `redis` package"""
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis response cache backend requires the 'redis' package")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        # Clients created with decode_responses hand back str
+        return value.encode() if isinstance(value, str) else value
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def tag_versions(self, tags):
+        if not tags:
+            return []
+        values = self.client.mget([self.prefix + 'tag:' + tag for tag in tags])
+        return [int(value or 0) for value in values]
+
+    def bump_tags(self, tags):
+        pipeline = self.client.pipeline()
+        for tag in tags:
+            pipeline.incr(self.prefix + 'tag:' + tag)
+        pipeline.execute()
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def size(self):
+        tag_prefix = self.prefix + 'tag:'
+        return sum(1 for key in self.client.scan_iter(self.prefix + '*')
+                   if not (key.decode() if isinstance(key, bytes) else key).startswith(tag_prefix))
+
+class ResponseCache:
+    """Cache of rendered read responses invalidated by tags.
+
+    Every entry key embeds the current generation of its tags, so publishing
+    a tag makes all entries built before it unreachable; they then age out
+    through the backend's LRU/TTL eviction.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.enabled = backend is not None
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self._lock = Lock()
+
+    def init_app(self, app, backend=None):
+        """Configure the backend from the app config, unless one is given"""
+        app.config.setdefault('RESPONSE_CACHE_BACKEND', 'memory')
+        app.config.setdefault('RESPONSE_CACHE_SIZE', 1000)
+        app.config.setdefault('RESPONSE_CACHE_TTL', 300)
+        app.config.setdefault('RESPONSE_CACHE_URL', None)
+
+        if backend is None:
+            kind = app.config['RESPONSE_CACHE_BACKEND']
+            ttl = app.config['RESPONSE_CACHE_TTL']
+            if kind == 'memory':
+                backend = MemoryBackend(app.config['RESPONSE_CACHE_SIZE'], ttl)
+            elif kind == 'redis':
+                backend = RedisBackend.from_url(app.config['RESPONSE_CACHE_URL'], ttl=ttl)
+            elif kind != 'none':
+                raise ValueError("Unknown response cache backend: %s" % kind)
+
+        self.backend = backend
+        self.enabled = backend is not None
+        self.reset_stats()
+
+    def get(self, key):
+        """Cached (body, mimetype) pair of a key, or None"""
+        value = self.backend.get(key)
+        if value is None:
+            return None
+        mimetype, body = value.split(b'\n', 1)
+        return body, mimetype.decode()
+
+    def set(self, key, body, mimetype):
+        """Store a rendered response body"""
+        self.backend.set(key, mimetype.encode() + b'\n' + body)
+
+    def versioned_key(self, key, tags):
+        """Key of an entry under the current generation of its tags"""
+        versions = self.backend.tag_versions(tags)
+        return key + '|' + ','.join('%s=%d' % pair for pair in zip(tags, versions))
+
+    def invalidate_tags(self, tags):
+        """Make every entry carrying one of the tags unreachable"""
+        if self.enabled and tags:
+            self.backend.bump_tags(sorted(tags))
+
+    def record(self, endpoint, hit):
+        """Count a lookup of a cached endpoint"""
+        with self._lock:
+            if hit:
+                self.hits[endpoint] += 1
+            else:
+                self.misses[endpoint] += 1
+
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        if self.backend is not None:
+            self.backend.clear()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset the hit/miss counters"""
+        with self._lock:
+            self.hits.clear()
+            self.misses.clear()
+
+    def stats(self):
+        """Hit/miss counters and hit ratio of every cached endpoint"""
+        with self._lock:
+            endpoints = {}
+            for endpoint in sorted(self.hits.keys() | self.misses.keys()):
+                hits, misses = self.hits[endpoint], self.misses[endpoint]
+                endpoints[endpoint] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_ratio": round(hits / (hits + misses), 4)
+                }
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "size": self.backend.size() if self.backend else 0,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "endpoints": endpoints
+        }
+
+response_cache = ResponseCache()
+
+def invalidate(*tags):
+    """Queue cache tags to be published when the current transaction commits.
+
+    Publishing only after the commit keeps a concurrent reader from caching
+    the pre-commit data under the new tag generation.
+    """
+    db.session.info.setdefault(PENDING_TAGS, set()).update(tags)
+
+@event.listens_for(Session, 'after_commit')
+def _publish_pending_tags(session):
+    tags = session.info.pop(PENDING_TAGS, None)
+    if tags and DEFERRED_TAGS in session.info:
+        session.info[DEFERRED_TAGS].update(tags)
+    elif tags:
+        response_cache.invalidate_tags(tags)
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_pending_tags(session):
+    session.info.pop(PENDING_TAGS, None)
+
+def cached(*tags):
+    """Decorator caching a read view's 200 responses per user and query string.
+
+    `tags` are templates formatted with the user id and the view arguments,
+    e.g. 'user:{user_id}' or 'group:{group_id}'. Must be applied below
+    `token_required` (and below `conditional`).
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(current_user, *args, **kwargs):
+            if not response_cache.enabled:
+                return f(current_user, *args, **kwargs)
+
+            entry_tags = [tag.format(user_id=current_user.id, **kwargs) for tag in tags]
+            key = response_cache.versioned_key('|'.join([
+                request.endpoint,
+                str(current_user.id),
+                ','.join('%s=%s' % item for item in sorted(kwargs.items())),
+                request.query_string.decode('latin-1')
+            ]), entry_tags)
+
+            entry = response_cache.get(key)
+            response_cache.record(request.endpoint, entry is not None)
+            if entry is not None:
+                body, mimetype = entry
+                response = Response(body, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(f(current_user, *args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                response_cache.set(key, response.get_data(), response.mimetype)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+
+        return decorated
+    return decorator
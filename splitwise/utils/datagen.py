@@ -0,0 +1,267 @@
+import math
+import multiprocessing
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+from sqlalchemy import text
+from .. import db
+from ..models.expense import Expense, ExpenseCategory, ExpenseSplit, SplitType
+from ..models.group import Group, GroupMembership
+from ..models.user import User
+from .balances import rebuild_balances
+from .money import allocate, from_cents, to_cents
+from .passwords import password_hasher
+from .rollups import backfill_rollups
+from .search import rebuild_search_index, search_enabled
+
+# Expenses generated from one RNG stream; chunks are the unit of work of the shards
+CHUNK_SIZE = 10000
+
+# Rows per executemany batch
+BATCH_SIZE = 20000
+
+# Dates are spread over the days before this one so runs are reproducible
+END_DATE = datetime(2026, 1, 1)
+
+SPLIT_KINDS = (SplitType.EQUAL, SplitType.EXACT, SplitType.PERCENTAGE)
+
+# Descriptions are "<what> in <where>", so searches hit realistic term frequencies
+DESCRIPTION_ITEMS = (
+    'dinner', 'lunch', 'breakfast', 'coffee', 'groceries', 'taxi', 'train tickets', 'flights',
+    'hotel', 'rent', 'electricity', 'internet', 'concert tickets', 'museum', 'drinks', 'pizza',
+    'sushi', 'fuel', 'parking', 'car rental', 'ferry', 'gym', 'cinema', 'gifts', 'pharmacy'
+)
+DESCRIPTION_PLACES = (
+    'Lisbon', 'Porto', 'Madrid', 'Barcelona', 'Paris', 'Lyon', 'Berlin', 'Munich', 'Vienna',
+    'Prague', 'Budapest', 'Rome', 'Milan', 'Naples', 'Athens', 'Amsterdam', 'Brussels', 'Dublin',
+    'London', 'Edinburgh', 'Copenhagen', 'Stockholm', 'Oslo', 'Helsinki', 'Warsaw', 'Krakow',
+    'Zurich', 'Geneva', 'Seville', 'Valencia', 'Marseille', 'Nice', 'Florence', 'Venice'
+)
+
+# Plan shared with forked shard processes
+_shard_state = {}
+
+def _insert(table, rows):
+    """Insert rows in executemany batches"""
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(table.insert(), rows[start:start + BATCH_SIZE])
+
+def _next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+def _split_rows(rng, expense_id, amount_cents, members, split_type):
+    """Split rows of one group expense shared by `members`"""
+    if split_type == SplitType.EQUAL:
+        shares = allocate(amount_cents, [1] * len(members))
+        values = [from_cents(share) for share in shares]
+    elif split_type == SplitType.EXACT:
+        shares = allocate(amount_cents, [rng.randint(1, 10) for _ in members])
+        values = [from_cents(share) for share in shares]
+    else:
+        weights = allocate(10000, [rng.randint(1, 10) for _ in members])
+        shares = allocate(amount_cents, weights)
+        values = [from_cents(weight) for weight in weights]
+
+    return [{
+        'expense_id': expense_id,
+        'user_id': user_id,
+        'split_type': split_type,
+        'amount_or_percentage': value,
+        'amount_cents': share
+    } for user_id, value, share in zip(members, values, shares)]
+
+def _generate_chunk(plan, index):
+    """Expense and split rows of one chunk, identical for a given seed and index"""
+    rng = random.Random('%s:%d' % (plan['seed'], index))
+    first = plan['first_expense_id'] + index * CHUNK_SIZE
+    last = min(first + CHUNK_SIZE, plan['first_expense_id'] + plan['expenses'])
+
+    low, high = math.log(plan['min_cents']), math.log(plan['max_cents'])
+    span = plan['days'] * 86400
+    start_date = END_DATE - timedelta(days=plan['days'])
+
+    expense_rows = []
+    split_rows = []
+    for expense_id in range(first, last):
+        # Log-uniform amounts: many small expenses, a few large ones
+        amount_cents = int(math.exp(rng.uniform(low, high)))
+        date = start_date + timedelta(seconds=rng.randrange(span))
+        description = '%s in %s' % (rng.choice(DESCRIPTION_ITEMS), rng.choice(DESCRIPTION_PLACES))
+
+        if not plan['groups'] or rng.random() < plan['personal_ratio']:
+            user_index = rng.randrange(plan['users'])
+            user_id = plan['first_user_id'] + user_index
+            categories = plan['categories_of'][user_index]
+            category_id = None
+            if categories and rng.random() >= plan['uncategorized_ratio']:
+                category_id = rng.choice(categories)
+
+            expense_rows.append({
+                'id': expense_id, 'description': description, 'amount_cents': amount_cents,
+                'date': date, 'paid_by_id': user_id, 'group_id': None, 'category_id': category_id
+            })
+            split_rows.append({
+                'expense_id': expense_id, 'user_id': user_id, 'split_type': SplitType.EXACT,
+                'amount_or_percentage': from_cents(amount_cents), 'amount_cents': amount_cents
+            })
+        else:
+            group_index = rng.choices(range(plan['groups']), cum_weights=plan['group_weights'])[0]
+            members = plan['members_of'][group_index]
+            sharing = rng.sample(members, rng.randint(1, len(members)))
+            split_type = rng.choices(SPLIT_KINDS, weights=plan['split_mix'])[0]
+
+            expense_rows.append({
+                'id': expense_id, 'description': description, 'amount_cents': amount_cents,
+                'date': date, 'paid_by_id': rng.choice(members),
+                'group_id': plan['first_group_id'] + group_index, 'category_id': None
+            })
+            split_rows.extend(_split_rows(rng, expense_id, amount_cents, sharing, split_type))
+
+    return expense_rows, split_rows
+
+def _write_chunk(plan, index):
+    """Generate and commit one chunk; returns (expenses, splits) written"""
+    expense_rows, split_rows = _generate_chunk(plan, index)
+
+    if db.engine.dialect.name == 'sqlite':
+        # Shards take turns on the single SQLite writer lock
+        db.session.execute(text('PRAGMA busy_timeout=120000'))
+    _insert(Expense.__table__, expense_rows)
+    _insert(ExpenseSplit.__table__, split_rows)
+    db.session.commit()
+
+    return len(expense_rows), len(split_rows)
+
+def _init_shard():
+    """Give a forked shard its own connections and app context"""
+    db.engine.dispose(close=False)
+    context = _shard_state['app'].app_context()
+    context.push()
+    _shard_state['context'] = context
+
+def _write_chunk_in_shard(index):
+    return _write_chunk(_shard_state['plan'], index)
+
+def generate_data(app, users=1000, groups=200, expenses=100000, seed=0, personal_ratio=0.3,
+                  categories_per_user=(0, 5), uncategorized_ratio=0.2, group_size=(2, 8),
+                  group_skew=1.0, split_mix=(50, 25, 25), amount_range=('1', '500'), days=365,
+                  password='password123', workers=1, log=lambda message: None):
+    """Write a synthetic dataset next to the existing rows.
+
+    Users, categories, groups and memberships are generated in this process.
+    Expenses are generated in fixed chunks with one RNG stream per chunk, so
+    the same seed gives the same rows whatever the number of worker
+    processes. Group activity follows a Zipf law with exponent `group_skew`
+    (0 means uniform). Must run inside an app context; returns the row
+    counts.
+    """
+    rng = random.Random(seed)
+    first_user_id = _next_id(User)
+    first_group_id = _next_id(Group)
+    first_category_id = _next_id(ExpenseCategory)
+    first_expense_id = _next_id(Expense)
+
+    # One salted hash shared by every generated user keeps hashing out of the loop
+    password_hash = password_hasher.hash(password)
+
+    log('Writing %d users' % users)
+    _insert(User.__table__, [{
+        'id': user_id,
+        'username': 'user%d' % user_id,
+        'email': 'user%d@example.com' % user_id,
+        'password_hash': password_hash,
+        'token_version': 0
+    } for user_id in range(first_user_id, first_user_id + users)])
+
+    categories_of = []
+    category_rows = []
+    for user_index in range(users):
+        categories = []
+        for n in range(rng.randint(*categories_per_user)):
+            category_id = first_category_id + len(category_rows)
+            category_rows.append({
+                'id': category_id,
+                'name': 'category %d' % (n + 1),
+                'description': '',
+                'user_id': first_user_id + user_index
+            })
+            categories.append(category_id)
+        categories_of.append(categories)
+    log('Writing %d categories' % len(category_rows))
+    _insert(ExpenseCategory.__table__, category_rows)
+
+    members_of = []
+    membership_rows = []
+    for group_index in range(groups):
+        size = min(users, rng.randint(*group_size))
+        members = [first_user_id + user_index for user_index in rng.sample(range(users), size)]
+        members_of.append(members)
+        membership_rows.extend({
+            'user_id': user_id,
+            'group_id': first_group_id + group_index,
+            'role': 'admin' if position == 0 else 'member'
+        } for position, user_id in enumerate(members))
+    log('Writing %d groups and %d memberships' % (groups, len(membership_rows)))
+    _insert(Group.__table__, [{
+        'id': group_id,
+        'name': 'group %d' % group_id,
+        'description': '',
+        'created_at': END_DATE - timedelta(days=days)
+    } for group_id in range(first_group_id, first_group_id + groups)])
+    _insert(GroupMembership.__table__, membership_rows)
+    db.session.commit()
+
+    plan = {
+        'seed': seed,
+        'users': users,
+        'groups': groups,
+        'expenses': expenses,
+        'first_user_id': first_user_id,
+        'first_group_id': first_group_id,
+        'first_expense_id': first_expense_id,
+        'categories_of': categories_of,
+        'members_of': members_of,
+        'group_weights': list(accumulate(1 / (rank + 1) ** group_skew for rank in range(groups))),
+        'personal_ratio': personal_ratio,
+        'uncategorized_ratio': uncategorized_ratio,
+        'split_mix': list(split_mix),
+        'min_cents': max(1, to_cents(amount_range[0])),
+        'max_cents': max(1, to_cents(amount_range[1])),
+        'days': days
+    }
+
+    chunks = range(math.ceil(expenses / CHUNK_SIZE))
+    log('Writing %d expenses in %d chunks with %d worker(s)' % (expenses, len(chunks), workers))
+    split_count = 0
+    if workers > 1 and len(chunks) > 1:
+        # Forked shards inherit the plan and the app; connections are not shared
+        _shard_state.update(app=app, plan=plan)
+        db.session.remove()
+        db.engine.dispose()
+        try:
+            with multiprocessing.get_context('fork').Pool(workers, initializer=_init_shard) as pool:
+                for written, (_, splits) in enumerate(pool.imap_unordered(_write_chunk_in_shard, chunks), 1):
+                    split_count += splits
+                    log('  %d/%d chunks' % (written, len(chunks)))
+        finally:
+            _shard_state.clear()
+    else:
+        for index in chunks:
+            split_count += _write_chunk(plan, index)[1]
+            log('  %d/%d chunks' % (index + 1, len(chunks)))
+
+    log('Rebuilding the balance ledger and rollups')
+    rebuild_balances()
+    backfill_rollups()
+    if search_enabled():
+        log('Rebuilding the search index')
+        rebuild_search_index()
+
+    return {
+        'users': users,
+        'categories': len(category_rows),
+        'groups': groups,
+        'memberships': len(membership_rows),
+        'expenses': expenses,
+        'splits': split_count
+    }
@@ -0,0 +1,151 @@
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Bind key of the read replica in SQLALCHEMY_BINDS
+REPLICA_BIND = 'replica'
+
+# asyncio drivers substituted for the configured ones by the async read engine
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql'
+}
+
+def is_sqlite(url):
+    """Whether a database URL points at SQLite"""
+    return make_url(url).get_backend_name() == 'sqlite'
+
+def configure_engines(app):
+    """Derive the engine options and binds from the app config.
+
+    Must run before `db.init_app`. Server databases get explicit pool
+    settings; SQLite is tuned through pragmas on every new connection
+    instead (see `install_sqlite_pragmas`).
+    """
+    config = app.config
+    config.setdefault('DB_POOL_SIZE', 10)
+    config.setdefault('DB_MAX_OVERFLOW', 20)
+    config.setdefault('DB_POOL_PRE_PING', True)
+    config.setdefault('DB_POOL_RECYCLE', 1800)
+    config.setdefault('REPLICA_DATABASE_URL', None)
+    config.setdefault('ASYNC_DATABASE_URL', None)
+    config.setdefault('READ_REPLICA_BLUEPRINTS', ('expenses', 'groups'))
+
+    def engine_options(url):
+        if is_sqlite(url):
+            return {}
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_pre_ping': config['DB_POOL_PRE_PING'],
+            'pool_recycle': config['DB_POOL_RECYCLE']
+        }
+
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(config['SQLALCHEMY_DATABASE_URI'])
+
+    if config['REPLICA_DATABASE_URL']:
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds[REPLICA_BIND] = {
+            'url': config['REPLICA_DATABASE_URL'],
+            **engine_options(config['REPLICA_DATABASE_URL'])
+        }
+        config['SQLALCHEMY_BINDS'] = binds
+
+def async_database_url(app, engines):
+    """URL of the async read engine.
+
+    ASYNC_DATABASE_URL wins; otherwise the replica (or primary) URL, as
+    resolved by Flask-SQLAlchemy, with its driver swapped for the asyncio one.
+    """
+    if app.config['ASYNC_DATABASE_URL']:
+        return make_url(app.config['ASYNC_DATABASE_URL'])
+
+    url = engines.get(REPLICA_BIND, engines[None]).url
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError('No asyncio driver known for %s; set ASYNC_DATABASE_URL' % backend)
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+def create_async_read_engine(app, engines):
+    """Async engine of the read endpoints, tuned like the sync engines"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = async_database_url(app, engines)
+    options = {}
+    if url.get_backend_name() != 'sqlite':
+        options = {
+            'pool_size': app.config['DB_POOL_SIZE'],
+            'max_overflow': app.config['DB_MAX_OVERFLOW'],
+            'pool_pre_ping': app.config['DB_POOL_PRE_PING'],
+            'pool_recycle': app.config['DB_POOL_RECYCLE']
+        }
+
+    engine = create_async_engine(url, **options)
+    # Connection events are registered on the sync facade of the engine
+    install_sqlite_pragmas(app, [engine.sync_engine])
+    return engine
+
+def sqlite_pragmas(config):
+    """PRAGMA statements run on every new SQLite connection"""
+    config.setdefault('SQLITE_JOURNAL_MODE', 'WAL')
+    config.setdefault('SQLITE_SYNCHRONOUS', 'NORMAL')
+    config.setdefault('SQLITE_BUSY_TIMEOUT', 5000)
+    config.setdefault('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+    config.setdefault('SQLITE_CACHE_SIZE', -64000)
+
+    return [
+        'PRAGMA journal_mode=%s' % config['SQLITE_JOURNAL_MODE'],
+        'PRAGMA synchronous=%s' % config['SQLITE_SYNCHRONOUS'],
+        'PRAGMA busy_timeout=%d' % config['SQLITE_BUSY_TIMEOUT'],
+        'PRAGMA mmap_size=%d' % config['SQLITE_MMAP_SIZE'],
+        'PRAGMA cache_size=%d' % config['SQLITE_CACHE_SIZE']
+    ]
+
+def install_sqlite_pragmas(app, engines):
+    """Apply the configured pragmas to every connection of the SQLite engines.
+
+    WAL lets readers run alongside the single writer, synchronous=NORMAL
+    only syncs at checkpoints, and busy_timeout makes writers wait for the
+    lock instead of failing with "database is locked".
+    """
+    pragmas = sqlite_pragmas(app.config)
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', on_connect)
+
+def route_reads_to_replica(app):
+    """Send GET/HEAD requests of the configured blueprints to the replica bind"""
+    replica_blueprints = set(app.config['READ_REPLICA_BLUEPRINTS'])
+
+    @app.before_request
+    def use_replica():
+        if (
+            REPLICA_BIND in (app.config.get('SQLALCHEMY_BINDS') or {})
+            and request.method in ('GET', 'HEAD')
+            and request.blueprint in replica_blueprints
+        ):
+            g.use_replica = True
+
+class RoutingSession(Session):
+    """Session reading from the replica bind when the request asked for it.
+
+    Flushes always go to the primary, so a read-only request that writes by
+    mistake still lands on the right database. A session created with an
+    explicit bind (a connection joined by a batch) always uses it.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.bind is not None:
+            return self.bind
+        if bind is None and not self._flushing and has_request_context() and g.get('use_replica'):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+from flask import Response, stream_with_context
+
+# Rows fetched from the database cursor (and written to the client) at a time
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+def _serialize(value):
+    """Make a column value CSV/JSON friendly"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+def _iter_csv(rows, columns):
+    """Yield CSV text, one chunk per batch of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    # The header goes out before the query has even run
+    writer.writerow(columns)
+    yield flush()
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_serialize(value) for value in row])
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield flush()
+
+    yield flush()
+
+def _iter_ndjson(rows, columns):
+    """Yield NDJSON text, one chunk per batch of rows"""
+    lines = []
+    for count, row in enumerate(rows, start=1):
+        lines.append(json.dumps({column: _serialize(value) for column, value in zip(columns, row)}))
+        # Send the first row straight away so the client sees the download start
+        if count == 1 or len(lines) == EXPORT_BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def stream_export(query, export_format, filename):
+    """Stream the rows of a column query as a CSV or NDJSON download.
+
+    The query is run with `yield_per` so rows are pulled from a server-side
+    cursor batch by batch, keeping memory flat however many rows match.
+    """
+    columns = [column['name'] for column in query.column_descriptions]
+    rows = query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    if export_format == 'csv':
+        body = _iter_csv(rows, columns)
+    else:
+        body = _iter_ndjson(rows, columns)
+
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{export_format}"'}
+    )
@@ -2,23 +2,108 @@ import jwt
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify, current_app
+from sqlalchemy import select
+from sqlalchemy.orm import make_transient_to_detached
+from .. import db
 from ..models.user import User
+from .identity_cache import identity_cache
 
-def generate_token(user_id):
+# Methods that may take the user's fields from the token claims when JWT_TRUST_CLAIMS is set
+READ_METHODS = ('GET', 'HEAD')
+
+# WSGI environ key of the user a batch already authenticated for its sub-requests
+BATCH_USER_KEY = 'splitwise.batch_user'
+
+def generate_token(user):
     """Generate JWT token for a user"""
     payload = {
-        'user_id': user_id,
+        'user_id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'ver': user.token_version or 0,
         'exp': datetime.utcnow() + timedelta(days=1),  # Token expires in 1 day
         'iat': datetime.utcnow()
     }
     return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
 
+def user_identity(user):
+    """Plain snapshot of a user that can be cached across requests"""
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'token_version': user.token_version or 0
+    }
+
+def revoke_tokens(user):
+    """Invalidate every token issued to a user so far"""
+    user.token_version = User.token_version + 1
+    db.session.commit()
+    identity_cache.set(user.id, user_identity(user))
+
+def trusted_claims(payload, method):
+    """Identity fields of a read request taken from the signed claims when the app opts in, or None.
+
+    The token version is left out: it is read from the database on a cache
+    miss and cached with the claims, or a token revoked by a logout would
+    keep working.
+    """
+    if (current_app.config.get('JWT_TRUST_CLAIMS')
+            and method in READ_METHODS
+            and 'username' in payload):
+        return {
+            'id': payload['user_id'],
+            'username': payload['username'],
+            'email': payload.get('email')
+        }
+    return None
+
+def token_version_stmt(user_id):
+    """SELECT of a user's current token version; no row for unknown users"""
+    return select(User.token_version).where(User.id == user_id)
+
+def _load_identity(payload):
+    """Resolve the identity behind a token, hitting the database only on a cache miss"""
+    identity = identity_cache.get(payload['user_id'])
+    if identity is not None:
+        return identity
+
+    claims = trusted_claims(payload, request.method)
+    if claims is not None:
+        row = db.session.execute(token_version_stmt(payload['user_id'])).first()
+        if not row:
+            return None
+        identity = dict(claims, token_version=row.token_version or 0)
+    else:
+        user = db.session.get(User, payload['user_id'])
+        if not user:
+            return None
+        identity = user_identity(user)
+
+    identity_cache.set(identity['id'], identity)
+    return identity
+
+def _attach_user(identity):
+    """Turn a cached identity into a session-bound User without a SELECT"""
+    user = User(
+        id=identity['id'],
+        username=identity['username'],
+        email=identity['email'],
+        token_version=identity['token_version']
+    )
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
 def token_required(f):
     """Decorator to protect routes with JWT authentication"""
     @wraps(f)
     def decorated(*args, **kwargs):
+        # Operations of a batch run as the user who sent the batch
+        if BATCH_USER_KEY in request.environ:
+            return f(request.environ[BATCH_USER_KEY], *args, **kwargs)
+
         token = None
-        
+
         # Get token from header
         if 'Authorization' in request.headers:
             auth_header = request.headers['Authorization']
@@ -26,23 +111,29 @@ def token_required(f):
                 token = auth_header.split(" ")[1]  # Bearer <token>
             except IndexError:
                 return jsonify({'error': 'Invalid token format'}), 401
-        
+
         if not token:
             return jsonify({'error': 'Token is missing'}), 401
-        
+
         try:
             # Decode token
             payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.get(payload['user_id'])
-            
-            if not current_user:
+            identity = _load_identity(payload)
+
+            if not identity:
                 return jsonify({'error': 'User not found'}), 401
-            
+
+            # Tokens issued before the last logout carry an older version
+            if payload.get('ver', 0) != identity['token_version']:
+                return jsonify({'error': 'Token has been revoked'}), 401
+
+            current_user = _attach_user(identity)
+
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token has expired'}), 401
         except jwt.InvalidTokenError:
             return jsonify({'error': 'Invalid token'}), 401
-        
+
         return f(current_user, *args, **kwargs)
-    
+
     return decorated
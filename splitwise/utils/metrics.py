@@ -0,0 +1,263 @@
+import sqlite3
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from threading import Lock
+from flask import current_app, g, request
+from sqlalchemy import event
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Statements kept per request for the slow request log
+SLOW_LOG_MAX_STATEMENTS = 50
+
+# Stats of the request being handled by the current thread, if any
+_current = ContextVar('request_stats', default=None)
+
+class RequestStats:
+    """SQL and serialization counters of one request"""
+
+    __slots__ = ('statements', 'sql_seconds', 'rows', 'serialize_seconds', 'log')
+
+    def __init__(self, keep_statements=False):
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.serialize_seconds = 0.0
+        self.log = [] if keep_statements else None
+
+def _count_rows(count):
+    stats = _current.get()
+    if stats is not None:
+        stats.rows += count
+
+class _CountingCursor(sqlite3.Cursor):
+    """sqlite3 cursor adding the rows it fetches to the request stats.
+
+    SQLite reports no rowcount for SELECTs, so returned rows are counted as
+    they are fetched, once per fetch call rather than once per row.
+    """
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            _count_rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        _count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        _count_rows(len(rows))
+        return rows
+
+class _CountingConnection(sqlite3.Connection):
+    """sqlite3 connection handing out counting cursors"""
+
+    def cursor(self, factory=_CountingCursor):
+        return super().cursor(factory)
+
+def current_stats():
+    """Stats of the current request, or None outside instrumented requests"""
+    return _current.get()
+
+class Metrics:
+    """Per-endpoint request metrics exported in the Prometheus text format.
+
+    Counters live in the worker process; with several workers every worker
+    exports its own series.
+    """
+
+    def __init__(self):
+        self.slow_request_seconds = None
+        self._requests = defaultdict(int)
+        self._latency = defaultdict(lambda: [[0] * len(LATENCY_BUCKETS), 0.0, 0])
+        self._sql = defaultdict(lambda: [0, 0.0, 0, 0.0])
+        self._lock = Lock()
+
+    def init_app(self, app, engines):
+        """Hook the request cycle and the SQL engines"""
+        app.config.setdefault('SLOW_REQUEST_MS', 0)
+        slow_ms = app.config['SLOW_REQUEST_MS']
+        self.slow_request_seconds = slow_ms / 1000.0 if slow_ms else None
+
+        for engine in engines:
+            self.instrument_engine(engine)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+
+    def instrument_engine(self, engine):
+        """Count the statements of an engine into the stats of the current request"""
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if _current.get() is not None:
+                conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            stats = _current.get()
+            if stats is None or not conn.info.get('query_start'):
+                return
+            elapsed = time.perf_counter() - conn.info['query_start'].pop()
+            stats.statements += 1
+            stats.sql_seconds += elapsed
+            # Affected rows, and returned rows on drivers that report them;
+            # SQLite reports -1 for SELECTs, whose rows its cursors count
+            if cursor.rowcount > 0:
+                stats.rows += cursor.rowcount
+            if stats.log is not None and len(stats.log) < SLOW_LOG_MAX_STATEMENTS:
+                stats.log.append((elapsed, statement, parameters))
+
+        def do_connect(dialect, connection_record, cargs, cparams):
+            cparams.setdefault('factory', _CountingConnection)
+
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+        if engine.dialect.driver == 'pysqlite':
+            event.listen(engine, 'do_connect', do_connect)
+
+    def _start_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_token = _current.set(RequestStats(keep_statements=self.slow_request_seconds is not None))
+
+    def _finish_request(self, response):
+        stats = _current.get()
+        start = g.pop('metrics_start', None)
+        if stats is None or start is None:
+            return response
+
+        endpoint = request.endpoint or 'unmatched'
+        method = request.method
+        path = request.full_path.rstrip('?')
+        logger = current_app.logger
+
+        def record():
+            # Runs once the body has been sent, so streamed bodies are included
+            elapsed = time.perf_counter() - start
+            self.observe(endpoint, method, response.status_code, elapsed, stats)
+            if self.slow_request_seconds is not None and elapsed >= self.slow_request_seconds:
+                self._log_slow_request(logger, method, path, endpoint, elapsed, stats)
+
+        response.call_on_close(record)
+        return response
+
+    def _teardown_request(self, exc):
+        token = g.pop('metrics_token', None)
+        if token is not None:
+            _current.reset(token)
+
+    def _log_slow_request(self, logger, method, path, endpoint, elapsed, stats):
+        lines = ['Slow request %s %s (%s): %.1fms, %d SQL statements in %.1fms, %d rows' % (
+            method, path, endpoint, elapsed * 1000,
+            stats.statements, stats.sql_seconds * 1000, stats.rows
+        )]
+        for seconds, statement, parameters in stats.log:
+            lines.append('  %.1fms %s %r' % (seconds * 1000, ' '.join(statement.split()), parameters))
+        logger.warning('\n'.join(lines))
+
+    def begin(self):
+        """Start the stats of a request served outside Flask; returns the token for `end`"""
+        return _current.set(RequestStats()), time.perf_counter()
+
+    def end(self, started, endpoint=None, method=None, status=None):
+        """Record a request started with `begin`; without an endpoint it is only dropped"""
+        token, start = started
+        stats = _current.get()
+        _current.reset(token)
+        if endpoint is not None:
+            self.observe(endpoint, method, status, time.perf_counter() - start, stats)
+
+    def observe(self, endpoint, method, status, elapsed, stats):
+        """Record one finished request"""
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound), None)
+        with self._lock:
+            self._requests[(endpoint, method, status)] += 1
+
+            histogram = self._latency[(endpoint, method)]
+            if bucket is not None:
+                histogram[0][bucket] += 1
+            histogram[1] += elapsed
+            histogram[2] += 1
+
+            sql = self._sql[endpoint]
+            sql[0] += stats.statements
+            sql[1] += stats.sql_seconds
+            sql[2] += stats.rows
+            sql[3] += stats.serialize_seconds
+
+    def reset(self):
+        """Drop every recorded series"""
+        with self._lock:
+            self._requests.clear()
+            self._latency.clear()
+            self._sql.clear()
+
+    def render(self):
+        """All series in the Prometheus text exposition format"""
+        from .cache import response_cache
+
+        with self._lock:
+            requests = sorted(self._requests.items())
+            latency = sorted((key, (list(buckets), total, count)) for key, (buckets, total, count) in self._latency.items())
+            sql = sorted((key, list(values)) for key, values in self._sql.items())
+
+        lines = [
+            '# HELP splitwise_requests_total Requests handled, by endpoint, method and status.',
+            '# TYPE splitwise_requests_total counter'
+        ]
+        for (endpoint, method, status), count in requests:
+            lines.append('splitwise_requests_total{%s} %d' % (
+                _labels(endpoint=endpoint, method=method, status=status), count
+            ))
+
+        lines += [
+            '# HELP splitwise_request_duration_seconds Request latency, by endpoint and method.',
+            '# TYPE splitwise_request_duration_seconds histogram'
+        ]
+        for (endpoint, method), (buckets, total, count) in latency:
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                cumulative += bucket_count
+                lines.append('splitwise_request_duration_seconds_bucket{%s} %d' % (
+                    _labels(endpoint=endpoint, method=method, le=bound), cumulative
+                ))
+            labels = _labels(endpoint=endpoint, method=method)
+            lines.append('splitwise_request_duration_seconds_bucket{%s} %d' % (
+                _labels(endpoint=endpoint, method=method, le='+Inf'), count
+            ))
+            lines.append('splitwise_request_duration_seconds_sum{%s} %.6f' % (labels, total))
+            lines.append('splitwise_request_duration_seconds_count{%s} %d' % (labels, count))
+
+        for index, (name, kind, description, fmt) in enumerate((
+            ('splitwise_sql_statements_total', 'counter', 'SQL statements executed, by endpoint.', '%d'),
+            ('splitwise_sql_duration_seconds_total', 'counter', 'Time spent executing SQL, by endpoint.', '%.6f'),
+            ('splitwise_sql_rows_total', 'counter', 'Rows returned or affected by SQL statements, by endpoint.', '%d'),
+            ('splitwise_serialization_seconds_total', 'counter', 'Time spent encoding JSON responses, by endpoint.', '%.6f')
+        )):
+            lines += ['# HELP %s %s' % (name, description), '# TYPE %s %s' % (name, kind)]
+            for endpoint, values in sql:
+                lines.append(('%s{%s} ' + fmt) % (name, _labels(endpoint=endpoint), values[index]))
+
+        cache_stats = response_cache.stats()['endpoints'] if response_cache.enabled else {}
+        for name, key, description in (
+            ('splitwise_response_cache_hits_total', 'hits', 'Response cache hits, by endpoint.'),
+            ('splitwise_response_cache_misses_total', 'misses', 'Response cache misses, by endpoint.')
+        ):
+            lines += ['# HELP %s %s' % (name, description), '# TYPE %s counter' % name]
+            for endpoint, counters in cache_stats.items():
+                lines.append('%s{%s} %d' % (name, _labels(endpoint=endpoint), counters[key]))
+
+        return '\n'.join(lines) + '\n'
+
+def _labels(**labels):
+    """Prometheus label set with escaped values"""
+    return ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+
+metrics = Metrics()
@@ -0,0 +1,46 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Amounts are stored as integer minor units (cents)
+MINOR_UNITS = 100
+
+def to_cents(amount):
+    """Convert an amount in currency units (number or numeric string) to integer cents"""
+    if isinstance(amount, bool):
+        raise ValueError(f"Invalid amount: {amount!r}")
+    try:
+        cents = (Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {amount!r}")
+    if not cents.is_finite():
+        raise ValueError(f"Invalid amount: {amount!r}")
+    return int(cents)
+
+def from_cents(cents):
+    """Convert integer cents to currency units for display"""
+    return cents / MINOR_UNITS
+
+def allocate(total_cents, weights):
+    """Split integer cents in proportion to integer weights.
+
+    Uses the largest remainder method: every part gets its floored quota and
+    the cents left over go to the parts with the largest remainders (earlier
+    parts win ties), so the parts always add up to exactly `total_cents`.
+    """
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        raise ValueError("Weights must add up to a positive number")
+
+    parts = []
+    remainders = []
+    for weight in weights:
+        quota, remainder = divmod(total_cents * weight, weight_sum)
+        parts.append(quota)
+        remainders.append(remainder)
+
+    leftover = total_cents - sum(parts)
+    if leftover:
+        by_remainder = sorted(range(len(weights)), key=lambda i: -remainders[i])
+        for i in by_remainder[:leftover]:
+            parts[i] += 1
+
+    return parts
@@ -0,0 +1,64 @@
+import base64
+import binascii
+from datetime import datetime
+from flask import request
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+def encode_cursor(date, record_id):
+    """Encode a (date, id) keyset position as an opaque cursor token"""
+    raw = f"{date.isoformat()}|{record_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Decode an opaque cursor token back into a (date, id) keyset position"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        date_part, id_part = raw.split('|', 1)
+        return datetime.fromisoformat(date_part), int(id_part)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise InvalidCursor(token)
+
+def get_page_args(args=None):
+    """Read the `limit` and `cursor` query parameters, of the current request by default"""
+    if args is None:
+        args = request.args
+
+    limit = args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    cursor = args.get('cursor')
+    position = decode_cursor(cursor) if cursor else None
+
+    return limit, position
+
+def page_requested(args):
+    """Whether a listing that also serves whole lists was asked for a page"""
+    return 'limit' in args or 'cursor' in args
+
+def keyset_filter(query, date_column, id_column, limit, position):
+    """Restrict a query or select to one newest-first (date, id) page plus one look-ahead row"""
+    if position:
+        last_date, last_id = position
+        query = query.filter(or_(
+            date_column < last_date,
+            and_(date_column == last_date, id_column < last_id)
+        ))
+
+    return query.order_by(date_column.desc(), id_column.desc()).limit(limit + 1)
+
+def page_rows(rows, limit):
+    """Trim the rows fetched by `keyset_filter` to the page and the cursor of the next one"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.date, last.id)
+
+    return rows, next_cursor
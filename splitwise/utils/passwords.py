@@ -0,0 +1,103 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import wraps
+from threading import BoundedSemaphore, Lock
+from flask import jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+
+class PasswordHasher:
+    """Runs password hashing inline or on a bounded pool of worker processes.
+
+    hashlib's PBKDF2 releases the GIL, so by default hashing runs on the
+    request thread and the concurrency limit bounds how many requests hash
+    at once. The process pool is opt-in, for hash functions that hold the
+    GIL; every worker process starts its own.
+    """
+
+    def __init__(self, method='pbkdf2:sha256', cost=260000, workers=0, max_concurrency=8, queue_timeout=5):
+        self.method = method
+        self.cost = cost
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = BoundedSemaphore(max_concurrency)
+        self._pool = None
+        self._pool_pid = None
+        self._lock = Lock()
+
+    def init_app(self, app):
+        """Configure hashing and the auth concurrency limit from the app config"""
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+        app.config.setdefault('PASSWORD_HASH_COST', 260000)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 0)
+        app.config.setdefault('AUTH_MAX_CONCURRENCY', 8)
+        app.config.setdefault('AUTH_QUEUE_TIMEOUT', 5)
+
+        if not app.config['PASSWORD_HASH_METHOD'].startswith('pbkdf2:'):
+            raise ValueError("Unsupported password hash method: %s" % app.config['PASSWORD_HASH_METHOD'])
+
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.cost = app.config['PASSWORD_HASH_COST']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.queue_timeout = app.config['AUTH_QUEUE_TIMEOUT']
+        self._slots = BoundedSemaphore(app.config['AUTH_MAX_CONCURRENCY'])
+        self.shutdown()
+
+    @property
+    def method_spec(self):
+        """Werkzeug method string of the configured method and cost"""
+        return '%s:%d' % (self.method, self.cost)
+
+    def _run(self, func, *args):
+        """Run a hashing function on the pool, or inline without workers"""
+        if self.workers <= 0:
+            return func(*args)
+
+        with self._lock:
+            # A pool inherited through fork has no live workers in this process
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+            pool = self._pool
+
+        return pool.submit(func, *args).result()
+
+    def hash(self, password):
+        """Salted hash of a password with the configured method and cost"""
+        return self._run(generate_password_hash, password, self.method_spec)
+
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash of any method or cost"""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash was made with another method or cost"""
+        return password_hash.split('$', 1)[0] != self.method_spec
+
+    def shutdown(self):
+        """Stop the worker processes; the pool restarts on the next hash"""
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._pool_pid = None
+
+    def limited(self, f):
+        """Decorator capping the number of concurrent requests that hash.
+
+        Requests that cannot get a slot within the queue timeout are turned
+        away with a 503 instead of piling up behind the pool.
+        """
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not self._slots.acquire(timeout=self.queue_timeout):
+                response = jsonify({"error": "Too many authentication requests, retry shortly"})
+                response.headers['Retry-After'] = '1'
+                return response, 503
+            try:
+                return f(*args, **kwargs)
+            finally:
+                self._slots.release()
+
+        return decorated
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,37 @@
+import re
+from contextlib import contextmanager
+from sqlalchemy import event
+
+# Tables that grow with usage and must never be read with a full table scan
+GUARDED_TABLES = ('expense', 'expense_split', 'group_membership', 'expense_category')
+
+_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?"?(\w+)"?(?: AS \w+)?$')
+
+@contextmanager
+def capture_queries(engine):
+    """Collect (statement, parameters) of every SQL statement run on the engine"""
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            captured.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def explain(connection, statement, parameters):
+    """Return the SQLite query plan of a statement as a list of detail strings"""
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+    return [row[-1] for row in rows]
+
+def full_table_scans(plan, tables=GUARDED_TABLES):
+    """Return the guarded tables that a query plan reads with a full table scan"""
+    scans = []
+    for detail in plan:
+        match = _FULL_SCAN.match(detail.strip())
+        if match and match.group(1) in tables:
+            scans.append(match.group(1))
+    return scans
@@ -0,0 +1,201 @@
+"""SELECT statements and response bodies of the read endpoints.
+
+Shared by the Flask views and the async read app (`splitwise.asgi`) so both
+serving modes run the same queries and answer with the same payloads.
+"""
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import contains_eager, joinedload
+from ..models.expense import Expense, ExpenseCategory, ExpenseSplit
+from ..models.group import Group, GroupMembership
+from ..models.user import User
+from .money import from_cents
+
+def group_expenses_stmt(group_id):
+    """Expenses of a group with their payers loaded in the same query"""
+    return select(Expense).options(
+        joinedload(Expense.paid_by)
+    ).where(Expense.group_id == group_id)
+
+def group_splits_stmt(expense_ids):
+    """Splits of a page of expenses, with their users"""
+    return select(ExpenseSplit).options(
+        joinedload(ExpenseSplit.user)
+    ).where(
+        ExpenseSplit.expense_id.in_(expense_ids)
+    ).order_by(ExpenseSplit.id)
+
+def group_expenses_payload(expenses, splits, next_cursor):
+    """Response body of a page of group expenses"""
+    splits_by_expense = {}
+    for split in splits:
+        splits_by_expense.setdefault(split.expense_id, []).append(split)
+
+    return {
+        "expenses": [{
+            "id": expense.id,
+            "description": expense.description,
+            "amount": expense.amount,
+            "date": expense.date,
+            "paid_by": expense.paid_by.username,
+            "splits": [{
+                "user": split.user.username,
+                "split_type": split.split_type,
+                "amount": split.amount_or_percentage,
+                "share": from_cents(split.amount_cents)
+            } for split in splits_by_expense.get(expense.id, [])]
+        } for expense in expenses],
+        "next_cursor": next_cursor
+    }
+
+def filter_personal_expenses(query, user_id, args):
+    """Restrict a query or select to a user's personal expenses matching the request filters"""
+    category_id = args.get('category_id', type=int)
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+
+    query = query.filter(
+        Expense.paid_by_id == user_id,
+        Expense.group_id.is_(None)  # Personal expenses have no group
+    )
+
+    if category_id:
+        query = query.filter(Expense.category_id == category_id)
+
+    if start_date:
+        query = query.filter(Expense.date >= datetime.fromisoformat(start_date))
+
+    if end_date:
+        query = query.filter(Expense.date <= datetime.fromisoformat(end_date))
+
+    return query
+
+# Fields of a personal expense listing entry, selectable with `fields=`
+PERSONAL_FIELDS = ('id', 'description', 'amount', 'date', 'category')
+
+class InvalidFields(ValueError):
+    """Raised when `fields=` names an unknown field"""
+
+def personal_fields(args):
+    """Fields requested with `fields=` (comma separated), every field by default"""
+    requested = args.get('fields')
+    if not requested:
+        return PERSONAL_FIELDS
+
+    names = {name.strip() for name in requested.split(',')} - {''}
+    if not names or not names <= set(PERSONAL_FIELDS):
+        raise InvalidFields(requested)
+    return tuple(name for name in PERSONAL_FIELDS if name in names)
+
+def personal_expenses_stmt(user_id, args, fields=PERSONAL_FIELDS):
+    """Columns of a user's filtered personal expenses (unordered).
+
+    Only the requested fields are read, plus the date and id that order and
+    paginate the rows; the category name comes from an outer join in the
+    same query.
+    """
+    columns = {
+        'description': Expense.description,
+        'amount': Expense.amount_cents,
+        'category': ExpenseCategory.name
+    }
+    stmt = select(
+        Expense.id.label('id'),
+        Expense.date.label('date'),
+        *(columns[name].label(name) for name in fields if name in columns)
+    )
+    if 'category' in fields:
+        stmt = stmt.outerjoin(ExpenseCategory, ExpenseCategory.id == Expense.category_id)
+
+    return filter_personal_expenses(stmt, user_id, args)
+
+def personal_expense_item(row, fields=PERSONAL_FIELDS):
+    """Listing entry of one `personal_expenses_stmt` row"""
+    item = {name: getattr(row, name) for name in fields}
+    if 'amount' in item:
+        item['amount'] = from_cents(item['amount'])
+    return item
+
+def personal_expenses_payload(rows, fields=PERSONAL_FIELDS, next_cursor=None, paginated=False):
+    """Response body of personal expenses: a plain list, or a page with the cursor of the next one"""
+    expenses = [personal_expense_item(row, fields) for row in rows]
+    if not paginated:
+        return expenses
+    return {"expenses": expenses, "next_cursor": next_cursor}
+
+def user_memberships_stmt(user_id):
+    """The user's memberships and their groups in a single joined query"""
+    return select(GroupMembership).join(
+        GroupMembership.group
+    ).options(
+        contains_eager(GroupMembership.group)
+    ).where(
+        GroupMembership.user_id == user_id
+    ).order_by(Group.id)
+
+def group_members_stmt(group_ids):
+    """(group_id, role, user_id, username) of every member of the groups"""
+    return select(
+        GroupMembership.group_id,
+        GroupMembership.role,
+        User.id,
+        User.username
+    ).join(
+        User,
+        User.id == GroupMembership.user_id
+    ).where(
+        GroupMembership.group_id.in_(group_ids)
+    ).order_by(GroupMembership.id)
+
+def user_groups_payload(memberships, member_rows=None):
+    """Response body of the group listing; members are listed only when rows are given"""
+    members_by_group = None
+    if member_rows is not None:
+        members_by_group = {}
+        for group_id, role, user_id, username in member_rows:
+            members_by_group.setdefault(group_id, []).append({
+                "id": user_id,
+                "username": username,
+                "role": role
+            })
+
+    user_groups = []
+    for membership in memberships:
+        group = membership.group
+        group_data = {
+            "id": group.id,
+            "name": group.name,
+            "description": group.description,
+            "created_at": group.created_at,
+            "role": membership.role
+        }
+
+        if members_by_group is not None:
+            group_data['members'] = members_by_group.get(group.id, [])
+
+        user_groups.append(group_data)
+
+    return user_groups
+
+def summary_days(args):
+    """(start, end) days of the summary filters; rollups are kept per day"""
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    return (
+        datetime.fromisoformat(start_date).date() if start_date else None,
+        datetime.fromisoformat(end_date).date() if end_date else None
+    )
+
+def summary_payload(rows):
+    """Response body of the personal summary from (category_name, total_cents) rows"""
+    summary = [(name, total) for name, total in rows if name is not None]
+    uncategorized_total = sum(total for name, total in rows if name is None)
+
+    return {
+        "by_category": [{
+            "category": name,
+            "total": from_cents(total)
+        } for name, total in summary],
+        "uncategorized": from_cents(uncategorized_total),
+        "total": from_cents(sum(total for _, total in summary) + uncategorized_total)
+    }
@@ -0,0 +1,186 @@
+from collections import defaultdict
+from datetime import date
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from .. import db
+from ..models.expense import Expense, ExpenseCategory
+from ..models.rollup import DailyExpenseRollup
+
+# INSERT constructs of the dialects that upsert on the unique rollup key
+UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+def rollup_deltas(user_id, category_id, expense_date, amount_cents, deltas=None):
+    """Accumulate the rollup change caused by one personal expense.
+
+    Deltas are keyed by (user_id, category_id, day) and hold
+    [total_cents, count] so many expenses can be folded together and applied
+    at once.
+    """
+    if deltas is None:
+        deltas = defaultdict(lambda: [0, 0])
+
+    delta = deltas[(user_id, category_id, expense_date.date())]
+    delta[0] += amount_cents
+    delta[1] += 1
+
+    return deltas
+
+def _rollup_key(table):
+    """Columns of the unique rollup key, matching `uq_expense_daily_rollup_key`"""
+    return [table.c.user_id, db.func.coalesce(table.c.category_id, db.literal_column('0')), table.c.day]
+
+def apply_rollup_deltas(deltas):
+    """Add rollup deltas within the current transaction.
+
+    SQLite and PostgreSQL upsert on the unique key, so concurrent writers
+    never insert the same (user, category, day) twice; other databases
+    update and insert when no row matched.
+    """
+    table = DailyExpenseRollup.__table__
+    insert = UPSERT_INSERTS.get(db.engine.dialect.name)
+
+    if insert is not None:
+        for (user_id, category_id, day), (total, count) in deltas.items():
+            stmt = insert(table).values(
+                user_id=user_id,
+                category_id=category_id,
+                day=day,
+                total_cents=total,
+                expense_count=count
+            )
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=_rollup_key(table),
+                set_={
+                    'total_cents': table.c.total_cents + stmt.excluded.total_cents,
+                    'expense_count': table.c.expense_count + stmt.excluded.expense_count
+                }
+            ))
+        return
+
+    for (user_id, category_id, day), (total, count) in deltas.items():
+        result = db.session.execute(
+            table.update().where(
+                table.c.user_id == user_id,
+                table.c.category_id == category_id,  # IS NULL for uncategorized
+                table.c.day == day
+            ).values(
+                total_cents=table.c.total_cents + total,
+                expense_count=table.c.expense_count + count
+            )
+        )
+        if result.rowcount == 0:
+            db.session.execute(table.insert().values(
+                user_id=user_id,
+                category_id=category_id,
+                day=day,
+                total_cents=total,
+                expense_count=count
+            ))
+
+def summary_stmt(user_id, start_day=None, end_day=None):
+    """SELECT of the per-category totals of a user's personal expenses between two days (inclusive).
+
+    Yields (category_name, total_cents) rows; the uncategorized total has a
+    None name.
+    """
+    stmt = select(
+        ExpenseCategory.name,
+        db.func.sum(DailyExpenseRollup.total_cents)
+    ).select_from(
+        DailyExpenseRollup
+    ).outerjoin(
+        ExpenseCategory,
+        ExpenseCategory.id == DailyExpenseRollup.category_id
+    ).where(
+        DailyExpenseRollup.user_id == user_id
+    )
+
+    if start_day:
+        stmt = stmt.where(DailyExpenseRollup.day >= start_day)
+    if end_day:
+        stmt = stmt.where(DailyExpenseRollup.day <= end_day)
+
+    return stmt.group_by(ExpenseCategory.name)
+
+def summarize(user_id, start_day=None, end_day=None):
+    """Per-category totals of a user's personal expenses between two days (inclusive).
+
+    Returns (category_name, total_cents) rows; the uncategorized total has a
+    None name.
+    """
+    return db.session.execute(summary_stmt(user_id, start_day, end_day)).all()
+
+def compute_rollups(user_id=None):
+    """Recompute rollups from the raw personal expenses.
+
+    Returns a {(user_id, category_id, day): (total_cents, count)} dict.
+    """
+    day = db.func.date(Expense.date)
+    query = db.session.query(
+        Expense.paid_by_id,
+        Expense.category_id,
+        day,
+        db.func.sum(Expense.amount_cents),
+        db.func.count(Expense.id)
+    ).filter(Expense.group_id.is_(None))
+
+    if user_id is not None:
+        query = query.filter(Expense.paid_by_id == user_id)
+
+    rollups = {}
+    for paid_by_id, category_id, expense_day, total, count in query.group_by(
+        Expense.paid_by_id, Expense.category_id, day
+    ):
+        # SQLite returns date() as an ISO string
+        if isinstance(expense_day, str):
+            expense_day = date.fromisoformat(expense_day)
+        rollups[(paid_by_id, category_id, expense_day)] = (total, count)
+
+    return rollups
+
+def _stored_rollups(user_id=None):
+    """Query of the stored rollups, optionally for a single user"""
+    query = DailyExpenseRollup.query
+    if user_id is not None:
+        query = query.filter(DailyExpenseRollup.user_id == user_id)
+    return query
+
+def check_rollups(user_id=None):
+    """Compare the stored rollups against the raw expenses.
+
+    Returns a list of (user_id, category_id, day, stored, expected) mismatches
+    where stored/expected are (total_cents, count) pairs.
+    """
+    expected = compute_rollups(user_id)
+    stored = {
+        (row.user_id, row.category_id, row.day): (row.total_cents, row.expense_count)
+        for row in _stored_rollups(user_id)
+    }
+
+    mismatches = []
+    for key in expected.keys() | stored.keys():
+        stored_row = stored.get(key, (0, 0))
+        expected_row = expected.get(key, (0, 0))
+        if stored_row != expected_row:
+            mismatches.append((*key, stored_row, expected_row))
+
+    return sorted(mismatches, key=lambda mismatch: (mismatch[0], mismatch[2], mismatch[1] or 0))
+
+def backfill_rollups(user_id=None):
+    """Rewrite the stored rollups from the raw expenses; returns the row count"""
+    expected = compute_rollups(user_id)
+
+    _stored_rollups(user_id).delete(synchronize_session=False)
+    db.session.add_all([
+        DailyExpenseRollup(
+            user_id=uid,
+            category_id=category_id,
+            day=day,
+            total_cents=total,
+            expense_count=count
+        )
+        for (uid, category_id, day), (total, count) in expected.items()
+    ])
+    db.session.commit()
+
+    return len(expected)
@@ -0,0 +1,144 @@
+import base64
+import binascii
+import re
+from sqlalchemy import DDL, and_, column, event, literal_column, or_, select, table, text
+from sqlalchemy.orm import joinedload
+from .. import db
+from ..models.expense import Expense, ExpenseCategory
+from ..models.group import GroupMembership
+from .pagination import InvalidCursor
+
+# FTS5 index of expense descriptions and category names, keyed by expense id.
+# It lives outside the models: FTS5 is SQLite only and Alembic cannot diff it
+SEARCH_TABLE = 'expense_search'
+
+CREATE_SEARCH_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS expense_search USING fts5("
+    "description, category, tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+DROP_SEARCH_TABLE = "DROP TABLE IF EXISTS expense_search"
+
+# Search scopes: the user's personal expenses, the expenses of their groups, or both
+SCOPES = ('all', 'personal', 'groups')
+
+expense_search = table(SEARCH_TABLE, column('rowid'), column('description'), column('category'))
+
+# create_all/drop_all manage the index alongside the models on SQLite
+event.listen(db.metadata, 'after_create', DDL(CREATE_SEARCH_TABLE).execute_if(dialect='sqlite'))
+event.listen(db.metadata, 'before_drop', DDL(DROP_SEARCH_TABLE).execute_if(dialect='sqlite'))
+
+def search_enabled():
+    """Whether the database supports the FTS5 index"""
+    return db.engine.dialect.name == 'sqlite'
+
+def index_expenses(expenses):
+    """Add expenses to the search index within the current transaction.
+
+    `expenses` are (id, description, category_id) triples; the category
+    names are looked up here so callers don't need to load them.
+    """
+    if not expenses or not search_enabled():
+        return
+
+    category_ids = {category_id for _, _, category_id in expenses} - {None}
+    names = {}
+    if category_ids:
+        names = dict(db.session.execute(
+            select(ExpenseCategory.id, ExpenseCategory.name).where(ExpenseCategory.id.in_(category_ids))
+        ).all())
+
+    db.session.execute(expense_search.insert(), [{
+        'rowid': expense_id,
+        'description': description,
+        'category': names.get(category_id, '')
+    } for expense_id, description, category_id in expenses])
+
+def rebuild_search_index():
+    """Recreate the search index from the expenses; returns the number of indexed expenses"""
+    if not search_enabled():
+        raise RuntimeError('Expense search requires SQLite with FTS5')
+
+    db.session.execute(text(DROP_SEARCH_TABLE))
+    db.session.execute(text(CREATE_SEARCH_TABLE))
+    db.session.execute(expense_search.insert().from_select(
+        ['rowid', 'description', 'category'],
+        select(
+            Expense.id,
+            Expense.description,
+            db.func.coalesce(ExpenseCategory.name, '')
+        ).outerjoin(
+            ExpenseCategory,
+            ExpenseCategory.id == Expense.category_id
+        )
+    ))
+    # Merge the index b-trees written by the bulk insert
+    db.session.execute(text("INSERT INTO expense_search(expense_search) VALUES ('optimize')"))
+    db.session.commit()
+
+    return db.session.query(db.func.count()).select_from(expense_search).scalar()
+
+def match_query(terms):
+    """FTS5 query matching every word of free text, the last one as a prefix.
+
+    Words are quoted so user input can never be read as FTS5 syntax.
+    Returns None when the text has no words.
+    """
+    words = re.findall(r'\w+', terms or '')
+    if not words:
+        return None
+    return ' '.join('"%s"' % word for word in words) + '*'
+
+def encode_offset(offset):
+    """Opaque cursor of a position in ranked results"""
+    return base64.urlsafe_b64encode(b'o%d' % offset).decode('ascii').rstrip('=')
+
+def decode_offset(token):
+    """Position in ranked results of an `encode_offset` cursor"""
+    try:
+        raw = base64.urlsafe_b64decode((token + '=' * (-len(token) % 4)).encode('ascii'))
+        if not raw.startswith(b'o'):
+            raise ValueError(token)
+        return max(0, int(raw[1:]))
+    except (ValueError, UnicodeError, binascii.Error):
+        raise InvalidCursor(token)
+
+def search_expenses(user_id, query, scope='all', group_id=None, limit=50, offset=0):
+    """Best-matching expenses the user can see, with the cursor of the next page.
+
+    Personal expenses are visible to their payer and group expenses to the
+    members of the group. Results are ordered by BM25 rank (best first),
+    then newest first.
+    """
+    rank = literal_column('bm25(expense_search)')
+    personal = and_(Expense.group_id.is_(None), Expense.paid_by_id == user_id)
+    member_groups = select(GroupMembership.group_id).where(GroupMembership.user_id == user_id)
+
+    if group_id is not None:
+        visible = Expense.group_id == group_id
+    elif scope == 'personal':
+        visible = personal
+    elif scope == 'groups':
+        visible = Expense.group_id.in_(member_groups)
+    else:
+        visible = or_(personal, Expense.group_id.in_(member_groups))
+
+    stmt = select(Expense).join(
+        expense_search,
+        expense_search.c.rowid == Expense.id
+    ).options(
+        joinedload(Expense.category),
+        joinedload(Expense.paid_by)
+    ).where(
+        literal_column(SEARCH_TABLE).op('MATCH')(query),
+        visible
+    ).order_by(rank, Expense.date.desc(), Expense.id.desc()).limit(limit + 1).offset(offset)
+
+    expenses = db.session.execute(stmt).scalars().all()
+
+    next_cursor = None
+    if len(expenses) > limit:
+        expenses = expenses[:limit]
+        next_cursor = encode_offset(offset + limit)
+
+    return expenses, next_cursor
@@ -0,0 +1,73 @@
+import heapq
+from collections import OrderedDict
+from threading import Lock
+from .. import db
+from .balances import compute_group_balances
+from .versions import GROUP, change_version_stmt
+
+# Settle-up plans kept per worker process
+PLAN_CACHE_SIZE = 1000
+
+# group_id -> (change version, plan), least recently used first
+_plan_cache = OrderedDict()
+_plan_cache_lock = Lock()
+
+def net_positions(group_id):
+    """Net position of each user in a group, in cents, from its latest balance checkpoint plus the newer splits"""
+    return {
+        user_id: cents
+        for (_, user_id), cents in compute_group_balances(group_id).items()
+        if cents
+    }
+
+def minimize_transfers(positions):
+    """Reduce net positions to a short list of transfers.
+
+    Repeatedly settles the largest debtor against the largest creditor using
+    two max-heaps, which needs at most n - 1 transfers for n users with a
+    non-zero position. `positions` maps user_id to cents (positive when owed
+    money); returns (from_user_id, to_user_id, cents) tuples.
+    """
+    creditors = [(-cents, user_id) for user_id, cents in positions.items() if cents > 0]
+    debtors = [(cents, user_id) for user_id, cents in positions.items() if cents < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+
+        # Push back whatever is left of the larger side
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+
+    return transfers
+
+def get_settlement_plan(group_id):
+    """Settle-up plan of a group, cached while the group's change version is unchanged.
+
+    Every expense bumps the version in its own transaction, so once it
+    commits each worker sees a new version and recomputes; a plan is never
+    served past a write, whichever worker or batch made it.
+    """
+    version = db.session.execute(change_version_stmt(GROUP, group_id)).scalar() or 0
+    with _plan_cache_lock:
+        entry = _plan_cache.get(group_id)
+        if entry is not None and entry[0] == version:
+            _plan_cache.move_to_end(group_id)
+            return entry[1]
+
+    plan = minimize_transfers(net_positions(group_id))
+
+    with _plan_cache_lock:
+        _plan_cache[group_id] = (version, plan)
+        _plan_cache.move_to_end(group_id)
+        while len(_plan_cache) > PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return plan
@@ -0,0 +1,60 @@
+from ..models.expense import SplitType
+from .money import allocate, from_cents, to_cents
+
+SPLIT_TYPES = {split_type.value: split_type for split_type in SplitType}
+
+# Percentages are weighted in hundredths of a percent
+FULL_PERCENTAGE = to_cents(100)
+
+class SplitError(ValueError):
+    """Raised when the splits of an expense are invalid"""
+
+def parse_splits(split_type, split_details, amount_cents):
+    """Validate split details and allocate the expense between the users.
+
+    Returns a list of (user_id, SplitType, amount_or_percentage, share_cents)
+    tuples whose shares add up to exactly `amount_cents`.
+    """
+    if not isinstance(split_type, str) or split_type not in SPLIT_TYPES:
+        raise SplitError("Invalid split type")
+
+    if not split_details:
+        raise SplitError("At least one split is required")
+
+    try:
+        user_ids = [user_data['user_id'] for user_data in split_details]
+        # Ids end up in sets and IN clauses; lists and objects are not ids
+        if any(isinstance(user_id, (list, dict)) for user_id in user_ids):
+            raise SplitError("Invalid split details")
+
+        if split_type == 'equal':
+            # Equal split among all specified users, leftover cents go to the first users
+            shares = allocate(amount_cents, [1] * len(user_ids))
+            return [
+                (user_id, SplitType.EQUAL, from_cents(share), share)
+                for user_id, share in zip(user_ids, shares)
+            ]
+
+        if split_type == 'exact':
+            # Exact amount split
+            shares = [to_cents(user_data['amount']) for user_data in split_details]
+            if sum(shares) != amount_cents:
+                raise SplitError("Split amounts must add up to the expense amount")
+            return [
+                (user_id, SplitType.EXACT, from_cents(share), share)
+                for user_id, share in zip(user_ids, shares)
+            ]
+
+        # Percentage-based split
+        weights = [to_cents(user_data['percentage']) for user_data in split_details]
+        if sum(weights) != FULL_PERCENTAGE or min(weights) < 0:
+            raise SplitError("Split percentages must add up to 100")
+        shares = allocate(amount_cents, weights)
+        return [
+            (user_id, SplitType.PERCENTAGE, from_cents(weight), share)
+            for user_id, weight, share in zip(user_ids, weights, shares)
+        ]
+    except SplitError:
+        raise
+    except (KeyError, TypeError, ValueError):
+        raise SplitError("Invalid split details")
@@ -0,0 +1,237 @@
+from datetime import timedelta
+from sqlalchemy import select
+from .. import db
+from ..models.expense import Expense, ExpenseCategory, ExpenseSplit
+from ..models.rollup import DailyExpenseRollup
+from ..models.user import User
+from .money import MINOR_UNITS
+from .reads import summary_days
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Trend periods: ISO weeks (starting on Monday) or calendar months
+GRANULARITIES = ('week', 'month')
+
+# Periods averaged by the trailing moving average
+DEFAULT_WINDOW = 3
+MAX_WINDOW = 52
+
+# Upper bound on the periods of one response, e.g. 20 years of weeks
+MAX_PERIODS = 1100
+
+# Day 0 of the epoch is a Thursday; weeks are numbered from the Monday before it
+_WEEK_OFFSET = 3
+
+class TrendError(ValueError):
+    """Raised when trend parameters are invalid"""
+
+def trends_enabled():
+    """Whether NumPy is installed"""
+    return np is not None
+
+def _columns(stmt, count):
+    """Result columns of a statement as `count` tuples, read in one pass"""
+    rows = db.session.execute(stmt).all()
+    if not rows:
+        return [()] * count
+    return list(zip(*rows))
+
+def _days(values):
+    """datetime64[D] array of dates, datetimes (floored to their day) or ISO strings"""
+    return np.array(values, dtype='datetime64[us]').astype('datetime64[D]')
+
+def _periods(days, granularity):
+    """Period number of every day: months or Monday-based weeks since the epoch"""
+    if granularity == 'month':
+        return days.astype('datetime64[M]').astype(np.int64)
+    return (days.astype(np.int64) + _WEEK_OFFSET) // 7
+
+def _period_labels(first, count, granularity):
+    """ISO labels of consecutive periods: 2025-01 for months, the Monday for weeks"""
+    periods = np.arange(first, first + count)
+    if granularity == 'month':
+        return np.datetime_as_string(periods.astype('datetime64[M]')).tolist()
+    return np.datetime_as_string((periods * 7 - _WEEK_OFFSET).astype('datetime64[D]')).tolist()
+
+def _series_stats(totals, window):
+    """Trailing moving averages, deltas and relative changes of period totals (one series per row)"""
+    periods = totals.shape[1]
+
+    # Trailing sums from a cumulative sum; the first periods average what they have
+    cumulative = np.zeros((totals.shape[0], periods + 1), dtype=np.int64)
+    np.cumsum(totals, axis=1, out=cumulative[:, 1:])
+    index = np.arange(periods)
+    low = np.maximum(index + 1 - window, 0)
+    moving_average = (cumulative[:, index + 1] - cumulative[:, low]) / (index + 1 - low)
+
+    delta = np.zeros_like(totals)
+    delta[:, 1:] = totals[:, 1:] - totals[:, :-1]
+    previous = np.zeros_like(totals)
+    previous[:, 1:] = totals[:, :-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.where(previous != 0, delta / previous, np.nan)
+
+    return moving_average, delta, change
+
+def _amounts(cents, decimals=2):
+    return np.round(cents / MINOR_UNITS, decimals).tolist()
+
+def _with_gaps(values, missing):
+    """List of values with None where `missing` is set"""
+    return [None if gap else value for value, gap in zip(values, missing)]
+
+def aggregate(days, keys, amounts, granularity, window, start_day=None, end_day=None):
+    """Per-key totals of every period between two days, with their trend statistics.
+
+    `days`, `keys` and `amounts` are parallel columns (amounts in cents).
+    Returns (period labels, keys in order, stats) where stats maps each key
+    and None (the total over all keys) to its series.
+    """
+    if granularity not in GRANULARITIES:
+        raise TrendError('Granularity must be week or month')
+    if not 1 <= window <= MAX_WINDOW:
+        raise TrendError('Window must be between 1 and %d periods' % MAX_WINDOW)
+
+    days = _days(days)
+    periods = _periods(days, granularity)
+    amounts = np.asarray(amounts, dtype=np.int64)
+
+    # The range covers the requested days, else the data; empty periods count as zero
+    bounds = []
+    for day, fallback in ((start_day, periods.min), (end_day, periods.max)):
+        if day is not None:
+            bounds.append(int(_periods(_days([day]), granularity)[0]))
+        elif len(periods):
+            bounds.append(int(fallback()))
+    if len(bounds) < 2:
+        return [], [], {}
+
+    first, last = bounds
+    count = last - first + 1
+    if count <= 0:
+        return [], [], {}
+    if count > MAX_PERIODS:
+        raise TrendError('The range spans more than %d periods' % MAX_PERIODS)
+
+    # Group with one bincount over (series, period) cells instead of a Python loop
+    series_keys, series = np.unique(np.asarray(keys, dtype=np.int64), return_inverse=True)
+    cells = series.reshape(-1) * count + (periods - first)
+    totals = np.bincount(
+        cells, weights=amounts, minlength=len(series_keys) * count
+    ).round().astype(np.int64).reshape(len(series_keys), count)
+    totals = np.vstack([totals, totals.sum(axis=0, keepdims=True)])
+
+    moving_average, delta, change = _series_stats(totals, window)
+    first_period = np.arange(count) == 0
+    no_change = np.isnan(change)
+    change = np.round(np.nan_to_num(change), 4)
+
+    stats = {}
+    for row, key in enumerate(series_keys.tolist() + [None]):
+        stats[key] = {
+            "totals": _amounts(totals[row]),
+            "moving_average": _amounts(moving_average[row]),
+            "delta": _with_gaps(_amounts(delta[row]), first_period),
+            "change": _with_gaps(change[row].tolist(), no_change[row])
+        }
+
+    return _period_labels(first, count, granularity), series_keys.tolist(), stats
+
+def trend_args(args):
+    """(granularity, window, start_day, end_day) of the trend query parameters"""
+    granularity = args.get('granularity', 'month')
+    if granularity not in GRANULARITIES:
+        raise TrendError('Granularity must be week or month')
+    window = args.get('window', DEFAULT_WINDOW, type=int)
+
+    try:
+        start_day, end_day = summary_days(args)
+    except ValueError:
+        raise TrendError('Dates must be in ISO format (YYYY-MM-DD)')
+
+    return granularity, window, start_day, end_day
+
+def _day_bounds(column, start_day, end_day):
+    """Filters of a datetime column to whole days between two days (inclusive)"""
+    filters = []
+    if start_day:
+        filters.append(column >= start_day)
+    if end_day:
+        filters.append(column < end_day + timedelta(days=1))
+    return filters
+
+def category_trends(user_id, granularity, window, start_day=None, end_day=None):
+    """Spending trends of a user's personal expenses per category, from the daily rollups"""
+    filters = [DailyExpenseRollup.user_id == user_id]
+    if start_day:
+        filters.append(DailyExpenseRollup.day >= start_day)
+    if end_day:
+        filters.append(DailyExpenseRollup.day <= end_day)
+
+    # Uncategorized rollups are keyed 0; category ids start at 1
+    days, keys, amounts = _columns(select(
+        DailyExpenseRollup.day,
+        db.func.coalesce(DailyExpenseRollup.category_id, 0),
+        DailyExpenseRollup.total_cents
+    ).where(*filters), 3)
+
+    labels, series_keys, stats = aggregate(days, keys, amounts, granularity, window, start_day, end_day)
+
+    names = {}
+    if series_keys:
+        names = dict(db.session.execute(
+            select(ExpenseCategory.id, ExpenseCategory.name).where(ExpenseCategory.id.in_(series_keys))
+        ).all())
+
+    return {
+        "granularity": granularity,
+        "window": window,
+        "periods": labels,
+        "by_category": [dict(
+            category_id=key,
+            category=names.get(key),
+            **stats[key]
+        ) for key in series_keys if key],
+        "uncategorized": stats.get(0),
+        "total": stats.get(None)
+    }
+
+def member_trends(group_id, granularity, window, start_day=None, end_day=None):
+    """Spending trends of a group per member: each member's share of the group's expenses"""
+    # Summed per day and member in SQL so only days cross the driver, not every split
+    day = db.func.date(Expense.date)
+    days, keys, amounts = _columns(select(
+        day,
+        ExpenseSplit.user_id,
+        db.func.sum(ExpenseSplit.amount_cents)
+    ).join(
+        Expense,
+        Expense.id == ExpenseSplit.expense_id
+    ).where(
+        Expense.group_id == group_id,
+        *_day_bounds(Expense.date, start_day, end_day)
+    ).group_by(day, ExpenseSplit.user_id), 3)
+
+    labels, series_keys, stats = aggregate(days, keys, amounts, granularity, window, start_day, end_day)
+
+    usernames = {}
+    if series_keys:
+        usernames = dict(db.session.execute(
+            select(User.id, User.username).where(User.id.in_(series_keys))
+        ).all())
+
+    return {
+        "group_id": group_id,
+        "granularity": granularity,
+        "window": window,
+        "periods": labels,
+        "by_member": [dict(
+            user_id=key,
+            username=usernames.get(key),
+            **stats[key]
+        ) for key in series_keys],
+        "total": stats.get(None)
+    }
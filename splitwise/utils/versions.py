@@ -0,0 +1,132 @@
+import zlib
+from functools import wraps
+from flask import request, make_response
+from sqlalchemy import and_, select
+from .. import db
+from ..models.group import GroupMembership
+from ..models.version import ChangeVersion
+
+# Version scopes
+USER = 'user'
+GROUP = 'group'
+
+def bump_versions(scope, keys):
+    """Increment the change versions of several users or groups in the current transaction"""
+    keys = set(keys)
+    if not keys:
+        return
+
+    table = ChangeVersion.__table__
+    result = db.session.execute(
+        table.update().where(
+            table.c.scope == scope,
+            table.c.key.in_(keys)
+        ).values(version=table.c.version + 1)
+    )
+
+    if result.rowcount < len(keys):
+        existing = set(db.session.scalars(
+            select(table.c.key).where(table.c.scope == scope, table.c.key.in_(keys))
+        ))
+        db.session.execute(table.insert(), [
+            {'scope': scope, 'key': key, 'version': 1}
+            for key in keys - existing
+        ])
+
+def bump_version(scope, key):
+    """Increment the change version of a user or a group in the current transaction"""
+    bump_versions(scope, [key])
+
+def make_etag(parts, query_string):
+    """Strong ETag from version parts, varying with the raw query string"""
+    query_hash = format(zlib.crc32(query_string), 'x')
+    return '-'.join(str(part) for part in parts) + '-' + query_hash
+
+def _make_etag(*parts):
+    """ETag of the current request from version parts"""
+    return make_etag(parts, request.query_string)
+
+def change_version_stmt(scope, key):
+    """SELECT of the change version of one user or group"""
+    return select(ChangeVersion.version).where(
+        ChangeVersion.scope == scope,
+        ChangeVersion.key == key
+    )
+
+def user_version_stmt(user_id):
+    """SELECT of a user's change version"""
+    return select(ChangeVersion.version).where(
+        ChangeVersion.scope == USER,
+        ChangeVersion.key == user_id
+    )
+
+def group_version_stmt(user_id, group_id):
+    """SELECT of (membership id, group version); no row for non-members"""
+    return select(
+        GroupMembership.id,
+        ChangeVersion.version
+    ).outerjoin(
+        ChangeVersion,
+        and_(ChangeVersion.scope == GROUP, ChangeVersion.key == GroupMembership.group_id)
+    ).where(
+        GroupMembership.user_id == user_id,
+        GroupMembership.group_id == group_id
+    ).limit(1)
+
+def user_groups_version_stmt(user_id):
+    """SELECT of (membership count, sum of the versions) of the user's groups"""
+    return select(
+        db.func.count(GroupMembership.id),
+        db.func.coalesce(db.func.sum(ChangeVersion.version), 0)
+    ).outerjoin(
+        ChangeVersion,
+        and_(ChangeVersion.scope == GROUP, ChangeVersion.key == GroupMembership.group_id)
+    ).where(
+        GroupMembership.user_id == user_id
+    )
+
+def user_etag(current_user, **kwargs):
+    """ETag of responses that only depend on the user's own data"""
+    version = db.session.execute(user_version_stmt(current_user.id)).scalar()
+    return _make_etag('u', current_user.id, version or 0)
+
+def group_etag(current_user, group_id, **kwargs):
+    """ETag of responses built from a group's data; None for non-members"""
+    row = db.session.execute(group_version_stmt(current_user.id, group_id)).first()
+
+    # Let the view answer with its own 403/404
+    if row is None:
+        return None
+    return _make_etag('g', group_id, row.version or 0)
+
+def user_groups_etag(current_user, **kwargs):
+    """ETag of the user's group listing: changes with memberships or any listed group"""
+    membership_count, version_sum = db.session.execute(user_groups_version_stmt(current_user.id)).one()
+    return _make_etag('gl', current_user.id, membership_count, version_sum)
+
+def conditional(etag_func):
+    """Decorator answering If-None-Match with a 304 before the view runs.
+
+    `etag_func` receives the current user and the view arguments and
+    returns the ETag of the response, or None to skip conditional handling.
+    Must be applied below `token_required`.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(current_user, *args, **kwargs):
+            etag = etag_func(current_user, **kwargs)
+            if etag is None:
+                return f(current_user, *args, **kwargs)
+
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(current_user, *args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            return response
+
+        return decorated
+    return decorator
@@ -0,0 +1,168 @@
+import queue
+import threading
+import time
+from flask import request
+from .. import db
+from .bulk_import import insert_expenses
+from .jwt_utils import BATCH_USER_KEY
+
+class WriteQueueError(RuntimeError):
+    """Raised to a request whose expense could not be committed by the writer"""
+
+class _Pending:
+    """One queued expense and the outcome its request waits for"""
+
+    __slots__ = ('entry', 'done', 'expense_id', 'error', 'taken', 'abandoned')
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.done = threading.Event()
+        self.expense_id = None
+        self.error = None
+        self.taken = False
+        self.abandoned = False
+
+class WriteQueue:
+    """Group commit of new expenses on a single writer thread.
+
+    Requests hand in validated (expense values, splits) entries and block
+    until the transaction holding theirs commits. The writer collects
+    entries for up to WRITE_QUEUE_MAX_DELAY_MS after the first one (or
+    WRITE_QUEUE_MAX_BATCH entries) and writes them all with one commit, so
+    a burst pays one fsync instead of one per request and its writers no
+    longer queue on the SQLite lock.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.max_delay = 0.002
+        self.max_batch = 256
+        self.timeout = 10
+        self.batches = 0
+        self.entries = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._claim_lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure the queue from the app config; the writer starts on first use"""
+        app.config.setdefault('WRITE_QUEUE_ENABLED', False)
+        app.config.setdefault('WRITE_QUEUE_MAX_DELAY_MS', 2)
+        app.config.setdefault('WRITE_QUEUE_MAX_BATCH', 256)
+        app.config.setdefault('WRITE_QUEUE_TIMEOUT', 10)
+
+        self.app = app
+        self.enabled = app.config['WRITE_QUEUE_ENABLED']
+        self.max_delay = app.config['WRITE_QUEUE_MAX_DELAY_MS'] / 1000
+        self.max_batch = max(1, app.config['WRITE_QUEUE_MAX_BATCH'])
+        self.timeout = app.config['WRITE_QUEUE_TIMEOUT']
+
+    def submit(self, entry):
+        """Queue one expense and wait for its batch to commit; returns the new expense id.
+
+        Raises WriteQueueError when the write failed or did not finish within
+        WRITE_QUEUE_TIMEOUT seconds. An expense the writer had not picked up
+        yet is then dropped; one it was already writing may still commit.
+        """
+        self._ensure_writer()
+        pending = _Pending(entry)
+        self._queue.put(pending)
+
+        if not pending.done.wait(self.timeout):
+            with self._claim_lock:
+                pending.abandoned = not pending.taken
+            raise WriteQueueError('Timed out waiting for the write queue')
+        if pending.error is not None:
+            raise WriteQueueError('Could not save the expense') from pending.error
+        return pending.expense_id
+
+    def _ensure_writer(self):
+        # Started lazily so every forked worker process gets its own writer
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                # A fresh context (and session) per batch
+                with self.app.app_context():
+                    self._write(batch)
+            except Exception as e:
+                # Whatever went wrong, the requests of the batch get their answer
+                # and the writer lives on for the next one
+                self.app.logger.exception('Write queue could not write a batch')
+                self._fail(batch, e)
+
+    def _collect(self):
+        """Wait for the next batch of entries their requests still wait for"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            with self._claim_lock:
+                batch = [pending for pending in batch if not pending.abandoned]
+                for pending in batch:
+                    pending.taken = True
+            if batch:
+                return batch
+
+    def _fail(self, batch, error):
+        """Hand an error to every request of the batch still waiting"""
+        for pending in batch:
+            if not pending.done.is_set():
+                pending.error = error
+                pending.done.set()
+
+    def _write(self, batch):
+        """Commit a batch; when it fails, retry its entries one by one so only the bad one errors"""
+        try:
+            expense_ids = insert_expenses([pending.entry for pending in batch])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) > 1:
+                for pending in batch:
+                    self._write([pending])
+                return
+            self.app.logger.exception('Write queue could not save an expense')
+            batch[0].error = e
+            batch[0].done.set()
+            return
+
+        self.batches += 1
+        self.entries += len(batch)
+        for pending, expense_id in zip(batch, expense_ids):
+            pending.expense_id = expense_id
+            pending.done.set()
+
+write_queue = WriteQueue()
+
+def save_expense(expense, splits):
+    """Insert one validated expense with its splits and derived data, and commit.
+
+    Goes through the write queue when it is enabled, except inside a
+    `/batch` request whose operations must share the batch transaction.
+    Returns the new expense id.
+    """
+    if write_queue.enabled and BATCH_USER_KEY not in request.environ:
+        # End the request's read transaction first: without WAL its shared
+        # lock would keep the writer from committing
+        db.session.commit()
+        return write_queue.submit((expense, splits))
+
+    (expense_id,) = insert_expenses([(expense, splits)])
+    db.session.commit()
+    return expense_id
@@ -0,0 +1,52 @@
+import pytest
+from splitwise import create_app, db
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App on a fresh SQLite database with fast inline password hashing"""
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///%s' % (tmp_path / 'test.db'))
+    monkeypatch.setenv('PASSWORD_HASH_WORKERS', '0')
+    monkeypatch.setenv('PASSWORD_HASH_COST', '1000')
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def register(client):
+    """Register a user; returns (user_id, auth headers)"""
+    def register(username):
+        response = client.post('/auth/register', json={
+            'username': username,
+            'email': '%s@example.com' % username,
+            'password': 'password123'
+        })
+        assert response.status_code == 201, response.json
+        return response.json['user_id'], {'Authorization': 'Bearer ' + response.json['token']}
+    return register
+
+@pytest.fixture
+def users(register):
+    return [register(username) for username in ('alice', 'bob', 'carol')]
+
+@pytest.fixture
+def group_id(client, users):
+    """Group created by alice with bob and carol as members"""
+    _, headers = users[0]
+    response = client.post('/groups/create', headers=headers, json={
+        'name': 'Trip',
+        'members': ['bob@example.com', 'carol@example.com']
+    })
+    assert response.status_code == 201, response.json
+    return response.json['group_id']
@@ -0,0 +1,66 @@
+from fnmatch import fnmatchcase
+from threading import Lock
+
+class FakeRedis:
+    """In-memory stand-in for the redis-py calls RedisBackend makes.
+
+    Values come back as bytes, or as str with `decode_responses` like a real
+    client; expiry times are accepted and ignored.
+    """
+
+    def __init__(self, decode_responses=False):
+        self.decode_responses = decode_responses
+        self.data = {}
+        self._lock = Lock()
+
+    def _out(self, value):
+        if value is None or not self.decode_responses:
+            return value
+        return value.decode()
+
+    def get(self, key):
+        with self._lock:
+            return self._out(self.data.get(key))
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self.data[key] = value.encode() if isinstance(value, str) else bytes(value)
+
+    def mget(self, keys):
+        with self._lock:
+            return [self._out(self.data.get(key)) for key in keys]
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self.data.get(key, b'0')) + 1
+            self.data[key] = str(value).encode()
+            return value
+
+    def delete(self, *keys):
+        with self._lock:
+            keys = [key.decode() if isinstance(key, bytes) else key for key in keys]
+            return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def scan_iter(self, match='*'):
+        with self._lock:
+            keys = [key for key in self.data if fnmatchcase(key, match)]
+        return iter(keys if self.decode_responses else [key.encode() for key in keys])
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+class FakePipeline:
+    """Queues commands and runs them on execute"""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def incr(self, key):
+        self.commands.append((self.client.incr, (key,)))
+        return self
+
+    def execute(self):
+        results = [command(*args) for command, args in self.commands]
+        self.commands = []
+        return results
@@ -0,0 +1,41 @@
+from splitwise import db
+from splitwise.utils.identity_cache import identity_cache
+from splitwise.utils.query_plan import capture_queries
+
+def test_logout_revokes_tokens_on_other_workers(client, users):
+    (_, headers), _, _ = users
+    assert client.get('/auth/profile', headers=headers).status_code == 200
+    assert client.post('/auth/logout', headers=headers).status_code == 200
+
+    # Another worker has no cached identity and reloads the user
+    identity_cache.clear()
+    response = client.get('/auth/profile', headers=headers)
+    assert response.status_code == 401
+    assert response.json['error'] == 'Token has been revoked'
+
+def test_trusted_claims_check_the_token_version_once(app, client, users):
+    (_, headers), _, _ = users
+    app.config['JWT_TRUST_CLAIMS'] = True
+    identity_cache.clear()
+
+    with app.app_context(), capture_queries(db.engine) as captured:
+        response = client.get('/auth/profile', headers=headers)
+    assert response.status_code == 200
+    assert response.json['username'] == 'alice'
+    assert [' '.join(statement.split()) for statement, _ in captured] == [
+        'SELECT user.token_version FROM user WHERE user.id = ?'
+    ]
+
+    # The identity built from the claims is cached like a loaded user
+    with app.app_context(), capture_queries(db.engine) as captured:
+        response = client.get('/auth/profile', headers=headers)
+    assert response.status_code == 200
+    assert captured == []
+
+    # Logging out replaces the cached identity in this worker and revokes on reload elsewhere
+    assert client.post('/auth/logout', headers=headers).status_code == 200
+    assert client.get('/auth/profile', headers=headers).status_code == 401
+    identity_cache.clear()
+    response = client.get('/auth/profile', headers=headers)
+    assert response.status_code == 401
+    assert response.json['error'] == 'Token has been revoked'
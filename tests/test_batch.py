@@ -0,0 +1,91 @@
+from splitwise import db
+from splitwise.models.expense import Expense
+from splitwise.utils.batch import BatchRunner
+from splitwise.utils.rollups import check_rollups
+from splitwise.utils.settlement import get_settlement_plan
+
+def group_expense(group_id, user_ids, amount=30):
+    return {
+        'path': '/expenses/create',
+        'body': {
+            'description': 'dinner',
+            'amount': amount,
+            'group_id': group_id,
+            'splits': [{'user_id': user_id} for user_id in user_ids]
+        }
+    }
+
+def test_failed_operation_only_rolls_back_its_savepoint(app, client, users, group_id):
+    (alice, headers), (bob, _), _ = users
+
+    response = client.post('/batch', headers=headers, json={'operations': [
+        {'path': '/expenses/personal', 'body': {'description': 'coffee', 'amount': 3}},
+        {'path': '/expenses/personal', 'body': {'description': 'no amount'}},
+        group_expense(group_id, [alice, bob]),
+        {'path': '/expenses/create', 'body': {'description': 'x', 'amount': 5, 'group_id': 999}},
+        {'method': 'GET', 'path': '/groups/'}
+    ]})
+
+    assert response.status_code == 200
+    assert [result['status'] for result in response.json['results']] == [201, 400, 201, 404, 400]
+    assert response.json['committed'] is True
+
+    balances = client.get('/groups/%d/balances' % group_id, headers=headers).json['balances']
+    assert {row['user_id']: row['balance'] for row in balances}[alice] == 15
+    with app.app_context():
+        assert Expense.query.count() == 2
+        assert check_rollups() == []
+
+def test_atomic_batch_rolls_back_everything(app, client, users, group_id):
+    (alice, headers), (bob, _), _ = users
+
+    response = client.post('/batch', headers=headers, json={'atomic': True, 'operations': [
+        group_expense(group_id, [alice, bob]),
+        {'path': '/expenses/personal', 'body': {'description': 'no amount'}},
+        {'path': '/expenses/personal', 'body': {'description': 'coffee', 'amount': 3}}
+    ]})
+
+    assert [result['status'] for result in response.json['results']] == [201, 400, 424]
+    assert response.json['committed'] is False
+    with app.app_context():
+        assert Expense.query.count() == 0
+    assert client.get('/groups/%d/settle_up' % group_id, headers=headers).json['transfers'] == []
+
+def test_batch_invalidates_cached_responses_on_commit(client, users):
+    (_, headers), _, _ = users
+    client.get('/expenses/personal/summary', headers=headers)
+    assert client.get('/expenses/personal/summary', headers=headers).headers['X-Cache'] == 'HIT'
+
+    client.post('/batch', headers=headers, json={'operations': [
+        {'path': '/expenses/personal', 'body': {'description': 'coffee', 'amount': 3}}
+    ]})
+
+    response = client.get('/expenses/personal/summary', headers=headers)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.json['total'] == 3
+
+def test_settle_up_after_batch_reflects_the_batch(app, client, users, group_id, monkeypatch):
+    (alice, headers), (bob, _), _ = users
+    assert client.get('/groups/%d/settle_up' % group_id, headers=headers).json['transfers'] == []
+
+    # A settle-up served by another request while the batch is still open
+    # caches a plan built from the pre-batch data
+    run_operation = BatchRunner._run_operation
+    mid_batch_plans = []
+
+    def run_operation_then_settle_up(self, *args):
+        result = run_operation(self, *args)
+        with app.app_context():
+            mid_batch_plans.append(get_settlement_plan(group_id))
+            db.session.remove()
+        return result
+
+    monkeypatch.setattr(BatchRunner, '_run_operation', run_operation_then_settle_up)
+    response = client.post('/batch', headers=headers, json={'operations': [
+        group_expense(group_id, [alice, bob])
+    ]})
+    assert response.json['committed'] is True
+    assert mid_batch_plans == [[]]
+
+    transfers = client.get('/groups/%d/settle_up' % group_id, headers=headers).json['transfers']
+    assert [(t['from_user_id'], t['to_user_id'], t['amount']) for t in transfers] == [(bob, alice, 15)]
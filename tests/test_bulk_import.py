@@ -0,0 +1,71 @@
+import json
+
+def post_bulk(client, headers, body, content_type):
+    return client.post('/expenses/bulk', headers={**headers, 'Content-Type': content_type}, data=body)
+
+def test_invalid_utf8_fails_only_its_row(client, users):
+    (_, headers), _, _ = users
+    body = (
+        b'description,amount,date,category_id,group_id,split_type,splits\n'
+        b'coffee,3,,,,,\n'
+        b'caf\xe9,4,,,,,\n'
+        b'tea,2,,,,,\n'
+    )
+
+    response = post_bulk(client, headers, body, 'text/csv')
+    assert response.status_code == 200
+    assert response.json['inserted'] == 2
+    assert response.json['errors'] == [{"line": 3, "error": "Row is not valid UTF-8"}]
+
+def test_rows_follow_the_create_endpoint_amount_rule(client, users, group_id):
+    (alice, headers), (bob, _), _ = users
+    rows = [
+        {'description': 'refund', 'amount': -5},
+        {'description': 'no amount'},
+        {'description': 'zero', 'amount': 0},
+        {'description': 'words', 'amount': 'ten'},
+        {'description': 'dinner', 'amount': '30', 'group_id': group_id,
+         'splits': [{'user_id': alice}, {'user_id': bob}]}
+    ]
+
+    response = post_bulk(client, headers, '\n'.join(json.dumps(row) for row in rows), 'application/x-ndjson')
+    assert response.json['inserted'] == 2
+    assert response.json['errors'] == [
+        {"line": 2, "error": "Amount is required"},
+        {"line": 3, "error": "Amount is required"},
+        {"line": 4, "error": "Invalid amount"}
+    ]
+
+    # The single-create endpoint takes and refuses the same amounts
+    for amount, status in ((-5, 201), (0, 400), ('ten', 400)):
+        response = client.post('/expenses/personal', headers=headers, json={'description': 'x', 'amount': amount})
+        assert response.status_code == status
+
+def test_non_scalar_ids_and_split_types_are_row_errors(client, users, group_id):
+    (alice, headers), (bob, _), _ = users
+    splits = [{'user_id': alice}, {'user_id': bob}]
+    rows = [
+        {'description': 'a', 'amount': 1, 'category_id': [1]},
+        {'description': 'b', 'amount': 1, 'group_id': {'id': group_id}},
+        {'description': 'c', 'amount': 1, 'group_id': group_id, 'split_type': ['equal'], 'splits': splits},
+        {'description': 'd', 'amount': 1, 'group_id': group_id, 'splits': [{'user_id': [alice]}]},
+        {'description': 'e', 'amount': 1, 'group_id': True, 'splits': splits},
+        {'description': 'f', 'amount': 1, 'group_id': group_id, 'splits': splits}
+    ]
+
+    response = post_bulk(client, headers, '\n'.join(json.dumps(row) for row in rows), 'application/x-ndjson')
+    assert response.status_code == 200
+    assert response.json['inserted'] == 1
+    assert response.json['errors'] == [
+        {"line": 1, "error": "Invalid category"},
+        {"line": 2, "error": "Invalid group"},
+        {"line": 3, "error": "Invalid split type"},
+        {"line": 4, "error": "Invalid split details"},
+        {"line": 5, "error": "Invalid group"}
+    ]
+
+    response = client.post('/expenses/create', headers=headers, json={
+        'description': 'x', 'amount': 1, 'group_id': group_id, 'split_type': ['x'], 'splits': splits
+    })
+    assert response.status_code == 400
+    assert response.json['error'] == 'Invalid split type'
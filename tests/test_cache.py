@@ -0,0 +1,90 @@
+import pytest
+from splitwise import db
+from splitwise.models.user import User
+from splitwise.utils.cache import DEFERRED_TAGS, RedisBackend, invalidate, response_cache, user_tag
+from .fake_redis import FakeRedis
+
+def test_write_invalidates_the_cached_summary(client, users):
+    _, headers = users[0]
+    client.get('/expenses/personal/summary', headers=headers)
+    assert client.get('/expenses/personal/summary', headers=headers).headers['X-Cache'] == 'HIT'
+
+    client.post('/expenses/personal', headers=headers, json={'description': 'coffee', 'amount': 3})
+
+    response = client.get('/expenses/personal/summary', headers=headers)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.json['total'] == 3
+
+def test_tags_are_published_only_on_commit(app):
+    tag = user_tag(1)
+    with app.app_context():
+        versions = response_cache.backend.tag_versions([tag])
+
+        # Views invalidate after their writes, inside an open transaction
+        db.session.add(User(username='dave', email='dave@example.com', password_hash='x'))
+        db.session.flush()
+        invalidate(tag)
+        db.session.rollback()
+        db.session.commit()
+        assert response_cache.backend.tag_versions([tag]) == versions
+
+        invalidate(tag)
+        db.session.commit()
+        assert response_cache.backend.tag_versions([tag]) != versions
+
+def test_deferred_tags_are_collected_instead_of_published(app):
+    tag = user_tag(1)
+    deferred = set()
+    with app.app_context():
+        versions = response_cache.backend.tag_versions([tag])
+        db.session.info[DEFERRED_TAGS] = deferred
+
+        invalidate(tag)
+        db.session.commit()
+
+        assert deferred == {tag}
+        assert response_cache.backend.tag_versions([tag]) == versions
+
+def test_rolled_back_batch_keeps_the_cache(client, users):
+    _, headers = users[0]
+    client.get('/expenses/personal/summary', headers=headers)
+
+    response = client.post('/batch', headers=headers, json={'atomic': True, 'operations': [
+        {'path': '/expenses/personal', 'body': {'description': 'coffee', 'amount': 3}},
+        {'path': '/expenses/personal', 'body': {'description': 'no amount'}}
+    ]})
+    assert response.json['committed'] is False
+
+    response = client.get('/expenses/personal/summary', headers=headers)
+    assert response.headers['X-Cache'] == 'HIT'
+    assert response.json['total'] == 0
+
+@pytest.fixture(params=[False, True], ids=['bytes', 'decoded'])
+def redis_backend(app, request):
+    """Response cache on RedisBackend over the in-repo fake client"""
+    backend = RedisBackend(FakeRedis(decode_responses=request.param))
+    response_cache.init_app(app, backend=backend)
+    return backend
+
+def test_redis_backend_serves_and_invalidates_cached_routes(client, users, group_id, redis_backend):
+    (alice, headers), (bob, _), _ = users
+    for path in ('/expenses/personal/summary', '/groups/%d/balances' % group_id):
+        assert client.get(path, headers=headers).headers['X-Cache'] == 'MISS'
+        assert client.get(path, headers=headers).headers['X-Cache'] == 'HIT'
+    assert redis_backend.size() == 2
+
+    client.post('/expenses/personal', headers=headers, json={'description': 'coffee', 'amount': 3})
+    response = client.get('/expenses/personal/summary', headers=headers)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.json['total'] == 3
+    assert client.get('/groups/%d/balances' % group_id, headers=headers).headers['X-Cache'] == 'HIT'
+
+    client.post('/expenses/create', headers=headers, json={
+        'description': 'dinner', 'amount': 30, 'group_id': group_id,
+        'splits': [{'user_id': alice}, {'user_id': bob}]
+    })
+    assert client.get('/groups/%d/balances' % group_id, headers=headers).headers['X-Cache'] == 'MISS'
+
+    redis_backend.clear()
+    assert redis_backend.size() == 0
+    assert redis_backend.tag_versions([user_tag(alice)]) == [0]
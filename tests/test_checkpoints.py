@@ -0,0 +1,64 @@
+import pytest
+from splitwise import db
+from splitwise.models.balance import BalanceCheckpoint, GroupBalance
+from splitwise.utils.balances import compact_balances, compute_group_balances, rebuild_balances, verify_checkpoints
+
+@pytest.fixture
+def add_expense(client, users, group_id):
+    """Post a group expense paid by alice and split equally between everyone"""
+    (_, headers), _, _ = users
+
+    def add_expense(amount):
+        response = client.post('/expenses/create', headers=headers, json={
+            'description': 'dinner',
+            'amount': amount,
+            'group_id': group_id,
+            'splits': [{'user_id': user_id} for user_id, _ in users]
+        })
+        assert response.status_code == 201, response.json
+    return add_expense
+
+def test_checkpoints_match_a_full_recomputation(app, add_expense, group_id):
+    for amount in (30, 9, 12):
+        add_expense(amount)
+
+    with app.app_context():
+        assert compact_balances(min_expenses=5) == 0
+        assert compact_balances() == 1
+        assert compact_balances() == 0
+
+    add_expense(6)
+    with app.app_context():
+        assert compute_group_balances(group_id) == compute_group_balances(group_id, checkpoints=False)
+        assert compute_group_balances() == compute_group_balances(checkpoints=False)
+
+        assert compact_balances(keep=1) == 1
+        assert db.session.query(BalanceCheckpoint.watermark).distinct().count() == 1
+        assert verify_checkpoints() == []
+
+def test_ledger_matches_checkpointed_balances(app, add_expense, group_id):
+    for amount in (30, 10):
+        add_expense(amount)
+    with app.app_context():
+        compact_balances()
+    add_expense(7)
+
+    with app.app_context():
+        ledger = {(row.group_id, row.user_id): row.balance_cents for row in GroupBalance.query}
+        assert ledger == dict(compute_group_balances(group_id))
+        assert rebuild_balances(apply=False) == []
+
+def test_wrong_checkpoint_is_reported_not_trusted(app, users, add_expense, group_id):
+    _, (bob, _), _ = users
+    add_expense(30)
+    with app.app_context():
+        compact_balances()
+        checkpoint = BalanceCheckpoint.query.filter_by(user_id=bob).one()
+        checkpoint.balance_cents += 100
+        db.session.commit()
+
+        assert [mismatch[2:] for mismatch in verify_checkpoints()] == [(bob, -900, -1000)]
+        # The rebuild recomputes from every split, so the ledger stays right
+        assert rebuild_balances(apply=False) == []
+        rebuild_balances()
+        assert db.session.get(GroupBalance, (group_id, bob)).balance_cents == -1000
@@ -0,0 +1,36 @@
+from splitwise import db
+from splitwise.models.expense import Expense
+
+def test_generate_data_compares_amount_bounds_as_numbers(app):
+    runner = app.test_cli_runner()
+    with app.app_context():
+        result = runner.invoke(args=[
+            'generate-data', '--users', '10', '--groups', '2', '--expenses', '100', '--amount-range', '5:20'
+        ])
+        assert result.exit_code == 0, result.output
+
+        low, high = db.session.query(db.func.min(Expense.amount_cents), db.func.max(Expense.amount_cents)).one()
+    assert 500 <= low <= high <= 2000
+
+def test_generate_data_rejects_bad_amount_ranges(app):
+    runner = app.test_cli_runner()
+    for amount_range, error in (('20:5', '20 is larger than 5'), ('a:5', 'expected low:high')):
+        with app.app_context():
+            result = runner.invoke(args=['generate-data', '--amount-range', amount_range])
+        assert result.exit_code == 2
+        assert error in result.output
+
+def test_explain_routes_audits_streamed_and_search_routes(app, client, users, group_id):
+    (_, headers), _, _ = users
+    client.post('/expenses/personal', headers=headers, json={'description': 'dinner in Lisbon', 'amount': 20})
+
+    runner = app.test_cli_runner()
+    with app.app_context():
+        result = runner.invoke(args=['explain-routes'])
+    assert result.exit_code == 0, result.output
+    assert 'Traceback' not in result.output
+
+    audited = result.output.split('\n/')
+    personal = next(block for block in audited if block.startswith('expenses/personal [200]'))
+    assert 'FROM expense LEFT OUTER JOIN expense_category' in personal
+    assert any(block.startswith('expenses/search?q=dinner [200]') for block in audited)
@@ -0,0 +1,55 @@
+import logging
+from splitwise.utils.metrics import metrics
+
+def test_streamed_response_is_recorded_once_its_body_is_sent(client, users, monkeypatch):
+    _, headers = users[0]
+    client.post('/expenses/personal', headers=headers, json={'description': 'coffee', 'amount': 3})
+
+    observed = []
+    def observe(endpoint, method, status, elapsed, stats):
+        observed.append((endpoint, status, stats.statements))
+    monkeypatch.setattr(metrics, 'observe', observe)
+
+    response = client.get('/expenses/personal', headers=headers)
+    assert response.is_streamed
+    assert observed == []
+    assert [expense['description'] for expense in response.json] == ['coffee']
+    response.close()
+
+    # The expenses query runs while the body streams and is counted with it
+    assert len(observed) == 1
+    endpoint, status, statements = observed[0]
+    assert (endpoint, status) == ('expenses.get_personal_expenses', 200)
+    assert statements >= 2
+
+def test_rows_returned_by_sqlite_selects_are_counted(client, users, group_id, monkeypatch):
+    _, headers = users[0]
+    observed = []
+    monkeypatch.setattr(metrics, 'observe', lambda endpoint, method, status, elapsed, stats: observed.append(stats.rows))
+
+    response = client.get('/groups/?include=members', headers=headers)
+    assert response.status_code == 200
+    response.close()
+
+    # At least the three member rows, counted as the SELECTs are fetched
+    assert observed and observed[0] >= 3
+
+def test_slow_request_log_names_the_request(client, users, monkeypatch, caplog):
+    _, headers = users[0]
+    monkeypatch.setattr(metrics, 'slow_request_seconds', 0)
+
+    with caplog.at_level(logging.WARNING):
+        client.post('/expenses/personal', headers=headers, json={'description': 'coffee', 'amount': 3}).close()
+
+    messages = [record.getMessage() for record in caplog.records if record.getMessage().startswith('Slow request')]
+    assert len(messages) == 1
+    assert messages[0].startswith('Slow request POST /expenses/personal (expenses.create_personal_expense)')
+    assert 'INSERT INTO expense' in messages[0]
+
+def test_metrics_are_exported(client, users):
+    _, headers = users[0]
+    client.get('/groups/', headers=headers).close()
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'splitwise_requests_total{endpoint="groups.get_user_groups",method="GET",status="200"}' in text
+    assert 'splitwise_sql_rows_total{endpoint="groups.get_user_groups"}' in text
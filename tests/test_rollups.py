@@ -0,0 +1,25 @@
+from datetime import date
+import pytest
+from sqlalchemy.exc import IntegrityError
+from splitwise import db
+from splitwise.models.rollup import DailyExpenseRollup
+from splitwise.utils.rollups import check_rollups
+
+def test_expenses_of_a_day_share_one_rollup_row(app, client, users):
+    alice, headers = users[0]
+    for amount in (3, 4.5):
+        response = client.post('/expenses/personal', headers=headers, json={'description': 'coffee', 'amount': amount})
+        assert response.status_code == 201
+
+    with app.app_context():
+        rows = DailyExpenseRollup.query.filter_by(user_id=alice).all()
+        assert [(row.category_id, row.total_cents, row.expense_count) for row in rows] == [(None, 750, 2)]
+        assert check_rollups() == []
+
+def test_unique_key_treats_uncategorized_as_one_category(app, users):
+    alice, _ = users[0]
+    with app.app_context():
+        for _ in range(2):
+            db.session.add(DailyExpenseRollup(user_id=alice, category_id=None, day=date(2026, 1, 1)))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
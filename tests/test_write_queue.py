@@ -0,0 +1,106 @@
+import threading
+import pytest
+from splitwise import db
+from splitwise.models.expense import Expense
+from splitwise.utils import write_queue as write_queue_module
+from splitwise.utils.balances import rebuild_balances
+from splitwise.utils.rollups import check_rollups
+from splitwise.utils.write_queue import write_queue
+
+@pytest.fixture
+def queued(app):
+    app.config['WRITE_QUEUE_ENABLED'] = True
+    write_queue.init_app(app)
+    yield write_queue
+    app.config['WRITE_QUEUE_ENABLED'] = False
+    write_queue.init_app(app)
+
+def post_personal(app, headers, description, results):
+    response = app.test_client().post('/expenses/personal', headers=headers, json={
+        'description': description,
+        'amount': 2
+    })
+    results[description] = response.status_code
+
+def test_concurrent_writes_commit_with_their_derived_data(app, client, users, group_id, queued):
+    (alice, headers), (bob, _), _ = users
+    results = {}
+
+    threads = [threading.Thread(target=post_personal, args=(app, headers, 'coffee %d' % i, results)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    response = client.post('/expenses/create', headers=headers, json={
+        'description': 'dinner', 'amount': 10, 'group_id': group_id,
+        'splits': [{'user_id': alice}, {'user_id': bob}]
+    })
+
+    assert response.status_code == 201
+    assert set(results.values()) == {201}
+    assert client.get('/expenses/personal/summary', headers=headers).json['total'] == 40
+    with app.app_context():
+        assert check_rollups() == []
+        assert rebuild_balances(apply=False) == []
+
+def test_failed_entry_only_fails_its_own_request(app, client, users, queued, monkeypatch):
+    (_, headers), _, _ = users
+    insert_expenses = write_queue_module.insert_expenses
+
+    def insert_unless_bad(entries):
+        if any(expense['description'] == 'bad' for expense, _ in entries):
+            raise RuntimeError('constraint failed')
+        return insert_expenses(entries)
+
+    monkeypatch.setattr(write_queue_module, 'insert_expenses', insert_unless_bad)
+    results = {}
+    threads = [threading.Thread(target=post_personal, args=(app, headers, description, results))
+               for description in ('good', 'bad', 'fine')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {'good': 201, 'bad': 503, 'fine': 201}
+    with app.app_context():
+        assert sorted(expense.description for expense in Expense.query) == ['fine', 'good']
+
+def test_writer_error_answers_the_request_and_keeps_the_writer(client, users, queued, monkeypatch):
+    (_, headers), _, _ = users
+    monkeypatch.setattr(queued, '_write', lambda batch: 1 / 0)
+
+    response = client.post('/expenses/personal', headers=headers, json={'description': 'coffee', 'amount': 2})
+    assert response.status_code == 503
+
+    monkeypatch.undo()
+    response = client.post('/expenses/personal', headers=headers, json={'description': 'coffee', 'amount': 2})
+    assert response.status_code == 201
+
+def test_request_times_out_and_drops_its_unwritten_expense(app, client, users, queued, monkeypatch):
+    (_, headers), _, _ = users
+    writing = threading.Event()
+    release = threading.Event()
+    write = queued._write
+
+    def stalled_write(batch):
+        writing.set()
+        release.wait()
+        write(batch)
+
+    monkeypatch.setattr(queued, 'timeout', 0.2)
+    monkeypatch.setattr(queued, '_write', stalled_write)
+    results = {}
+    first = threading.Thread(target=post_personal, args=(app, headers, 'stalled', results))
+    first.start()
+    assert writing.wait(5)
+    post_personal(app, headers, 'queued', results)
+
+    release.set()
+    first.join()
+    assert results == {'stalled': 503, 'queued': 503}
+
+    # The stalled batch was already being written; the queued one is dropped
+    monkeypatch.undo()
+    assert client.post('/expenses/personal', headers=headers, json={'description': 'next', 'amount': 2}).status_code == 201
+    with app.app_context():
+        assert sorted(description for description, in db.session.query(Expense.description)) == ['next', 'stalled']